@@ -0,0 +1,90 @@
+# Benchmark: tiempo de reejecución de la app de Streamlit según el tamaño del historial
+#   python Benchmarks/bench_app_rerun.py --entries 10 1000 10000 --repeat 10
+#
+# Con streamlit.testing (AppTest) se ejecuta Service/app.py sobre un historial SQLite temporal
+# (HISTORIAL_DB) con N análisis y se mide la primera ejecución, una reejecución sin cambios,
+# pasar de página en el historial y abrir un análisis.
+import argparse
+import logging
+import os
+import tempfile
+import time
+import warnings
+
+import bench_utils
+import numpy as np
+
+from claim_store import ClaimStore
+
+APP_PATH = os.path.join(bench_utils.SERVICE_DIR, 'app.py')
+
+
+def fill_store(path, n):
+    import api_backend
+
+    store = ClaimStore(path)
+    entrada = dict(api_backend.EJEMPLO_RECLAMO)
+    resultado = {'score': 0.12, 'riesgo': 'Bajo riesgo', 'recomendaciones': ['Revisar documentación']}
+    base = np.datetime64('2025-01-01T00:00:00')
+    for i in range(n):
+        creado = (base + np.timedelta64(i * 37, 's')).astype(object).strftime('%Y%m%d%H%M%S')
+        store.add(f"reclamador{i % 500}_{creado}", entrada, resultado)
+    store.close()
+
+
+def timed_run(at):
+    inicio = time.perf_counter()
+    at.run(timeout=120)
+    elapsed = time.perf_counter() - inicio
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return elapsed * 1000
+
+
+def measure(app_path, n, repeat):
+    from streamlit.testing.v1 import AppTest
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'historial.db')
+        fill_store(db, n)
+        os.environ['HISTORIAL_DB'] = db
+        at = AppTest.from_file(app_path, default_timeout=120)
+        first = timed_run(at)
+        reruns = [timed_run(at) for _ in range(repeat)]
+        pages = []
+        for _ in range(repeat):
+            siguiente = [b for b in at.sidebar.button if b.key == 'pagina_siguiente']
+            if not siguiente or siguiente[0].disabled:
+                break
+            inicio = time.perf_counter()
+            siguiente[0].click().run(timeout=120)
+            pages.append((time.perf_counter() - inicio) * 1000)
+        abrir = next(b for b in at.sidebar.button if b.key and b.key.startswith('btn_'))
+        inicio = time.perf_counter()
+        abrir.click().run(timeout=120)
+        open_ms = (time.perf_counter() - inicio) * 1000
+        # La caché de Streamlit es por proceso: se vacía para que la siguiente medida abra su historial
+        import streamlit as st
+        logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').disabled = True
+        st.cache_resource.clear()
+    return {'entries': n, 'first_ms': first, 'rerun_ms': float(np.median(reruns)),
+            'page_ms': float(np.median(pages)) if pages else float('nan'), 'open_ms': open_ms}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--entries', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--app', default=APP_PATH, help='Script de la app (para comparar con otra versión)')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    print(f"{'historial':>10} {'primera':>10} {'reejecución':>12} {'página':>10} {'abrir':>10}")
+    for n in args.entries:
+        r = measure(args.app, n, args.repeat)
+        print(f"{r['entries']:>10} {r['first_ms']:>7.0f} ms {r['rerun_ms']:>9.1f} ms {r['page_ms']:>7.1f} ms "
+              f"{r['open_ms']:>7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
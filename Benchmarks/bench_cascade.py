@@ -0,0 +1,102 @@
+# Benchmark: cascada exacta del ensemble (nivel de riesgo sin evaluar los miembros que no lo cambian)
+#   python Benchmarks/bench_cascade.py --batch-size 4096
+#
+# Sobre los reclamos de Data/data_raw.csv (convertidos al formulario): comprueba que la cascada da
+# el mismo nivel de riesgo que el score exacto, cuenta cuántas filas evalúa cada miembro y cuántas
+# evaluaciones de árboles se ahorran, y compara el tiempo con el ensemble completo. Al final simula,
+# con las probabilidades ya calculadas, qué se ahorraría con cada orden posible de los miembros.
+import argparse
+import itertools
+import time
+import warnings
+
+import bench_utils
+import numpy as np
+import pandas as pd
+
+import api_backend
+from ensemble import CASCADE_EPS
+from replay_bench import replay_claims
+
+TREE_MEMBERS = ('rf', 'xgb', 'lgbm')
+
+
+def run(ensemble, features, batch_size, cuts, exact, order=None):
+    evaluated = dict.fromkeys(ensemble.members, 0)
+    bands = []
+    inicio = time.perf_counter()
+    for i in range(0, len(features), batch_size):
+        result = ensemble.predict_band(features.iloc[i:i + batch_size], cuts, exact=exact, order=order)
+        bands.append(result['band'])
+        for name, rows in result['evaluated'].items():
+            evaluated[name] += rows
+    return np.concatenate(bands), evaluated, time.perf_counter() - inicio
+
+
+# Filas que evaluaría cada miembro con un orden dado, a partir de las probabilidades de todos
+def simulate(preds, weights, order, cuts):
+    n = len(next(iter(preds.values())))
+    lower = np.zeros(n)
+    unseen = np.full(n, float(sum(weights[name] for name in order)))
+    pending = np.ones(n, dtype=bool)
+    evaluated = {}
+    for name in order:
+        evaluated[name] = int(pending.sum())
+        lower = np.where(pending, lower + preds[name] * weights[name], lower)
+        unseen = np.where(pending, unseen - weights[name], unseen)
+        low = np.searchsorted(cuts, lower - CASCADE_EPS, side='right')
+        high = np.searchsorted(cuts, lower + unseen + CASCADE_EPS, side='right')
+        pending &= low != high
+    return evaluated
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-size', type=int, default=4096)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    claims = replay_claims()
+    api_backend.warm_up()
+    ensemble = api_backend.registry.get('ensemble')
+    features = api_backend.preprocess_data(claims, api_backend.registry.get('schema'),
+                                           api_backend.registry.get('feature_cols'), plan=api_backend.registry.get('plan'))
+    cuts = [ensemble.threshold, ensemble.threshold + api_backend.MARGEN_RIESGO]
+    order = ensemble.cascade_order()
+    rows = len(features)
+
+    print(f"Reclamos: {rows}  lote: {args.batch_size}  cortes: {cuts[0]:.2f} / {cuts[1]:.2f}")
+    print("Pesos: " + ", ".join(f"{name}={ensemble.weights[name]:.4f}" for name in ensemble.members))
+    print("Orden de la cascada: " + " → ".join(order))
+
+    exact, _, _ = run(ensemble, features, args.batch_size, cuts, exact=True)
+    cascade, evaluated, _ = run(ensemble, features, args.batch_size, cuts, exact=False, order=order)
+    print(f"Mismo nivel de riesgo que el score exacto: {np.mean(exact == cascade):.2%}")
+    print(f"Niveles: " + ", ".join(f"{nivel}={int((exact == i).sum())}" for i, nivel in enumerate(api_backend.NIVELES_RIESGO)))
+
+    print(f"\n{'miembro':<8} {'evaluadas':>10} {'omitidas':>9} {'% omitido':>10}")
+    for name in order:
+        print(f"{name:<8} {evaluated[name]:>10} {rows - evaluated[name]:>9} {1 - evaluated[name] / rows:>10.2%}")
+    trees = [name for name in ensemble.members if name in TREE_MEMBERS]
+    skipped = sum(rows - evaluated[name] for name in trees)
+    print(f"Evaluaciones de árboles omitidas: {skipped} de {rows * len(trees)} ({skipped / (rows * len(trees)):.2%})")
+
+    tiempos = {}
+    for nombre, exacto in (('ensemble completo', True), ('cascada', False)):
+        tiempos[nombre] = min(run(ensemble, features, args.batch_size, cuts, exacto, order)[2] for _ in range(args.repeat))
+    for nombre, segundos in tiempos.items():
+        print(f"{nombre:<18} {segundos * 1000:8.1f} ms  {rows / segundos:>10,.0f} filas/s")
+
+    # Simulación de todos los órdenes con las probabilidades de cada miembro
+    preds, _ = ensemble.predict(features)
+    preds = {name: np.asarray(p, dtype=np.float64) for name, p in preds.items()}
+    print(f"\n{'orden':<22} " + " ".join(f"{name:>8}" for name in ensemble.members) + f" {'árboles omitidos':>17}")
+    for candidate in itertools.permutations(ensemble.members):
+        sim = simulate(preds, ensemble.weights, candidate, np.asarray(cuts))
+        omitidos = sum(rows - sim[name] for name in trees) / (rows * len(trees))
+        print(f"{' → '.join(candidate):<22} " + " ".join(f"{sim[name]:>8}" for name in ensemble.members) + f" {omitidos:>17.2%}")
+
+
+if __name__ == '__main__':
+    main()
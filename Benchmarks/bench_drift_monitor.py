@@ -0,0 +1,94 @@
+# Benchmark: monitor de deriva (drift_monitor.py)
+#   python Benchmarks/bench_drift_monitor.py --repeat 200
+#
+# Mide el coste de observar un lote con varios tamaños y el de calcular el informe, comprueba que la
+# memoria del monitor no crece con el número de reclamos observados y muestra qué marca el informe
+# con los reclamos de Data/data_raw.csv tal cual y con una deriva simulada (precios de vehículo más
+# altos y reclamos con informe policial), acumulado y con semivida.
+import argparse
+import tracemalloc
+import warnings
+
+import bench_utils
+import numpy as np
+
+import api_backend
+from drift_monitor import DriftMonitor
+from replay_bench import replay_claims
+
+
+def flagged(report):
+    return ", ".join(f"{row['variable']} (PSI {row['psi']:.2f}, KS {row['ks']:.2f}, {row['deriva']})"
+                     for row in report if row['deriva'] in ('moderada', 'alta')) or 'ninguna'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 64, 4096])
+    parser.add_argument('--half-life', type=float, default=5000)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    claims = replay_claims()
+    api_backend.warm_up()
+    baseline = api_backend.registry.get('drift_baseline')
+    if baseline is None:
+        raise SystemExit("Falta Artifacts/drift_baseline.json: ejecuta 'python Service/drift_monitor.py baseline'")
+    features = api_backend.preprocess_data(claims, api_backend.registry.get('schema'),
+                                           api_backend.registry.get('feature_cols'), plan=api_backend.registry.get('plan'))
+    _, scores = api_backend.registry.get('ensemble').predict(features)
+    scores = np.asarray(scores, dtype=np.float64)
+    print(f"Series: {len(baseline.names)}  tramos por serie: {baseline.width}  reclamos: {len(features)}")
+
+    print(f"\n{'lote':>6} {'observe p50':>12} {'por fila':>10}   {'score_batch p50':>15} {'coste':>7}")
+    for size in args.batch_sizes:
+        monitor = DriftMonitor()
+        # Como en score_features: la matriz float64 de las variables ya está calculada
+        batch = features.iloc[:size][baseline.features].to_numpy(dtype=np.float64)
+        batch_scores = scores[:size]
+        observe = bench_utils.summarize(bench_utils.measure(lambda: monitor.observe(baseline, batch, batch_scores),
+                                                            args.repeat, warmup=5))
+        scoring = bench_utils.summarize(bench_utils.measure(lambda: api_backend.score_batch(claims.iloc[:size]),
+                                                            max(args.repeat // 10, 5), warmup=2))
+        print(f"{size:>6} {observe['p50_ms']:>9.3f} ms {observe['p50_ms'] * 1000 / size:>7.2f} µs   "
+              f"{scoring['p50_ms']:>12.3f} ms {observe['p50_ms'] / scoring['p50_ms']:>7.1%}")
+    report = bench_utils.summarize(bench_utils.measure(monitor.report, args.repeat, warmup=5))
+    print(f"Informe (PSI y KS de todas las series): p50={report['p50_ms']:.3f} ms")
+
+    # Memoria: los conteos tienen tamaño fijo por mucho que se observe
+    monitor = DriftMonitor()
+    monitor.observe(baseline, features, scores)
+    tracemalloc.start()
+    for passes in (1, 10):
+        for _ in range(passes):
+            monitor.observe(baseline, features, scores)
+        current, _ = tracemalloc.get_traced_memory()
+        print(f"Tras {passes * len(features):>7} reclamos más: memoria retenida {current / 1024:.1f} KiB "
+              f"(conteos: {monitor._counts.nbytes / 1024:.1f} KiB)")
+    tracemalloc.stop()
+
+    # Deriva simulada: la segunda mitad del replay con precios más altos y más informes policiales
+    rng = np.random.default_rng(0)
+    drifted = features.copy()
+    half = len(drifted) // 2
+    idx = drifted.index[half:]
+    drifted.loc[idx, 'VehiclePrice'] = np.where(rng.random(len(idx)) < 0.5, drifted['VehiclePrice'].max(),
+                                                drifted.loc[idx, 'VehiclePrice'])
+    drifted.loc[idx, 'PoliceReportFiled'] = (rng.random(len(idx)) < 0.3).astype(int)
+    _, drifted_scores = api_backend.registry.get('ensemble').predict(drifted)
+    drifted_scores = np.asarray(drifted_scores, dtype=np.float64)
+
+    print("\nVariables marcadas:")
+    monitor = DriftMonitor()
+    monitor.observe(baseline, features, scores)
+    print(f"  replay sin cambios:                  {flagged(monitor.report())}")
+    for nombre, half_life in (('acumulado', None), (f'semivida {args.half_life:,.0f}', args.half_life)):
+        monitor = DriftMonitor(half_life)
+        for start in range(0, len(drifted), 256):
+            monitor.observe(baseline, drifted.iloc[start:start + 256], drifted_scores[start:start + 256])
+        print(f"  con deriva ({nombre + '):':<16} {flagged(monitor.report())}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+# Benchmark: evaluación secuencial frente a paralela de los miembros del ensemble
+#   python Benchmarks/bench_ensemble.py --sizes 1 1000 100000
+import argparse
+import contextlib
+import io
+import os
+
+import bench_utils
+import numpy as np
+import api_backend
+from ensemble import EnsembleEngine
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 1000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    models = api_backend.registry.get('models')
+    config = api_backend.registry.get('config')
+    plan = api_backend.registry.get('plan')
+    secuencial = EnsembleEngine(models, config, parallel=False)
+    paralelo = EnsembleEngine(models, config, parallel=True, min_parallel_rows=0)
+    print(f"Núcleos: {os.cpu_count()}  miembros: {list(paralelo.members)}  hilos por miembro: {paralelo.threads}")
+    for n in args.sizes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            data = plan.execute(bench_utils.synthetic_claims(n))
+        np.testing.assert_array_equal(secuencial.predict(data)[1], paralelo.predict(data)[1])
+        for name in paralelo.members:
+            t = bench_utils.measure(lambda: paralelo._predict_member(name, data), repeat=args.repeat, warmup=1)
+            print(f"{n:>8} filas  {name:<8} {min(t) * 1000:10.3f} ms")
+        t_seq = bench_utils.measure(lambda: secuencial.predict(data), repeat=args.repeat, warmup=1)
+        t_par = bench_utils.measure(lambda: paralelo.predict(data), repeat=args.repeat, warmup=1)
+        print(f"{n:>8} filas  secuencial={min(t_seq) * 1000:10.3f} ms  paralelo={min(t_par) * 1000:10.3f} ms  "
+              f"aceleración=x{min(t_seq) / min(t_par):.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# Benchmark: latencia por reclamo del predictor compilado frente a los modelos originales
+#   python Benchmarks/bench_fast_predictor.py --claims 2000 --repeat 2000
+# Ambos reciben el vector ya preprocesado; también se comprueba la paridad (< 1e-6) sobre
+# los reclamos sintéticos preprocesados con el plan del servicio.
+import argparse
+import contextlib
+import io
+import warnings
+
+import bench_utils
+import numpy as np
+import api_backend
+from ensemble import EnsembleEngine
+from fast_predictor import TOLERANCE, compile_ensemble
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--claims', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        config = api_backend.load_ensemble_config()
+        models = api_backend.load_models(config, native=False)
+        feature_cols = api_backend.load_feature_cols()
+        engine = EnsembleEngine(models, config, parallel=False)
+    predictor = compile_ensemble(models, config, feature_cols)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = api_backend.registry.get('plan').execute(bench_utils.synthetic_claims(args.claims))
+    _, reference = engine.predict(data)
+    _, scores = predictor.predict(data)
+    diff = float(np.max(np.abs(scores - reference)))
+    print(f"Reclamos: {len(data)}  diferencia máxima de score: {diff:.3e}")
+    assert diff <= TOLERANCE, f"El predictor compilado se aleja más de {TOLERANCE} del ensemble"
+
+    fila = data.iloc[[0]]
+    vector = data[feature_cols].to_numpy(dtype=np.float32)[0]
+    resultados = {
+        'ensemble (DataFrame de 1 fila)': bench_utils.summarize(
+            bench_utils.measure(lambda: engine.predict(fila), repeat=max(1, args.repeat // 20), warmup=5)),
+        'compilado (DataFrame de 1 fila)': bench_utils.summarize(
+            bench_utils.measure(lambda: predictor.predict(fila), repeat=args.repeat, warmup=50)),
+        'compilado (vector float32)': bench_utils.summarize(
+            bench_utils.measure(lambda: predictor.score_vector(vector), repeat=args.repeat, warmup=50)),
+    }
+    for nombre, resumen in resultados.items():
+        print(f"{nombre:<34} p50={resumen['p50_ms'] * 1000:10.1f} µs  p99={resumen['p99_ms'] * 1000:10.1f} µs")
+
+    lote = bench_utils.summarize(bench_utils.measure(lambda: engine.predict(data), repeat=5, warmup=1))
+    lote_compilado = bench_utils.summarize(bench_utils.measure(lambda: predictor.predict(data), repeat=5, warmup=1))
+    print(f"Lote de {len(data)}: ensemble={lote['p50_ms']:.1f} ms  compilado={lote_compilado['p50_ms']:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
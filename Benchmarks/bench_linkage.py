@@ -0,0 +1,117 @@
+# Benchmark: índice de vínculos por póliza y agente (linkage_index.py)
+#   python Benchmarks/bench_linkage.py --holdout 0.2
+#
+# Mide la construcción del índice con Data/data_raw.csv, la latencia de una consulta y el coste por
+# reclamo de link y register (consulta y registro) con varios tamaños de lote. Con el índice construido
+# sobre la primera parte del dataset y el resto añadido reclamo a reclamo, comprueba que el resultado es el
+# mismo que construirlo de una vez y muestra la tasa de fraude real de los reclamos nuevos según el
+# índice de su agente. Por último, el coste añadido a score_batch cuando los reclamos traen identificadores.
+import argparse
+import os
+import time
+import warnings
+
+import bench_utils
+import numpy as np
+import pandas as pd
+
+HISTORY = os.path.join(bench_utils.DATA_DIR, 'data_raw.csv')
+
+
+def build(raw):
+    from linkage_index import LinkageIndex
+
+    index = LinkageIndex()
+    for policy, rep, fraud in zip(raw['PolicyNumber'].tolist(), raw['RepNumber'].tolist(), raw['FraudFound_P'].tolist()):
+        index.add(policy, rep, fraud)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--lookups', type=int, default=5000)
+    parser.add_argument('--holdout', type=float, default=0.2)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 256, 4096])
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+    from linkage_index import LINK_COLUMNS, LinkageIndex
+
+    raw = pd.read_csv(HISTORY, encoding='utf-8-sig', usecols=['PolicyNumber', 'RepNumber', 'FraudFound_P'])
+    builds = bench_utils.summarize(bench_utils.measure(lambda: LinkageIndex(HISTORY).stats(), args.repeat))
+    index = LinkageIndex(HISTORY)
+    stats = index.stats()
+    print(f"Histórico: {stats}")
+    print(f"Construcción (lectura del CSV incluida): p50={builds['p50_ms']:.1f} ms  "
+          f"({builds['p50_ms'] * 1000 / len(raw):.2f} µs por reclamo)")
+
+    rng = np.random.default_rng(0)
+    sample = raw.iloc[rng.integers(0, len(raw), args.lookups)]
+    pares = list(zip(sample['PolicyNumber'].tolist(), sample['RepNumber'].tolist()))
+    it = iter(pares * 2)
+    lookup = bench_utils.summarize(bench_utils.measure(lambda: index.lookup(*next(it)), args.lookups))
+    print(f"Consulta de un reclamo: p50={lookup['p50_ms'] * 1000:.1f} µs  p99={lookup['p99_ms'] * 1000:.1f} µs")
+
+    print(f"\n{'lote':>6} {'link':>10} {'por reclamo':>12}")
+    for size in args.batch_sizes:
+        scratch = LinkageIndex(HISTORY)
+        scratch.stats()
+        policies = [f'nueva-{i}' for i in range(size)]
+        reps = sample['RepNumber'].iloc[:size].tolist() if size <= len(sample) else sample['RepNumber'].sample(size, replace=True, random_state=0).tolist()
+
+        def link_and_register():
+            scratch.link(policies, reps)
+            scratch.register(policies, reps)
+        timing = bench_utils.summarize(bench_utils.measure(link_and_register, args.repeat))
+        print(f"{size:>6} {timing['p50_ms']:>7.2f} ms {timing['p50_ms'] * 1000 / size:>9.2f} µs")
+
+    # Histórico parcial y el resto añadido de forma incremental
+    cut = int(len(raw) * (1 - args.holdout))
+    incremental = build(raw.iloc[:cut])
+    nuevos = raw.iloc[cut:]
+    inicio = time.perf_counter()
+    links = incremental.link(nuevos['PolicyNumber'].tolist(), nuevos['RepNumber'].tolist())
+    incremental.register(nuevos['PolicyNumber'].tolist(), nuevos['RepNumber'].tolist())
+    elapsed = time.perf_counter() - inicio
+    full = build(raw.iloc[:cut])
+    for policy, rep in zip(nuevos['PolicyNumber'].tolist(), nuevos['RepNumber'].tolist()):
+        full.add(policy, rep)
+    same = incremental.stats() == full.stats() and all(
+        np.allclose(np.array(list(incremental.lookup(p, r).values()), dtype=float),
+                    np.array(list(full.lookup(p, r).values()), dtype=float), equal_nan=True)
+        for p, r in pares[:500])
+    print(f"\nIncremental: {len(nuevos)} reclamos en {elapsed * 1000:.1f} ms; igual que construir de una vez: {same}")
+
+    links = pd.DataFrame(links, index=nuevos.index)
+    fraude = nuevos['FraudFound_P'].astype(float)
+    print(f"Reclamos nuevos con póliza ya vista: {int((links['reclamos_poliza'] > 0).sum())}")
+    print(f"Índice de fraude del agente (histórico) en los nuevos: min={links['indice_fraude_agente'].min():.2f} "
+          f"max={links['indice_fraude_agente'].max():.2f}")
+    tramos = pd.qcut(links['indice_fraude_agente'], 4, duplicates='drop')
+    for tramo, tasa in fraude.groupby(tramos, observed=True).agg(['mean', 'count']).iterrows():
+        print(f"  índice {str(tramo):<16} tasa real {tasa['mean']:.2%}  ({int(tasa['count'])} reclamos)")
+
+    # Coste añadido a score_batch (caché de resultados desactivada)
+    import api_backend
+    from replay_bench import replay_claims
+
+    claims = replay_claims()
+    api_backend.warm_up()
+    api_backend.score_cache.maxsize = 0
+    api_backend.linkage_index.stats()
+    sin_ids = claims.drop(columns=[c for c in claims.columns if c in ('NUMERO DE POLIZA', 'NUMERO DEL AGENTE')])
+    print(f"\n{'lote':>6} {'sin identificadores':>20} {'con identificadores':>20} {'coste':>7}")
+    for size in args.batch_sizes:
+        # Llamadas alternas con y sin identificadores, para que el ruido de la máquina afecte igual a ambas
+        lotes = {'sin': sin_ids.iloc[:size], 'con': claims.iloc[:size]}
+        medidas = {'sin': [], 'con': []}
+        for _ in range(max(args.repeat, 20 if size < 1000 else 5)):
+            for nombre, lote in lotes.items():
+                medidas[nombre] += bench_utils.measure(lambda: api_backend.score_batch(lote), 1)
+        tiempos = {nombre: bench_utils.summarize(valores)['p50_ms'] for nombre, valores in medidas.items()}
+        print(f"{size:>6} {tiempos['sin']:>17.2f} ms {tiempos['con']:>17.2f} ms {tiempos['con'] / tiempos['sin'] - 1:>7.1%}")
+    print(f"Columnas añadidas a la salida: {', '.join(LINK_COLUMNS)}")
+
+
+if __name__ == '__main__':
+    main()
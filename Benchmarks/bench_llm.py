@@ -0,0 +1,81 @@
+# Benchmark de la capa de explicaciones contra el servidor LLM simulado (llm_stub_server.py)
+#   python Benchmarks/bench_llm.py --claims 64 --latency-ms 300 --concurrency 1 8 32 --fail-rate 0.1
+# Compara la generación secuencial (una llamada tras otra, como hacía el backend) con el modo por
+# lotes asíncrono, y mide la segunda consulta de los mismos casos (servida desde la caché).
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import urllib.request
+
+import bench_utils
+from llm_explanations import ExplanationCache, ExplanationService
+from llm_stub_server import StubLLMServer
+
+
+def stats(base_url):
+    with urllib.request.urlopen(base_url.rsplit('/v1', 1)[0] + '/stats') as response:
+        return json.loads(response.read())
+
+
+def casos_sinteticos(n):
+    import api_backend
+
+    claims = bench_utils.synthetic_claims(n)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = api_backend.score_batch(claims)
+    return [
+        ({'score': round(float(row['score']), 2), 'riesgo': row['riesgo'], 'recomendaciones': list(row['recomendaciones'])},
+         claim)
+        for row, claim in zip(result.to_dict('records'), claims.to_dict('records'))
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--claims', type=int, default=64)
+    parser.add_argument('--latency-ms', type=float, default=300)
+    parser.add_argument('--fail-rate', type=float, default=0.1)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--sequential', type=int, default=8, help='Reclamos para la medición secuencial')
+    args = parser.parse_args()
+
+    stub = StubLLMServer(latency=args.latency_ms / 1000, fail_rate=args.fail_rate)
+    base_url = stub.start_in_thread()
+    casos = casos_sinteticos(args.claims)
+    print(f"Servidor simulado: {base_url}  latencia={args.latency_ms:.0f} ms  fallos={args.fail_rate:.0%}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Secuencial, sin caché: una petición bloqueante por reclamo
+        service = ExplanationService(None, base_url=base_url)
+        inicio = time.perf_counter()
+        for resultado, entrada in casos[:args.sequential]:
+            service.explain(resultado, entrada, 'stub')
+        por_reclamo = (time.perf_counter() - inicio) / args.sequential
+        print(f"secuencial          {por_reclamo * 1000:9.1f} ms/reclamo  "
+              f"(estimado para {len(casos)}: {por_reclamo * len(casos):.1f} s)")
+
+        for concurrency in args.concurrency:
+            cache = ExplanationCache(os.path.join(tmp, f'cache_{concurrency}.db'))
+            service = ExplanationService(cache, base_url=base_url)
+            inicio = time.perf_counter()
+            textos = service.explain_many(casos, 'stub', concurrency=concurrency)
+            frio = time.perf_counter() - inicio
+            errores = sum(texto.startswith('❌') for texto in textos)
+            max_in_flight = stats(base_url)['max_in_flight']
+            stub.max_in_flight = 0
+            inicio = time.perf_counter()
+            service.explain_many(casos, 'stub', concurrency=concurrency)
+            caliente = time.perf_counter() - inicio
+            print(f"lotes concurrencia={concurrency:<3} {frio:7.2f} s  ({len(casos) / frio:6.1f} reclamos/s, "
+                  f"máx. en curso={max_in_flight}, errores={errores})  caché: {caliente * 1000:7.1f} ms")
+
+    s = stats(base_url)
+    print(f"Peticiones al servidor: {s['requests']}  respuestas 429 reintentadas: {s['failures']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# Benchmark: tiempo hasta el primer fragmento (TTFT) y latencia total de la explicación IA,
+# bloqueante frente a streaming, contra el servidor LLM simulado (llm_stub_server.py)
+#   python Benchmarks/bench_llm_stream.py --latency-ms 400 --token-ms 8 --repeat 5
+import argparse
+import time
+
+import bench_utils
+import numpy as np
+from llm_explanations import ExplanationService
+from llm_stub_server import StubLLMServer
+
+RESULTADO = {'score': 0.34, 'riesgo': 'Alto riesgo',
+             'recomendaciones': ['Confirmar la responsabilidad declarada por el asegurado.']}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency-ms', type=float, default=400, help='Latencia hasta el primer token')
+    parser.add_argument('--token-ms', type=float, default=8, help='Tiempo por palabra generada')
+    parser.add_argument('--words', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    stub = StubLLMServer(latency=args.latency_ms / 1000, token_latency=args.token_ms / 1000, n_words=args.words)
+    service = ExplanationService(None, base_url=stub.start_in_thread())
+    claims = bench_utils.synthetic_claims(args.repeat).to_dict('records')
+
+    # Bloqueante: el primer texto visible es la respuesta completa
+    bloqueante = []
+    for entrada in claims:
+        inicio = time.perf_counter()
+        texto = service.explain(RESULTADO, entrada, 'stub')
+        bloqueante.append(time.perf_counter() - inicio)
+    assert not texto.startswith('❌'), texto
+
+    ttft, total, fragmentos = [], [], []
+    for entrada in claims:
+        inicio = time.perf_counter()
+        partes = []
+        for parte in service.explain_stream(RESULTADO, entrada, 'stub'):
+            if not partes:
+                ttft.append(time.perf_counter() - inicio)
+            partes.append(parte)
+        total.append(time.perf_counter() - inicio)
+        fragmentos.append(len(partes))
+    assert ''.join(partes).strip() == service.explain(RESULTADO, entrada, 'stub'), "El texto en streaming no coincide"
+
+    print(f"Servidor simulado: primer token {args.latency_ms:.0f} ms, {args.token_ms:.0f} ms/palabra, {args.words} palabras")
+    print(f"bloqueante  primer texto={np.median(bloqueante) * 1000:8.1f} ms  total={np.median(bloqueante) * 1000:8.1f} ms")
+    print(f"streaming   primer texto={np.median(ttft) * 1000:8.1f} ms  total={np.median(total) * 1000:8.1f} ms  "
+          f"({int(np.median(fragmentos))} fragmentos)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# Benchmark: carga del ensemble desde los pickles frente a los artefactos nativos (native_artifacts.py)
+#   python Service/native_artifacts.py && python Benchmarks/bench_native_artifacts.py --repeat 5
+#
+# Cada medida se hace en un proceso nuevo: tiempo de carga de los modelos y del explainer (incluida
+# la importación de las librerías que hagan falta), memoria residente añadida por los modelos y,
+# ya con las librerías importadas, el tiempo de una segunda carga. También comprueba el score.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import warnings
+
+import bench_utils
+import numpy as np
+
+CHILD = r'''
+import json, os, sys, time, warnings
+warnings.simplefilter('ignore')
+sys.path.insert(0, SERVICE_DIR)
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+
+import api_backend
+native = NATIVE
+config = api_backend.load_ensemble_config()
+before = rss_mb()
+inicio = time.perf_counter()
+api_backend.load_models(config, native=native)
+models_cold = time.perf_counter() - inicio
+models_rss = rss_mb() - before
+modules = sorted(m for m in ('sklearn', 'joblib') if m in sys.modules)
+inicio = time.perf_counter()
+api_backend.load_shap_explainer(native=native)
+explainer_cold = time.perf_counter() - inicio
+inicio = time.perf_counter()
+api_backend.load_models(config, native=native)
+models_warm = time.perf_counter() - inicio
+inicio = time.perf_counter()
+api_backend.load_shap_explainer(native=native)
+explainer_warm = time.perf_counter() - inicio
+print(json.dumps({'models_cold_ms': models_cold * 1000, 'models_warm_ms': models_warm * 1000,
+                  'explainer_cold_ms': explainer_cold * 1000, 'explainer_warm_ms': explainer_warm * 1000,
+                  'rss_mb': models_rss, 'modules': modules}))
+'''
+
+
+def measure(native):
+    code = CHILD.replace('SERVICE_DIR', repr(bench_utils.SERVICE_DIR)).replace('NATIVE', repr(native))
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def check_scores(n_claims):
+    import api_backend
+    from ensemble import EnsembleEngine
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        config = api_backend.load_ensemble_config()
+        data = api_backend.registry.get('plan').execute(bench_utils.synthetic_claims(n_claims))
+        _, reference = EnsembleEngine(api_backend.load_models(config, native=False), config, parallel=False).predict(data)
+        _, scores = EnsembleEngine(api_backend.load_models(config), config, parallel=False).predict(data)
+    return float(np.max(np.abs(scores - reference)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--claims', type=int, default=5000)
+    args = parser.parse_args()
+
+    import native_artifacts
+    if native_artifacts.load_manifest(os.path.join(bench_utils.SERVICE_DIR, '../Artifacts')) is None:
+        raise SystemExit("No hay artefactos nativos: ejecuta antes Service/native_artifacts.py")
+
+    print(f"Diferencia máxima de score (nativo frente a pickles, {args.claims} reclamos): {check_scores(args.claims):.3e}")
+    print(f"{'formato':<9} {'modelos (frío)':>15} {'modelos':>10} {'explainer (frío)':>17} {'explainer':>10} "
+          f"{'RSS modelos':>12}  módulos tras cargar los modelos")
+    for nombre, native in (('pickles', False), ('nativo', True)):
+        runs = [measure(native) for _ in range(args.repeat)]
+        med = {key: np.median([r[key] for r in runs]) for key in runs[0] if key != 'modules'}
+        print(f"{nombre:<9} {med['models_cold_ms']:>12.1f} ms {med['models_warm_ms']:>7.1f} ms "
+              f"{med['explainer_cold_ms']:>14.1f} ms {med['explainer_warm_ms']:>7.1f} ms {med['rss_mb']:>9.1f} MB  "
+              f"{', '.join(runs[0]['modules']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
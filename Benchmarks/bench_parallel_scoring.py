@@ -0,0 +1,78 @@
+# Benchmark: escalado de la puntuación por lotes con varios procesos (score_claims.score_chunks)
+#   python Benchmarks/bench_parallel_scoring.py --rows 60000 --chunksize 2000 --workers 1 2 4 8
+#
+# Para cada número de procesos mide filas/s, aceleración y eficiencia frente a un proceso, y la
+# memoria de los workers (residente, proporcional y privada): con fork los modelos se comparten y
+# cada worker solo añade su memoria privada. También comprueba que el resultado coincide con la
+# puntuación en un solo proceso y que se devuelve en el orden de entrada.
+import argparse
+import multiprocessing
+import os
+import time
+import warnings
+
+import bench_utils
+import pandas as pd
+
+import score_claims
+
+
+def chunked(claims, chunksize):
+    return [claims.iloc[start:start + chunksize] for start in range(0, len(claims), chunksize)]
+
+
+# Ejecuta la puntuación y toma, en cada bloque recibido, la memoria de los procesos hijos vivos
+def run(chunks, workers):
+    memoria = {}
+    resultados = []
+    inicio = time.perf_counter()
+    for result, _ in score_claims.score_chunks(chunks, workers):
+        resultados.append(result)
+        for child in multiprocessing.active_children():
+            actual = bench_utils.process_memory_mb(child.pid)
+            if actual and actual['rss_mb'] >= memoria.get(child.pid, {}).get('rss_mb', 0):
+                memoria[child.pid] = actual
+    elapsed = time.perf_counter() - inicio
+    return pd.concat(resultados), elapsed, list(memoria.values())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=60000)
+    parser.add_argument('--chunksize', type=int, default=2000)
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='Números de procesos a medir (por defecto 1, 2, 4... hasta los núcleos)')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({1, *[2 ** i for i in range(1, cpus.bit_length())], cpus})
+    claims = bench_utils.synthetic_claims(args.rows)
+    chunks = chunked(claims, args.chunksize)
+    score_claims.warm_up()
+    padre = bench_utils.process_memory_mb(os.getpid())
+    print(f"Reclamos: {len(claims)} en {len(chunks)} bloques de {args.chunksize}  núcleos: {cpus}  "
+          f"proceso principal: {padre['rss_mb'] if padre else float('nan'):.1f} MB residentes")
+
+    referencia, base = None, None
+    print(f"{'procesos':>8} {'filas/s':>10} {'acel.':>6} {'efic.':>6} {'RSS/worker':>11} "
+          f"{'PSS/worker':>11} {'privada/worker':>15}")
+    for n in workers:
+        result, elapsed, memoria = run(chunks, n)
+        if referencia is None:
+            referencia = result
+        else:
+            pd.testing.assert_frame_equal(result, referencia)
+        filas_s = len(claims) / elapsed
+        base = base or filas_s
+        linea = f"{n:>8} {filas_s:>10,.0f} {filas_s / base:>5.2f}x {filas_s / base / n:>6.0%}"
+        if memoria:
+            media = {key: sum(m[key] for m in memoria) / len(memoria) for key in ('rss_mb', 'pss_mb', 'private_mb')}
+            linea += f" {media['rss_mb']:>8.1f} MB {media['pss_mb']:>8.1f} MB {media['private_mb']:>12.1f} MB"
+        else:
+            linea += "   (en el proceso principal)"
+        print(linea)
+
+
+if __name__ == '__main__':
+    main()
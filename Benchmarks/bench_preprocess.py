@@ -0,0 +1,91 @@
+# Benchmark: preprocess_data vectorizado y plan precompilado frente a la versión anterior (apply por fila)
+#   python Benchmarks/bench_preprocess.py --sizes 1 1000 1000000
+import argparse
+import contextlib
+import io
+
+import bench_utils
+import numpy as np
+import pandas as pd
+import api_backend
+
+
+# Versión anterior de preprocess_data (redondeo con Series.apply y un parseo de fechas por derivada)
+def preprocess_data_legacy(data, schema, feature_cols):
+    rename_map = {}
+    for feature, info in schema.items():
+        if 'original' in info:
+            rename_map[feature] = info['original']
+    data.rename(columns=rename_map, inplace=True)
+    renamed_schema = {}
+    for feature, info in schema.items():
+        if 'original' in info:
+            renamed_schema[rename_map.get(feature, feature)] = info
+    for feature, info in renamed_schema.items():
+        if info['type'] == 'date':
+            data[feature] = pd.to_datetime(data[feature], format='%d/%m/%Y')
+        elif info['type'] == 'categorical':
+            data[feature] = data[feature].map(info['options'])
+        elif info['type'] == 'numeric':
+            data[feature] = pd.to_numeric(data[feature], errors='coerce')
+            for col_dict in api_backend.COL_MAP:
+                if feature in col_dict:
+                    mapping_values = list(col_dict[feature].values())
+                    if feature == 'VehiclePrice':
+                        data[feature] = data[feature] * api_backend.EUR_TO_USD
+                    def round_to_closest(value):
+                        arr = np.array(mapping_values)
+                        idx = (np.abs(arr - value)).argmin()
+                        return arr[idx]
+                    data[feature] = data[feature].apply(round_to_closest)
+        elif info.get('derived', False) or str(info['type']).lower() in ['derived', 'derived_numeric']:
+            sources = info['from']
+            if len(sources) == 1:
+                col_source = rename_map.get(sources[0], sources[0])
+                data[col_source] = pd.to_datetime(data[col_source], format=info.get('format', '%d/%m/%Y'), errors='coerce')
+                if 'options' in info:
+                    if 'month' in feature.lower():
+                        data[feature] = data[col_source].dt.strftime('%b').map(info['options'])
+                    elif 'dayofweek' in feature.lower():
+                        data[feature] = data[col_source].dt.day_name().map(info['options'])
+                else:
+                    data[feature] = ((data[col_source].dt.day - 1) // 7 + 1).astype(int)
+            elif len(sources) == 2:
+                col1, col2 = sources
+                data[col1] = pd.to_datetime(data[col1], format="%d/%m/%Y", errors="coerce", dayfirst=True)
+                data[col2] = pd.to_datetime(data[col2], format="%d/%m/%Y", errors="coerce", dayfirst=True)
+                data[feature] = (data[col2] - data[col1]).dt.days
+    return data[feature_cols]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 1000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    schema = api_backend.load_io_schema()
+    feature_cols = api_backend.load_feature_cols()
+    plan = api_backend.build_transform_plan(schema, feature_cols)
+    for n in args.sizes:
+        claims = bench_utils.synthetic_claims(n)
+        # Algunos valores no numéricos para comprobar que el redondeo de NaN se mantiene
+        if n >= 10:
+            claims['PRECIO DEL VEHICULO'] = claims['PRECIO DEL VEHICULO'].astype(object)
+            claims.loc[::7, 'PRECIO DEL VEHICULO'] = 'desconocido'
+        repeat = args.repeat if n <= 100000 else 1
+        with contextlib.redirect_stdout(io.StringIO()):
+            esperado = preprocess_data_legacy(claims.copy(), schema, feature_cols)
+            obtenido = api_backend.preprocess_data(claims.copy(), schema, feature_cols)
+            pd.testing.assert_frame_equal(obtenido, esperado)
+            pd.testing.assert_frame_equal(plan.execute(claims), esperado)
+            t_old = bench_utils.measure(lambda: preprocess_data_legacy(claims.copy(), schema, feature_cols), repeat=repeat)
+            t_new = bench_utils.measure(lambda: api_backend.preprocess_data(claims.copy(), schema, feature_cols), repeat=repeat)
+            t_plan = bench_utils.measure(lambda: plan.execute(claims), repeat=repeat)
+        old, new, compiled = min(t_old), min(t_new), min(t_plan)
+        print(f"{n:>9} filas  anterior={old * 1000:10.2f} ms  vectorizado={new * 1000:10.2f} ms  "
+              f"plan precompilado={compiled * 1000:10.2f} ms  aceleración=x{old / compiled:.1f}  (salida idéntica)")
+
+
+if __name__ == '__main__':
+    main()
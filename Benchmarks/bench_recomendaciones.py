@@ -0,0 +1,80 @@
+# Benchmark: motor de reglas vectorizado frente a la versión anterior con iterrows
+#   python Benchmarks/bench_recomendaciones.py --sizes 1 1000 100000
+import argparse
+import contextlib
+import io
+
+import bench_utils
+import numpy as np
+import api_backend
+from recomendaciones import evaluate_rules
+
+
+# Versión anterior de generar_recomendaciones (iterrows y row.get por regla)
+def generar_recomendaciones_legacy(data):
+    recomendaciones = []
+    for idx, row in data.iterrows():
+        fila = []
+        if row.get('NumberOfSuppliments', 0) > 0:
+            fila.append("Consultar los documentos suplementarios adjuntos al reclamo.")
+        if row.get('WitnessPresent', 0) == 1:
+            fila.append("Solicitar testimonio o contacto del testigo.")
+        if row.get('PoliceReportFiled', 0) == 1:
+            fila.append("Revisar el informe policial relacionado con el accidente.")
+        fila.append("Confirmar la responsabilidad declarada por el asegurado.")
+        if row.get('PastNumberOfClaims', 0) > 6:
+            fila.append("Historial de reclamos elevado: revisar patrones o recurrencia.")
+        if row.get('Days_Policy_Accident', 999) < 30:
+            fila.append("El accidente ocurrió poco después de contratar la póliza: revisar con atención.")
+        if row.get('AddressChange_Claim', 1) in [0, 2, 3]:
+            fila.append("El asegurado cambió de domicilio recientemente: validar veracidad del cambio.")
+        if row.get('VehiclePrice', 0) > 65500:
+            fila.append("Vehículo de alto valor: considerar inspección más exhaustiva.")
+        if row.get('AgentType', 1) == 0:
+            fila.append("Agente externo involucrado: revisar consistencia de la documentación.")
+        if row.get('AgeOfPolicyHolder', 100) < 21:
+            fila.append("Corroborar historial del asegurado por edad especialmente joven.")
+        if row.get('VehicleCategory', -1) == 1:
+            fila.append("Evaluar el contexto del accidente por tratarse de un vehículo deportivo.")
+        if row.get('BasePolicy', -1) == 0:
+            fila.append("Evaluar nivel de cobertura total de la póliza por posible incentivo a fraude.")
+        if (
+            row.get('WitnessPresent', 0) == 0 and
+            row.get('PoliceReportFiled', 0) == 0 and
+            row.get('NumberOfSuppliments', 0) == 0
+        ):
+            fila.append("Falta total de respaldo documental: enviar perito o iniciar investigación formal.")
+        if not fila:
+            fila.append("No se identificaron recomendaciones automáticas. Evaluar manualmente.")
+        recomendaciones.append(fila)
+    return recomendaciones
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 1000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    schema = api_backend.load_io_schema()
+    feature_cols = api_backend.load_feature_cols()
+    plan = api_backend.build_transform_plan(schema, feature_cols)
+    for n in args.sizes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            data = plan.execute(bench_utils.synthetic_claims(n))
+        # Valores ausentes y columnas que faltan deben comportarse igual que con row.get
+        if n >= 10:
+            data.loc[data.index[::11], 'Days_Policy_Accident'] = np.nan
+        variantes = [data, data.drop(columns=['WitnessPresent', 'BasePolicy'])]
+        for variante in variantes:
+            assert api_backend.generar_recomendaciones(variante) == generar_recomendaciones_legacy(variante)
+        t_old = bench_utils.measure(lambda: generar_recomendaciones_legacy(data), repeat=args.repeat)
+        t_new = bench_utils.measure(lambda: api_backend.generar_recomendaciones(data), repeat=args.repeat)
+        t_mask = bench_utils.measure(lambda: evaluate_rules(data), repeat=args.repeat)
+        old, new, mask = min(t_old), min(t_new), min(t_mask)
+        print(f"{n:>8} filas  iterrows={old * 1000:10.2f} ms  reglas+textos={new * 1000:9.2f} ms  "
+              f"solo máscara={mask * 1000:8.3f} ms  aceleración=x{old / new:.1f}  (salida idéntica)")
+
+
+if __name__ == '__main__':
+    main()
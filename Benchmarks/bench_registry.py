@@ -0,0 +1,46 @@
+# Benchmark: latencia por reclamo con carga en frío frente al registro ya caliente
+#   python Benchmarks/bench_registry.py --repeat 20
+import argparse
+import contextlib
+import io
+
+import matplotlib
+matplotlib.use('Agg')
+
+import bench_utils
+import pandas as pd
+import api_backend
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    def reclamo():
+        return pd.DataFrame([api_backend.EJEMPLO_RECLAMO])
+
+    # Frío: se descarta el registro antes de cada reclamo (equivale a cargar todo por petición)
+    def frio():
+        api_backend.registry.invalidate()
+        api_backend.model_service(reclamo())
+
+    # Caliente: los artefactos ya están en memoria
+    def caliente():
+        api_backend.model_service(reclamo())
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        t_carga = bench_utils.measure(lambda: (api_backend.registry.invalidate(), api_backend.warm_up()),
+                                      repeat=args.repeat)
+        t_frio = bench_utils.measure(frio, repeat=args.repeat)
+        api_backend.warm_up()
+        t_caliente = bench_utils.measure(caliente, repeat=args.repeat, warmup=1)
+
+    bench_utils.print_summary('solo carga de artefactos', bench_utils.summarize(t_carga))
+    bench_utils.print_summary('reclamo en frío', bench_utils.summarize(t_frio))
+    bench_utils.print_summary('reclamo en caliente', bench_utils.summarize(t_caliente))
+    print(f"Aceleración por reclamo: x{sum(t_frio) / sum(t_caliente):.1f}")
+
+
+if __name__ == '__main__':
+    main()
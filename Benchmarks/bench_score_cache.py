@@ -0,0 +1,99 @@
+# Benchmark: caché de resultados y agrupación de filas repetidas en la puntuación
+#   python Benchmarks/bench_score_cache.py --batch-size 256
+#
+# Reproduce los reclamos de Data/data_raw.csv (convertidos al formulario) con score_batch sin caché,
+# con la caché vacía y con la caché ya llena (reclamos que se vuelven a puntuar), y un reclamo
+# repetido con model_service. Para cada escenario: tasa de aciertos, filas que pasan por los
+# modelos, tiempo en la etapa predict y tiempo ahorrado. También muestra cuántos vectores únicos
+# hay y qué variables hacen que los vectores no se repitan.
+import argparse
+import time
+import warnings
+
+import bench_utils
+import numpy as np
+import pandas as pd
+
+import api_backend
+import metrics
+from replay_bench import replay_claims
+from score_cache import row_keys
+
+
+def counters():
+    lookups = {result: metrics.CACHE_LOOKUPS.value(cache='score', result=result) for result in ('hit', 'miss', 'duplicate')}
+    return lookups, metrics.STAGE_SECONDS.totals(stage='predict')[1]
+
+
+def replay(claims, batch_size, cache_size):
+    api_backend.score_cache.maxsize = cache_size
+    before, predict_before = counters()
+    inicio = time.perf_counter()
+    result = pd.concat([api_backend.score_batch(claims.iloc[i:i + batch_size])
+                        for i in range(0, len(claims), batch_size)])
+    elapsed = time.perf_counter() - inicio
+    after, predict_after = counters()
+    delta = {key: after[key] - before[key] for key in after}
+    return result, {'seconds': elapsed, 'predict_s': predict_after - predict_before, **delta}
+
+
+def print_row(nombre, stats, rows, base_predict=None):
+    reused = stats['hit'] + stats['duplicate']
+    ahorro = f"{(base_predict - stats['predict_s']) * 1000:9.1f} ms" if base_predict is not None else f"{'-':>12}"
+    print(f"{nombre:<26} {reused / rows:>8.2%} {stats['miss']:>9} {stats['predict_s'] * 1000:>10.1f} ms "
+          f"{ahorro} {rows / stats['seconds']:>10,.0f}")
+
+
+# Vectores únicos del replay y, para cada variable, cuántos quedarían si se ignorase
+def uniqueness(features, top):
+    total = len(np.unique(row_keys(features.to_numpy(dtype=np.float64))))
+    sin_variable = {}
+    for col in features.columns:
+        rest = features.drop(columns=[col]).to_numpy(dtype=np.float64)
+        sin_variable[col] = len(np.unique(row_keys(rest)))
+    print(f"\nVectores únicos: {total} de {len(features)} filas")
+    print("Variables que más vectores distintos generan (únicos sin ellas / valores distintos):")
+    for col, n in sorted(sin_variable.items(), key=lambda item: item[1])[:top]:
+        print(f"  {col:<24} {n:>7}  ({features[col].nunique()} valores)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--single', type=int, default=500, help='Llamadas a model_service con el mismo reclamo')
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    claims = replay_claims()
+    api_backend.warm_up()
+    api_backend.score_batch(claims.iloc[:args.batch_size])
+    size = max(api_backend.score_cache.maxsize, len(claims))
+    rows = len(claims)
+
+    print(f"Reclamos: {rows}  lote: {args.batch_size}")
+    print(f"{'escenario':<26} {'reuso':>8} {'al modelo':>9} {'predict':>13} {'ahorro':>12} {'filas/s':>10}")
+    reference, sin_cache = replay(claims, args.batch_size, 0)
+    print_row('sin caché', sin_cache, rows)
+    api_backend.score_cache.clear()
+    fria, stats = replay(claims, args.batch_size, size)
+    print_row('caché vacía', stats, rows, sin_cache['predict_s'])
+    caliente, stats = replay(claims, args.batch_size, size)
+    print_row('caché llena (repetición)', stats, rows, sin_cache['predict_s'])
+    diff = max(float(np.abs(fria['score'] - reference['score']).max()),
+               float(np.abs(caliente['score'] - reference['score']).max()))
+    print(f"Diferencia máxima de score frente a la puntuación sin caché: {diff:.3e}")
+
+    reclamo = pd.DataFrame([api_backend.EJEMPLO_RECLAMO])
+    for nombre, cache_size in (('model_service sin caché', 0), ('model_service con caché', size)):
+        api_backend.score_cache.maxsize = cache_size
+        api_backend.model_service(reclamo)
+        print(f"{nombre:<26} p50={bench_utils.summarize(bench_utils.measure(lambda: api_backend.model_service(reclamo), args.single))['p50_ms']:.3f} ms")
+
+    features = api_backend.preprocess_data(claims, api_backend.registry.get('schema'),
+                                           api_backend.registry.get('feature_cols'), plan=api_backend.registry.get('plan'))
+    uniqueness(features, args.top)
+
+
+if __name__ == '__main__':
+    main()
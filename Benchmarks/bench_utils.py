@@ -0,0 +1,105 @@
+# Utilidades comunes de los benchmarks
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+# Los módulos del servicio se importan igual que desde Service/ (imports planos)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIR = os.path.abspath(os.path.join(BASE_DIR, '..', 'Service'))
+DATA_DIR = os.path.abspath(os.path.join(BASE_DIR, '..', 'Data'))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+
+# Ejecuta fn `repeat` veces y devuelve los tiempos en segundos
+def measure(fn, repeat=1, warmup=0):
+    for _ in range(warmup):
+        fn()
+    tiempos = []
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+# Resumen de latencias en milisegundos
+def summarize(tiempos):
+    arr = np.asarray(tiempos, dtype=float) * 1000
+    return {
+        'n': int(arr.size),
+        'mean_ms': float(arr.mean()),
+        'p50_ms': float(np.percentile(arr, 50)),
+        'p95_ms': float(np.percentile(arr, 95)),
+        'p99_ms': float(np.percentile(arr, 99)),
+        'min_ms': float(arr.min()),
+    }
+
+
+# Pico de memoria residente del proceso en MB. En Linux se lee VmHWM, que reset_peak_rss()
+# puede reiniciar para medir el pico de cada etapa; en otros sistemas es el pico desde el arranque.
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+# Memoria de otro proceso en MB según /proc/<pid>/smaps_rollup (solo Linux): residente, proporcional
+# (las páginas compartidas se reparten entre los procesos que las usan) y privada
+def process_memory_mb(pid):
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    except OSError:
+        return None
+    return {
+        'rss_mb': fields.get('Rss', 0.0),
+        'pss_mb': fields.get('Pss', 0.0),
+        'private_mb': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0),
+    }
+
+
+def print_summary(nombre, resumen):
+    print(f"{nombre:<32} n={resumen['n']:<6} media={resumen['mean_ms']:9.3f} ms  "
+          f"p50={resumen['p50_ms']:9.3f} ms  p99={resumen['p99_ms']:9.3f} ms")
+
+
+# Reclamos sintéticos en formato formulario: filas de Data/data_raw.csv convertidas con
+# raw_to_form y con ruido en las variables numéricas para ejercitar el redondeo por rangos
+def synthetic_claims(n, seed=42, jitter=True):
+    import pandas as pd
+    from raw_claims import raw_to_form
+
+    rng = np.random.default_rng(seed)
+    raw = pd.read_csv(os.path.join(DATA_DIR, 'data_raw.csv'), encoding='utf-8-sig')
+    form = raw_to_form(raw).reset_index(drop=True)
+    claims = form.iloc[rng.integers(0, len(form), size=n)].reset_index(drop=True)
+    if jitter:
+        claims['EDAD DEL ASEGURADO'] = rng.integers(16, 90, size=n)
+        claims['PRECIO DEL VEHICULO'] = rng.integers(1, 200, size=n) * 500
+        claims['NUMERO DE RECLAMACIONES PASADAS'] = rng.integers(0, 8, size=n)
+        claims['NUMERO DE DOCUMENTOS RELACIONADOS CON EL ACCIDENTE'] = rng.integers(0, 8, size=n)
+        claims['NUMERO DE COCHES INVOLUCRADOS EN EL ACCIDENTE'] = rng.integers(1, 12, size=n)
+    return claims
@@ -0,0 +1,166 @@
+# Servidor local que imita el endpoint de chat completions de OpenAI, para probar y medir
+# la capa de explicaciones sin red ni coste:
+#   python Benchmarks/llm_stub_server.py --port 8099 --latency-ms 800 --token-ms 10 --fail-rate 0.1
+#   OPENAI_BASE_URL=http://127.0.0.1:8099/v1 streamlit run Service/app.py
+#
+# La respuesta es un texto determinista derivado del prompt; con --fail-rate una parte de las
+# peticiones recibe un 429 con Retry-After para ejercitar los reintentos. --latency-ms es el tiempo
+# hasta el primer token y --token-ms el de cada palabra siguiente; con "stream": true se responde
+# con eventos SSE (chat.completion.chunk) como la API real.
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from http import HTTPStatus
+
+import bench_utils  # noqa: F401  (añade Service/ al path)
+from scoring_server import read_request, write_response
+
+PALABRAS = ("el", "reclamo", "presenta", "indicios", "que", "aconsejan", "revisar", "la", "documentación",
+            "del", "accidente", "y", "confirmar", "los", "datos", "de", "póliza", "con", "el", "asegurado")
+
+
+# Texto de respuesta determinista: mismo prompt, misma explicación
+def stub_text(messages, n_words):
+    seed = int(hashlib.sha256(json.dumps(messages, sort_keys=True).encode('utf-8')).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(PALABRAS) for _ in range(n_words)).capitalize() + '.'
+
+
+# Respuesta en streaming pendiente de escribir por la conexión
+class StreamReply:
+    def __init__(self, payload, words):
+        self.payload = payload
+        self.words = words
+
+
+class StubLLMServer:
+    def __init__(self, latency=0.5, fail_rate=0.0, n_words=300, seed=0, token_latency=0.0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.fail_rate = fail_rate
+        self.n_words = n_words
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def completion(self, payload):
+        text = stub_text(payload.get('messages', []), self.n_words)
+        return {
+            'id': f"chatcmpl-stub-{self.requests}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', 'stub'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': self.n_words, 'total_tokens': self.n_words},
+        }
+
+    async def handle(self, method, path, body):
+        if (method, path.split('?', 1)[0].rstrip('/')) == ('GET', '/stats'):
+            return HTTPStatus.OK, {'requests': self.requests, 'failures': self.failures,
+                                   'max_in_flight': self.max_in_flight}, {}
+        if (method, path.split('?', 1)[0].rstrip('/')) != ('POST', '/v1/chat/completions'):
+            return HTTPStatus.NOT_FOUND, {'error': {'message': f'Ruta no encontrada: {method} {path}'}}, {}
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if self.rng.random() < self.fail_rate:
+                self.failures += 1
+                return (HTTPStatus.TOO_MANY_REQUESTS,
+                        {'error': {'message': 'Rate limit (stub)', 'type': 'rate_limit_error'}},
+                        {'Retry-After': '0.05'})
+            payload = json.loads(body)
+            if payload.get('stream'):
+                words = stub_text(payload.get('messages', []), self.n_words).split(' ')
+                return HTTPStatus.OK, StreamReply(payload, words), {}
+            # Sin streaming la respuesta llega cuando el modelo ha generado todo el texto
+            await asyncio.sleep(self.token_latency * (self.n_words - 1))
+            return HTTPStatus.OK, self.completion(payload), {}
+        finally:
+            self.in_flight -= 1
+
+    # Eventos SSE con una palabra por fragmento (Transfer-Encoding: chunked para mantener la conexión)
+    async def write_stream(self, writer, reply):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: keep-alive\r\n\r\n")
+
+        async def send(data):
+            event = f"data: {data}\n\n".encode('utf-8')
+            writer.write(f"{len(event):x}\r\n".encode('ascii') + event + b"\r\n")
+            await writer.drain()
+
+        base = {'id': f"chatcmpl-stub-{self.requests}", 'object': 'chat.completion.chunk',
+                'created': int(time.time()), 'model': reply.payload.get('model', 'stub')}
+        for i, word in enumerate(reply.words):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            delta = {'role': 'assistant', 'content': word} if i == 0 else {'content': ' ' + word}
+            await send(json.dumps({**base, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]},
+                                  ensure_ascii=False))
+        await send(json.dumps({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}))
+        await send('[DONE]')
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload, extra = await self.handle(method, path, body)
+                if isinstance(payload, StreamReply):
+                    await self.write_stream(writer, payload)
+                else:
+                    await write_response(writer, status, payload, extra_headers=extra)
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port, ready=None):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        self.port = server.sockets[0].getsockname()[1]
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+    # Arranca el servidor en un hilo en segundo plano (para benchmarks); devuelve la URL base
+    def start_in_thread(self, host='127.0.0.1', port=0):
+        ready = threading.Event()
+        thread = threading.Thread(target=lambda: asyncio.run(self.serve(host, port, ready)), daemon=True)
+        thread.start()
+        ready.wait()
+        return f"http://{host}:{self.port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor simulado de chat completions')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency-ms', type=float, default=800)
+    parser.add_argument('--token-ms', type=float, default=0.0)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--words', type=int, default=300)
+    args = parser.parse_args()
+
+    server = StubLLMServer(latency=args.latency_ms / 1000, fail_rate=args.fail_rate, n_words=args.words,
+                           token_latency=args.token_ms / 1000)
+    print(f"Servidor LLM simulado en http://{args.host}:{args.port}/v1")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
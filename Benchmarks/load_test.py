@@ -0,0 +1,97 @@
+# Prueba de carga del servidor de puntuación (Service/scoring_server.py)
+#   python Benchmarks/load_test.py --url http://127.0.0.1:8080 --concurrency 32 --requests 2000
+# Cada cliente mantiene una conexión keep-alive y envía reclamos a /score uno tras otro.
+# Tras cada nivel de concurrencia se muestra el tiempo por etapa del pipeline según /metrics.
+import argparse
+import asyncio
+import json
+import re
+import time
+import urllib.request
+from urllib.parse import urlparse
+
+import bench_utils
+
+
+async def post(reader, writer, host, path, payload):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    writer.write((f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, path, claims, n_requests, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for i in range(n_requests):
+            inicio = time.perf_counter()
+            status = await post(reader, writer, host, path, claims[i % len(claims)])
+            latencies.append(time.perf_counter() - inicio)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run(url, concurrency, n_requests, claims):
+    parsed = urlparse(url)
+    latencies, errors = [], []
+    per_client = [n_requests // concurrency + (1 if i < n_requests % concurrency else 0) for i in range(concurrency)]
+    inicio = time.perf_counter()
+    await asyncio.gather(*(client(parsed.hostname, parsed.port or 80, '/score', claims, n, latencies, errors)
+                           for n in per_client if n))
+    return latencies, errors, time.perf_counter() - inicio
+
+
+# Suma y número de observaciones de los histogramas de etapas (y de miembros del ensemble) en /metrics
+def stage_totals(url):
+    with urllib.request.urlopen(url.rstrip('/') + '/metrics') as response:
+        text = response.read().decode('utf-8')
+    totals = {}
+    pattern = r'^fraude_(?:stage_seconds|member_predict_seconds)_(sum|count)\{(stage|member)="([^"]+)"\} (\S+)$'
+    for kind, label, name, value in re.findall(pattern, text, re.MULTILINE):
+        name = f"predict_proba:{name}" if label == 'member' else name
+        totals.setdefault(name, [0.0, 0])[0 if kind == 'sum' else 1] = float(value)
+    return totals
+
+
+def print_stages(before, after, elapsed):
+    for name, (total, count) in sorted(after.items()):
+        total -= before.get(name, (0.0, 0))[0]
+        count -= before.get(name, (0.0, 0))[1]
+        if count:
+            print(f"    {name:<22} {count:7.0f} llamadas  media={total / count * 1000:8.3f} ms  "
+                  f"({total / elapsed:6.1%} del tiempo)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    claims = bench_utils.synthetic_claims(500).to_dict('records')
+    for concurrency in args.concurrency:
+        before = stage_totals(args.url)
+        latencies, errors, elapsed = asyncio.run(run(args.url, concurrency, args.requests, claims))
+        resumen = bench_utils.summarize(latencies)
+        print(f"concurrencia={concurrency:<4} peticiones={len(latencies):<6} errores={len(errors):<4} "
+              f"p50={resumen['p50_ms']:8.2f} ms  p99={resumen['p99_ms']:8.2f} ms  "
+              f"rendimiento={len(latencies) / elapsed:8.1f} peticiones/s")
+        print_stages(before, stage_totals(args.url), elapsed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+# Benchmark reproducible del servicio: reproduce los reclamos de Data/data_raw.csv, convertidos
+# a los campos del formulario, a través de model_service (de uno en uno) y de score_batch con
+# varios tamaños de lote.
+#   python Benchmarks/replay_bench.py --batch-sizes 1 16 256 4096 --output resultados.json
+#   python Benchmarks/replay_bench.py --baseline resultados.json --max-regression 0.10
+#   python Benchmarks/replay_bench.py --compare antes.json despues.json
+#
+# Por escenario se guardan filas/s, latencias p50/p95/p99 por llamada, pico de memoria residente
+# y el tiempo medio de cada etapa del pipeline (según metrics.py). Con --baseline el proceso
+# termina con código 1 si algún escenario empeora más de --max-regression.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import bench_utils
+
+FORMAT_VERSION = 1
+# Métricas comparadas entre ejecuciones y si un valor mayor es mejor
+COMPARED = {'rows_per_s': True, 'p50_ms': False, 'p95_ms': False, 'p99_ms': False}
+# Con menos llamadas los percentiles altos son ruido y no se comparan
+MIN_TAIL_CALLS = 100
+
+
+def replay_claims(limit=None):
+    from raw_claims import raw_to_form
+
+    path = os.path.join(bench_utils.DATA_DIR, 'data_raw.csv')
+    raw = pd.read_csv(path, encoding='utf-8-sig', dtype=str)
+    form = raw_to_form(raw, path).reset_index(drop=True)
+    return form if limit is None else form.iloc[:limit]
+
+
+# Suma y número de observaciones de cada etapa en los histogramas del proceso
+def stage_totals():
+    import metrics
+
+    totals = {}
+    for histogram, prefix in ((metrics.STAGE_SECONDS, ''), (metrics.MEMBER_SECONDS, 'predict_proba:')):
+        for key, (total, count) in histogram.snapshot().items():
+            totals[prefix + key[0]] = (total, count)
+    return totals
+
+
+def stage_means(before, after):
+    means = {}
+    for name, (total, count) in sorted(after.items()):
+        total -= before.get(name, (0.0, 0))[0]
+        count -= before.get(name, (0.0, 0))[1]
+        if count:
+            means[name] = total / count * 1000
+    return means
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=bench_utils.BASE_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    import api_backend
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'commit': git_commit(),
+        'artifacts_version': api_backend.registry.version,
+        'fast_path': api_backend.registry.get('fast_predictor') is not None,
+    }
+
+
+# Ejecuta fn sobre cada lote de `claims` y devuelve el resumen del escenario
+def run_scenario(name, fn, claims, batch_size, repeat):
+    import api_backend
+
+    bench_utils.reset_peak_rss()
+    before = stage_totals()
+    latencias, throughputs = [], []
+    for _ in range(repeat):
+        # Cada pasada parte de la caché de resultados vacía: si no, las repeticiones no pasarían por los modelos
+        api_backend.score_cache.clear()
+        inicio = time.perf_counter()
+        for start in range(0, len(claims), batch_size):
+            batch = claims.iloc[start:start + batch_size]
+            t = time.perf_counter()
+            fn(batch)
+            latencias.append(time.perf_counter() - t)
+        throughputs.append(len(claims) / (time.perf_counter() - inicio))
+    resumen = bench_utils.summarize(latencias)
+    return {
+        'name': name,
+        'batch_size': batch_size,
+        'rows': len(claims),
+        'calls': resumen['n'],
+        'rows_per_s': float(np.median(throughputs)),
+        'p50_ms': resumen['p50_ms'],
+        'p95_ms': resumen['p95_ms'],
+        'p99_ms': resumen['p99_ms'],
+        'mean_ms': resumen['mean_ms'],
+        'peak_rss_mb': bench_utils.peak_rss_mb(),
+        'stages_ms': stage_means(before, stage_totals()),
+    }
+
+
+def run(args):
+    import api_backend
+
+    inicio = time.perf_counter()
+    bench_utils.reset_peak_rss()
+    claims = replay_claims(args.limit)
+    conversion = {'name': 'raw_to_form', 'rows': len(claims), 'seconds': time.perf_counter() - inicio,
+                  'peak_rss_mb': bench_utils.peak_rss_mb()}
+
+    inicio = time.perf_counter()
+    bench_utils.reset_peak_rss()
+    api_backend.warm_up()
+    warm = {'name': 'warm_up', 'seconds': time.perf_counter() - inicio, 'peak_rss_mb': bench_utils.peak_rss_mb()}
+
+    scenarios = []
+    for batch_size in args.batch_sizes:
+        if batch_size == 1:
+            # Un reclamo por llamada, como la aplicación: muestra fija de los primeros reclamos
+            sample = claims.iloc[:args.single_claims]
+            api_backend.model_service(sample.iloc[:1])
+            scenarios.append(run_scenario('model_service', api_backend.model_service, sample, 1, args.repeat))
+        else:
+            api_backend.score_batch(claims.iloc[:batch_size])
+            scenarios.append(run_scenario(f'score_batch[{batch_size}]', api_backend.score_batch,
+                                          claims, batch_size, args.repeat))
+        print_scenario(scenarios[-1])
+    return {
+        'format': FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': environment(),
+        'config': {'batch_sizes': args.batch_sizes, 'repeat': args.repeat, 'limit': args.limit,
+                   'single_claims': args.single_claims},
+        'setup': [conversion, warm],
+        'scenarios': scenarios,
+    }
+
+
+def print_scenario(s):
+    print(f"{s['name']:<20} {s['rows_per_s']:10,.0f} filas/s  p50={s['p50_ms']:9.3f} ms  "
+          f"p95={s['p95_ms']:9.3f} ms  p99={s['p99_ms']:9.3f} ms  RSS pico={s['peak_rss_mb']:7.1f} MB")
+    etapas = '  '.join(f"{name}={ms:.3f}" for name, ms in s['stages_ms'].items())
+    print(f"{'':<20} etapas (ms/llamada): {etapas}")
+
+
+def compared_metrics(before, scenario):
+    tail = min(before['calls'], scenario['calls']) >= MIN_TAIL_CALLS
+    return [metric for metric in COMPARED
+            if before[metric] > 0 and (tail or metric not in ('p95_ms', 'p99_ms'))]
+
+
+# Escenarios que empeoran más del umbral relativo: lista de (escenario, métrica, antes, ahora, cambio)
+def compare(baseline, current, max_regression):
+    previous = {s['name']: s for s in baseline['scenarios']}
+    regressions = []
+    for scenario in current['scenarios']:
+        before = previous.get(scenario['name'])
+        if before is None:
+            continue
+        for metric in compared_metrics(before, scenario):
+            old, new = before[metric], scenario[metric]
+            higher_is_better = COMPARED[metric]
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            if worse > max_regression:
+                regressions.append((scenario['name'], metric, old, new, change))
+    return regressions
+
+
+def print_comparison(baseline, current, max_regression):
+    previous = {s['name']: s for s in baseline['scenarios']}
+    print(f"\nComparación con {baseline['environment'].get('commit') or 'la referencia'} "
+          f"(umbral de regresión {max_regression:.0%}):")
+    for scenario in current['scenarios']:
+        before = previous.get(scenario['name'])
+        if before is None:
+            print(f"  {scenario['name']:<20} (sin referencia)")
+            continue
+        cambios = '  '.join(
+            f"{metric}={(scenario[metric] - before[metric]) / before[metric]:+.1%}"
+            for metric in compared_metrics(before, scenario))
+        print(f"  {scenario['name']:<20} {cambios}")
+    regressions = compare(baseline, current, max_regression)
+    for name, metric, old, new, change in regressions:
+        print(f"REGRESIÓN {name} {metric}: {old:.3f} -> {new:.3f} ({change:+.1%})")
+    return regressions
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        results = json.load(f)
+    if results.get('format') != FORMAT_VERSION:
+        raise SystemExit(f"{path}: formato de resultados no compatible ({results.get('format')})")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark del servicio con los reclamos de data_raw.csv')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 16, 256, 4096],
+                        help='Tamaños de lote (1: model_service de un reclamo por llamada)')
+    parser.add_argument('--single-claims', type=int, default=500,
+                        help='Reclamos para el escenario de un reclamo por llamada')
+    parser.add_argument('--limit', type=int, default=None, help='Usar solo los primeros N reclamos')
+    parser.add_argument('--repeat', type=int, default=1, help='Pasadas por escenario (se usa la mediana)')
+    parser.add_argument('--output', help='Fichero JSON en el que guardar los resultados')
+    parser.add_argument('--baseline', help='Resultados anteriores con los que comparar')
+    parser.add_argument('--max-regression', type=float, default=0.10,
+                        help='Empeoramiento relativo máximo admitido frente a --baseline')
+    parser.add_argument('--compare', nargs=2, metavar=('ANTES', 'DESPUES'),
+                        help='Solo comparar dos ficheros de resultados')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        baseline, current = (load_results(path) for path in args.compare)
+    else:
+        baseline = load_results(args.baseline) if args.baseline else None
+        warnings.filterwarnings('ignore')
+        current = run(args)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(current, f, ensure_ascii=False, indent=2)
+            print(f"Resultados guardados en {args.output}")
+    if baseline is not None and print_comparison(baseline, current, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,49 @@
 # Librerías a utilizar
 import json
+import logging
 import pickle
-import joblib
 import numpy as np
 import pandas as pd
-import shap
 import os
-from openai import OpenAI
-from openai.types.chat import ChatCompletionMessageParam
+import warnings
 from dotenv import load_dotenv
+from registry import ModelRegistry
+from preprocessing import compile_plan
+from ensemble import EnsembleEngine
+from fast_predictor import FastPredictor, source_fingerprint
+from native_artifacts import load_native_explainer, load_native_models
+from recomendaciones import LINK_RULES, append_masks, evaluate_rules, expand_masks
+from shap_explanations import ShapExplanations, plot_summary
+from llm_explanations import ExplanationCache, ExplanationService
+from metrics import CACHE_LOOKUPS, ROWS_SCORED, timed
+from score_cache import ScoreCache, row_digest, row_keys
+from drift_monitor import BASELINE_NAME, DriftBaseline, DriftMonitor
+from linkage_index import CLAIM_FIELD, LINK_COLUMNS, POLICY_FIELD, REP_FIELD, LinkageIndex
 # Carga las variables de entorno
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Rutas de Artifacts
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ARTIFACTS_DIR = os.path.join(BASE_DIR, '../Artifacts')
 
-# Carga de modelos
-def load_models():
+# Carga de modelos: los miembros del ensemble se descubren desde ensemble_config.json.
+# Los exportados con native_artifacts.py se cargan en formato nativo; el resto, desde su pickle.
+def load_models(config=None, native=True):
+    config = config or load_ensemble_config()
+    available = load_native_models(ARTIFACTS_DIR, config['weights']) if native else {}
     models = {}
-    models['logreg'] = joblib.load(os.path.join(ARTIFACTS_DIR, 'model_logreg.pkl'))
-    models['rf'] = joblib.load(os.path.join(ARTIFACTS_DIR, 'model_rf.pkl'))
-    models['xgb'] = joblib.load(os.path.join(ARTIFACTS_DIR, 'model_xgb.pkl'))
-    models['lgbm'] = joblib.load(os.path.join(ARTIFACTS_DIR, 'model_lgbm.pkl'))
+    for model_name in config['weights']:
+        if model_name in available:
+            models[model_name] = available[model_name]
+            continue
+        import joblib
+        path = os.path.join(ARTIFACTS_DIR, f'model_{model_name}.pkl')
+        if not os.path.exists(path):
+            warnings.warn(f"No se encuentra el modelo '{model_name}' ({path})")
+            continue
+        models[model_name] = joblib.load(path)
     return models
 
 # Configuración del ensemble
@@ -43,259 +64,358 @@ def load_feature_cols():
         feature_cols = pickle.load(f)
     return feature_cols
 
-# Carga del explainer de SHAP previamente guardado
-def load_shap_explainer():
+# Carga del explainer de SHAP: sobre el booster nativo si está exportado, si no desde el pickle
+def load_shap_explainer(native=True):
+    explainer = load_native_explainer(ARTIFACTS_DIR) if native else None
+    if explainer is not None:
+        return explainer
+    import joblib
     explainer = joblib.load(os.path.join(ARTIFACTS_DIR, 'explainer.pkl'))
     return explainer
 
-# Preprocesamiento de datos según el io_schema
-def preprocess_data(data, schema, feature_cols):
-    col_map = [
+# Predictor compilado (fast_predictor.py); se descarta si los modelos han cambiado desde la exportación
+def load_fast_predictor(config=None):
+    path = os.path.join(ARTIFACTS_DIR, 'fast_predictor.npz')
+    if not os.path.exists(path):
+        return None
+    config = config or load_ensemble_config()
+    predictor = FastPredictor.load(path)
+    if predictor.meta['sources'] != source_fingerprint(ARTIFACTS_DIR, config):
+        warnings.warn(f"El predictor compilado {path} no corresponde a los modelos actuales; se ignora")
+        return None
+    return predictor
+
+# Línea base de la deriva (drift_monitor.py); se descarta si los modelos han cambiado desde que se calculó
+def load_drift_baseline(config=None):
+    path = os.path.join(ARTIFACTS_DIR, BASELINE_NAME)
+    if not os.path.exists(path):
+        return None
+    config = config or load_ensemble_config()
+    baseline = DriftBaseline.load(path)
+    if baseline.spec.get('sources') != source_fingerprint(ARTIFACTS_DIR, config):
+        warnings.warn(f"La línea base de deriva {path} no corresponde a los modelos actuales; se ignora")
+        return None
+    return baseline
+
+# Motor del ensemble. Al recargar Artifacts/ se crea uno nuevo y se cierra el anterior (su executor);
+# las peticiones que aún lo usan terminan evaluando los miembros en secuencia
+_ensemble = None
+
+def load_ensemble():
+    global _ensemble
+    engine = EnsembleEngine(registry.get('models'), registry.get('config'))
+    previous, _ensemble = _ensemble, engine
+    if previous is not None:
+        previous.close()
+    return engine
+
+# Registro de artefactos: se cargan una vez por proceso y se recargan si cambia Artifacts/
+registry = ModelRegistry(ARTIFACTS_DIR, {
+    'models': lambda: load_models(registry.get('config')),
+    'ensemble': load_ensemble,
+    'fast_predictor': lambda: load_fast_predictor(registry.get('config')),
+    'config': load_ensemble_config,
+    'schema': load_io_schema,
+    'feature_cols': load_feature_cols,
+    'explainer': load_shap_explainer,
+    'plan': lambda: build_transform_plan(registry.get('schema'), registry.get('feature_cols')),
+    'drift_baseline': lambda: load_drift_baseline(registry.get('config')),
+})
+
+# Precarga de los artefactos al arrancar el servicio; el explainer de SHAP solo si se va a usar
+def warm_up(explainer=False):
+    names = ['config', 'models', 'ensemble', 'fast_predictor', 'schema', 'feature_cols', 'plan', 'drift_baseline']
+    if explainer:
+        names.append('explainer')
+    return registry.warm_up(names)
+
+# Variables que en los datos originales venían en rangos y su valor medio en el entrenamiento
+COL_MAP = [
     {'PastNumberOfClaims': {'none': 0, '1': 1, '2 to 4': 3, 'more than 4': 5}},
     {'AgeOfPolicyHolder': {'16 to 17': 16.5, '18 to 20': 19, '21 to 25': 23, '26 to 30': 28, '31 to 35': 33, '36 to 40': 38, '41 to 50': 45.5, '51 to 65': 58, 'over 65': 66}},
     {'NumberOfSuppliments': {'none': 0, '1 to 2': 1.5, '3 to 5': 4, 'more than 5': 6}},
     {'VehiclePrice': {'20000 to 29000': 24500, '30000 to 39000': 34500, '40000 to 59000': 49500, '60000 to 69000': 64500, 'less than 20000': 15000, 'more than 69000': 70000}},
     {'Days_Policy_Accident': {'none': 0, '1 to 7': 4, '8 to 15': 11.5, '15 to 30': 22.5, 'more than 30': 35}},
     {'Days_Policy_Claim': {'none': 0, '8 to 15': 11.5, '15 to 30': 22.5, 'more than 30': 35}},
-    {'NumberOfCars': {'1 vehicle': 1, '2 vehicles': 2, '3 to 4': 3.5, '5 to 8': 6.5, 'more than 8': 9}} ]
-    # Renombrado de columnas según esquema
-    rename_map = {}
-    for feature, info in schema.items():
-        if 'original' in info:
-            rename_map[feature] = info['original']
-    data.rename(columns=rename_map, inplace=True)
-    renamed_schema = {}
-    for feature, info in schema.items():
-        if 'original' in info:
-            renamed_schema[rename_map.get(feature, feature)] = info
-    # Iteración sobre cada columna del esquema para aplicar transformaciones
-    for feature, info in renamed_schema.items():
-        print(f"Procesando la columna: {feature}, tipo en esquema: {info['type']}")
-        # FECHAS
-        if info['type'] == 'date':
-            data[feature] = pd.to_datetime(data[feature], format='%d/%m/%Y')
-        # CATEGÓRICAS
-        elif info['type'] == 'categorical':
-            data[feature] = data[feature].map(info['options'])
-        # NUMÉRICAS
-        elif info['type'] == 'numeric':
-            data[feature] = pd.to_numeric(data[feature], errors='coerce')
-            # Aproximación a la media si la variable estaba en rangos
-            for col_dict in col_map:
-                if feature in col_dict:
-                    mapping_values = list(col_dict[feature].values())
-                    # Conversión EUR → USD para el precio del vehículo
-                    eur_to_usd = 1 / 0.86 
-                    if feature == 'VehiclePrice':
-                        data[feature] = data[feature] * eur_to_usd
-                    # Redondeo al más próximo
-                    def round_to_closest(value):
-                        arr = np.array(mapping_values)
-                        idx = (np.abs(arr - value)).argmin()
-                        return arr[idx]
-                    data[feature] = data[feature].apply(round_to_closest)
-        # DERIVADAS
-        elif info.get('derived', False) or str(info['type']).lower() in ['derived', 'derived_numeric']:
-            sources = info['from']
-            if len(sources) == 1:
-                col_source = rename_map.get(sources[0], sources[0])
-                if col_source not in data.columns:
-                    raise KeyError(f"Columna fuente '{col_source}' no encontrada en el DataFrame")
-                data[col_source] = pd.to_datetime(data[col_source], errors='coerce')
-                if 'options' in info:
-                    if 'month' in feature.lower():
-                        data[feature] = data[col_source].dt.strftime('%b').map(info['options'])
-                    elif 'dayofweek' in feature.lower():
-                        data[feature] = data[col_source].dt.day_name().map(info['options'])
-                else:
-                    # WeekOfMonth
-                    data[feature] = ((data[col_source].dt.day - 1) // 7 + 1).astype(int)
-            elif len(sources) == 2:  
-                col1, col2 = sources
-                if col1 not in data.columns or col2 not in data.columns:
-                    print("Columnas fuente que faltan:", col1, col2)
-                    continue 
-                data[col1] = pd.to_datetime(data[col1], format="%d/%m/%Y", errors="coerce", dayfirst=True)
-                data[col2] = pd.to_datetime(data[col2], format="%d/%m/%Y", errors="coerce", dayfirst=True)
-                data[feature] = (data[col2] - data[col1]).dt.days
-    print(f"Columnas en los datos: {data.columns}")
-    missing_cols = [col for col in feature_cols if col not in data.columns]
-    if missing_cols:
-        raise ValueError(f"Faltan columnas requeridas: {missing_cols}")
-    else:
-        data = data[feature_cols]
-        return data
+    {'NumberOfCars': {'1 vehicle': 1, '2 vehicles': 2, '3 to 4': 3.5, '5 to 8': 6.5, 'more than 8': 9}}
+]
+
+# Conversión EUR → USD para el precio del vehículo
+EUR_TO_USD = 1 / 0.86
+
+# Compilación del io_schema en un plan de transformación (valida el esquema al cargarlo)
+def build_transform_plan(schema, feature_cols):
+    return compile_plan(schema, feature_cols, COL_MAP, scales={'VehiclePrice': EUR_TO_USD})
+
+# Preprocesamiento de datos según el io_schema
+def preprocess_data(data, schema, feature_cols, plan=None):
+    if plan is None:
+        plan = build_transform_plan(schema, feature_cols)
+    with timed('preprocess'):
+        data = plan.execute(data)
+    logger.debug("Columnas en los datos: %s", list(data.columns))
+    return data
+
+# Hasta este número de filas el predictor compilado es más rápido que los modelos originales;
+# por encima compensa la evaluación vectorizada de cada librería
+FAST_PATH_MAX_ROWS = 256
+
+# Motor con el que puntuar n_rows reclamos: el predictor compilado si está exportado y al día.
+# Las filas con nulos (p. ej. una categoría desconocida) van al ensemble si el compilado no los admite,
+# para que el error sea el mismo que sin el predictor compilado
+def select_engine(n_rows, has_nan=False):
+    predictor = registry.get('fast_predictor')
+    if predictor is not None and n_rows <= FAST_PATH_MAX_ROWS and (predictor.accepts_nan or not has_nan):
+        return predictor
+    return registry.get('ensemble')
+
+# Clasificador de riesgo: bajo por debajo del umbral, medio hasta MARGEN_RIESGO por encima, alto después
+NIVELES_RIESGO = ['Bajo riesgo', 'Riesgo medio', 'Alto riesgo']
+MARGEN_RIESGO = 0.1
 
-# Clasificador de riesgo
 def clasificar_riesgo(score, threshold):
     if score < threshold:
         return 'Bajo riesgo'
-    elif score < threshold + 0.1:
+    elif score < threshold + MARGEN_RIESGO:
         return 'Riesgo medio'
     else:
         return 'Alto riesgo'
 
-# Generador de recomendaciones
+# Generador de recomendaciones (reglas de negocio evaluadas sobre todo el DataFrame)
 def generar_recomendaciones(data):
-    recomendaciones = []
-    for idx, row in data.iterrows():
-        fila = []
-        if row.get('NumberOfSuppliments', 0) > 0:
-            fila.append("Consultar los documentos suplementarios adjuntos al reclamo.")
-        if row.get('WitnessPresent', 0) == 1:
-            fila.append("Solicitar testimonio o contacto del testigo.")
-        if row.get('PoliceReportFiled', 0) == 1:
-            fila.append("Revisar el informe policial relacionado con el accidente.")
-        fila.append("Confirmar la responsabilidad declarada por el asegurado.")
-        if row.get('PastNumberOfClaims', 0) > 6:
-            fila.append("Historial de reclamos elevado: revisar patrones o recurrencia.")
-        if row.get('Days_Policy_Accident', 999) < 30:
-            fila.append("El accidente ocurrió poco después de contratar la póliza: revisar con atención.")
-        if row.get('AddressChange_Claim', 1) in [0, 2, 3]:
-            fila.append("El asegurado cambió de domicilio recientemente: validar veracidad del cambio.")
-        if row.get('VehiclePrice', 0) > 65500:
-            fila.append("Vehículo de alto valor: considerar inspección más exhaustiva.")
-        if row.get('AgentType', 1) == 0:
-            fila.append("Agente externo involucrado: revisar consistencia de la documentación.")
-        if row.get('AgeOfPolicyHolder', 100) < 21:
-            fila.append("Corroborar historial del asegurado por edad especialmente joven.")
-        if row.get('VehicleCategory', -1) == 1:
-            fila.append("Evaluar el contexto del accidente por tratarse de un vehículo deportivo.")
-        if row.get('BasePolicy', -1) == 0:
-            fila.append("Evaluar nivel de cobertura total de la póliza por posible incentivo a fraude.")
-        if (
-            row.get('WitnessPresent', 0) == 0 and
-            row.get('PoliceReportFiled', 0) == 0 and
-            row.get('NumberOfSuppliments', 0) == 0
-        ):
-            fila.append("Falta total de respaldo documental: enviar perito o iniciar investigación formal.")
-        if not fila:
-            fila.append("No se identificaron recomendaciones automáticas. Evaluar manualmente.")
-        recomendaciones.append(fila)
-    return recomendaciones
+    return expand_masks(evaluate_rules(data))
+
+# Índice de vínculos por póliza y agente (linkage_index.py): se construye con el histórico la primera
+# vez que llega un reclamo identificado (LINKAGE_HISTORY vacío: sin histórico) y crece con cada reclamo.
+# Las filas del histórico llevan su número de reclamo, así que al volver a puntuarlas no se encuentran a sí mismas.
+LINKAGE_HISTORY = os.getenv('LINKAGE_HISTORY', os.path.join(BASE_DIR, '../Data/data_raw.csv'))
+linkage_index = LinkageIndex(LINKAGE_HISTORY or None)
+
+# Identificadores de cada reclamo para el índice de vínculos: pólizas, agentes y números de reclamo
+# (sin número, cada envío cuenta como un reclamo nuevo); None si no trae póliza ni agente
+def identificar_reclamos(data):
+    if POLICY_FIELD not in data.columns and REP_FIELD not in data.columns:
+        return None
+    policies, reps, claims = data.get(POLICY_FIELD), data.get(REP_FIELD), data.get(CLAIM_FIELD)
+    return tuple(None if values is None else values.tolist() for values in (policies, reps, claims))
+
+# Vínculos de un lote ya puntuado (resultado de puntuar_lote): consulta el índice, añade las columnas de
+# LINK_COLUMNS y las recomendaciones de las reglas de vínculos, y solo después registra los reclamos
+def vincular_lote(result, ids):
+    if ids is None:
+        return result
+    with timed('linkage'):
+        vinculos = pd.DataFrame(linkage_index.link(*ids), index=result.index)
+        append_masks(result['recomendaciones'].tolist(), evaluate_rules(vinculos, LINK_RULES))
+        result = pd.concat([result, vinculos], axis=1)
+        linkage_index.register(*ids)
+    return result
+
+# Caché de resultados por vector preprocesado (SCORE_CACHE_SIZE=0 la desactiva; TTL en segundos)
+score_cache = ScoreCache(int(os.getenv('SCORE_CACHE_SIZE', '20000')), float(os.getenv('SCORE_CACHE_TTL', '3600')))
+
+# Probabilidad de cada miembro y score ponderado. Las filas repetidas del lote se agrupan y solo los
+# vectores únicos que no están en la caché pasan por el ensemble; el resultado se reparte después.
+# matrix: las variables de data en float64 y en el orden de feature_cols, si ya se tienen
+def predict_unique(data, matrix=None):
+    if matrix is None:
+        matrix = data[registry.get('feature_cols')].to_numpy(dtype=np.float64)
+    keys = row_keys(matrix)
+    unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    digests = [row_digest(key) for key in unique]
+    ensemble = select_engine(len(unique), bool(np.isnan(matrix).any()))
+    members = list(ensemble.members)
+    # Los miembros forman parte de la versión: el orden de las columnas de la tabla depende de ellos
+    version = (registry.version, tuple(members))
+    cached = score_cache.get_many(digests, version)
+    missing = [i for i, value in enumerate(cached) if value is None]
+    # Fila i de la tabla: [score, probabilidad de cada miembro] del vector único i
+    table = np.empty((len(unique), 1 + len(members)))
+    for i, value in enumerate(cached):
+        if value is not None:
+            table[i] = value
+    if missing:
+        with timed('predict'):
+            preds, scores = ensemble.predict(data.iloc[first[missing]])
+        computed = np.column_stack([scores] + [preds[name] for name in members])
+        table[missing] = computed
+        score_cache.put_many([digests[i] for i in missing], list(computed), version)
+    per_row_missing = np.isin(inverse, missing)
+    n_hits = int(len(data) - per_row_missing.sum())
+    CACHE_LOOKUPS.inc(n_hits, cache='score', result='hit')
+    CACHE_LOOKUPS.inc(len(missing), cache='score', result='miss')
+    CACHE_LOOKUPS.inc(int(per_row_missing.sum()) - len(missing), cache='score', result='duplicate')
+    ROWS_SCORED.inc(len(missing), engine='fast' if isinstance(ensemble, FastPredictor) else 'ensemble')
+    ROWS_SCORED.inc(len(data) - len(missing), engine='cache')
+    rows = table[inverse]
+    return ensemble, {name: rows[:, 1 + j] for j, name in enumerate(members)}, rows[:, 0]
+
+# Deriva de los datos: cada lote puntuado se suma a los histogramas del monitor (memoria constante).
+# DRIFT_HALF_LIFE: filas tras las que lo ya observado pesa la mitad (0: acumulado desde el arranque)
+drift_monitor = DriftMonitor(float(os.getenv('DRIFT_HALF_LIFE', '0')) or None)
+
+def observar_deriva(data, scores=None):
+    with timed('drift'):
+        drift_monitor.observe(registry.get('drift_baseline'), data, scores)
+
+# Conteos de deriva de un lote puntuado en otro proceso (DriftMonitor.snapshot de ese proceso)
+def sumar_deriva(counts, rows):
+    drift_monitor.add_counts(registry.get('drift_baseline'), counts, rows)
+
+# Informe de deriva por variable (PSI, KS y nivel); vacío si no hay línea base o aún no hay reclamos
+def informe_deriva():
+    return drift_monitor.report()
+
+# Predicción, riesgo y recomendaciones de datos ya preprocesados, con tiempos por etapa.
+# matrix: las variables de data en float64 y en el orden de feature_cols, si ya se tienen
+def score_features(data, matrix=None):
+    if matrix is None:
+        matrix = data[registry.get('feature_cols')].to_numpy(dtype=np.float64)
+    ensemble, preds, scores = predict_unique(data, matrix)
+    observar_deriva(matrix, scores)
+    threshold = ensemble.threshold
+    with timed('risk'):
+        riesgos = [clasificar_riesgo(score, threshold) for score in scores]
+    with timed('recommendations'):
+        recomendaciones = generar_recomendaciones(data)
+    return ensemble, preds, scores, riesgos, recomendaciones
 
 # Función principal de servicio
 def model_service(data):
-    # Llamada a las cargaas
-    models = load_models()
-    config = load_ensemble_config()
-    schema = load_io_schema()
-    feature_cols = load_feature_cols() 
-    # Preprocesado
-    data= preprocess_data(data, schema, feature_cols)
-    print("\nDatos preprocesados:")
-    for col, val in data.iloc[0].items():
-        print(f"{col}: {val}")
-    # Predicciones
-    preds = {}
-    for model_name, model in models.items():
-        preds[model_name] = model.predict_proba(data)[:, 1] 
-        print(f"Predicciones de {model_name}: {preds[model_name]}")
-    scores = sum(preds[model_name] * config['weights'][model_name] for model_name in models)
-    print("Predicciones ponderadas (scores):", scores)
-    threshold = config['threshold']
-    riesgos = [clasificar_riesgo(score, threshold) for score in scores]
-    recomendaciones = generar_recomendaciones(data)
-    for i in range(len(scores)):
-        print(f"Riesgo: {riesgos[i]}")
-        print("Recomendaciones:")
-        for rec in recomendaciones[i]:
-            print(f" - {rec}")
-    # Explainer
-    explainer = load_shap_explainer()
-    # Explicar las predicciones usando el explainer cargado
-    if 'lgbm' in models:
-        shap_values = explainer.shap_values(data)
-        shap.summary_plot(shap_values, data)
-    else:
-        print("Modelo no encontrado en los modelos cargados.")
-    return {
+    # Artefactos desde el registro (solo se leen de disco la primera vez o si cambian)
+    schema = registry.get('schema')
+    feature_cols = registry.get('feature_cols')
+    reclamos = data
+    # Preprocesado con el plan compilado del esquema
+    data = preprocess_data(data, schema, feature_cols, plan=registry.get('plan'))
+    ensemble, preds, scores, riesgos, recomendaciones = score_features(data)
+    # Detalle del cálculo solo con LOG_LEVEL=DEBUG
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Datos preprocesados: %s", data.iloc[0].to_dict())
+        for model_name in ensemble.members:
+            logger.debug("Predicciones de %s: %s", model_name, preds[model_name])
+        logger.debug("Predicciones ponderadas (scores): %s", scores)
+        for riesgo, recs in zip(riesgos, recomendaciones):
+            logger.debug("Riesgo: %s. Recomendaciones: %s", riesgo, recs)
+    # Vínculos con los reclamos anteriores, si trae identificadores (se registra una vez puntuado)
+    vinculado = vincular_lote(pd.DataFrame({'recomendaciones': recomendaciones}, index=data.index),
+                              identificar_reclamos(reclamos))
+    resultado = {
         "score": round(float(scores[0]), 2),
         "riesgo": riesgos[0],
-        "recomendaciones": recomendaciones[0]
-    }    
+        "recomendaciones": vinculado['recomendaciones'].iloc[0]
+    }
+    if LINK_COLUMNS[0] in vinculado.columns:
+        resultado["vinculos"] = vinculos_a_dict(vinculado[LINK_COLUMNS].iloc[0])
+    return resultado
+
+# Vínculos de un reclamo como diccionario serializable (sin tasa: None)
+def vinculos_a_dict(fila):
+    return {column: (None if pd.isna(value) else round(float(value), 4)) for column, value in fila.items()}
+
+# Puntuación de un lote de reclamos (formato del formulario) sin consultar el índice de vínculos: devuelve
+# el resultado y los identificadores para vincular_lote. score_claims.py puntúa así los bloques en varios
+# procesos y los vincula en el principal, en el orden de entrada.
+# Con cascade=True, puntuación en cascada (ensemble.predict_band): el nivel de riesgo es el mismo, pero
+# cada reclamo deja de evaluarse en cuanto los miembros que faltan ya no pueden cambiarlo; se devuelve el
+# intervalo del score y, con exact=True, el score exacto (evaluando todos los miembros).
+def puntuar_lote(data, cascade=False, exact=False):
+    feature_cols = registry.get('feature_cols')
+    features = preprocess_data(data, registry.get('schema'), feature_cols, plan=registry.get('plan'))
+    matrix = features[feature_cols].to_numpy(dtype=np.float64)
+    if not cascade:
+        _, _, scores, riesgos, recomendaciones = score_features(features, matrix)
+        result = pd.DataFrame({
+            'score': scores,
+            'riesgo': riesgos,
+            'recomendaciones': recomendaciones
+        }, index=features.index)
+        return result, identificar_reclamos(data)
+    ensemble = registry.get('ensemble')
+    with timed('predict'):
+        band = ensemble.predict_band(features, [ensemble.threshold, ensemble.threshold + MARGEN_RIESGO], exact=exact)
+    # Sin score exacto solo se observan las variables
+    observar_deriva(matrix, band['score'])
+    with timed('recommendations'):
+        recomendaciones = generar_recomendaciones(features)
+    ROWS_SCORED.inc(len(features), engine='cascade')
+    columns = {'riesgo': [NIVELES_RIESGO[level] for level in band['band']],
+               'score_min': band['lower'], 'score_max': band['upper']}
+    if exact:
+        columns['score'] = band['score']
+    columns['recomendaciones'] = recomendaciones
+    return pd.DataFrame(columns, index=features.index), identificar_reclamos(data)
+
+# Puntuación de un lote de reclamos (formato del formulario), sin SHAP ni salida por pantalla
+# (con número de póliza o de agente se añaden las columnas del índice de vínculos)
+def score_batch(data):
+    return vincular_lote(*puntuar_lote(data))
+
+# Puntuación en cascada (puntuar_lote con cascade=True), con los vínculos como en score_batch
+def score_batch_cascade(data, exact=False):
+    return vincular_lote(*puntuar_lote(data, cascade=True, exact=exact))
+
+# Explicaciones SHAP (llamada separada y opcional): contribución de cada variable por reclamo.
+# Se cachean por vector preprocesado y solo se dibuja el gráfico si se pide.
+shap_explanations = ShapExplanations(lambda: registry.get('explainer'))
+
+def explicar_reclamos(data, plot=False):
+    features = preprocess_data(data, registry.get('schema'), registry.get('feature_cols'), plan=registry.get('plan'))
+    with timed('shap'):
+        values = shap_explanations.explain(features, version=registry.version)
+    if plot:
+        plot_summary(values, features)
+    return pd.DataFrame(values, index=features.index, columns=features.columns)
+
+# Capa de IA: un cliente reutilizado y caché persistente de explicaciones ya generadas
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join(BASE_DIR, 'llm_cache.db'))
+explicaciones = ExplanationService(ExplanationCache(LLM_CACHE_PATH))
 
-# Capa de IA
 def generar_explicacion_llm(resultado, entrada, api_key):
-    import json
-    client = OpenAI(api_key=api_key)
-    # Serializar entrada como texto legible
-    entrada_legible = json.dumps({k: str(v) for k, v in entrada.items()}, ensure_ascii=False)
-    messages: list[ChatCompletionMessageParam] = [
-    {
-        "role": "system",
-        "content": (
-            "Eres un asistente experto en detección de fraudes en seguros de vehículos. "
-            "Tu tarea es explicar de manera clara y sencilla, pero profesional, por qué un reclamo fue clasificado con un nivel de riesgo determinado, "
-            "basándote únicamente en la información proporcionada del caso y en las recomendaciones automáticas generadas. "
-            "El texto debe estar dirigido a un empleado del área de siniestros, sin conocimientos técnicos. "
-            "No menciones puntuaciones, modelos, scores ni variables técnicas. "
-            "En su lugar, elabora una explicación comprensible que justifique el riesgo percibido y las acciones sugeridas. "
-            "No debes saludar al empleado ni referirte a él directamente. "
-            "Además, nunca dejes la explicación incompleta. Debes garantizar que la explicación esté totalmente terminada, "
-            "sin dejar dudas o puntos sin resolver."
-            "Para la explicación, puedes basarte en patrones comunes de riesgo. Algunos ejemplos incluyen:\n"
-            "- Es sospechoso si no hay testigos del accidente.\n"
-            "- Es sospechoso si no se presentó informe policial.\n"
-            "- Es sospechoso si no hay documentos adjuntos.\n"
-            "- Es sospechoso si hay muchos vehículos involucrados.\n"
-            "- Es sospechoso si el número de coches involucrados es 0 o no se especifica.\n"
-            "- También pueden influir reclamos pasados, valor del vehículo, edad del asegurado, etc.\n"
-        )
-    },
-    {
-        "role": "user",
-        "content": f"""
-Nivel de riesgo del reclamo: {resultado['riesgo']}
-Recomendaciones automáticas: {', '.join(resultado['recomendaciones'])}
-Información del reclamo: {entrada_legible}
-Redacta una explicación sencilla, clara y profesional que justifique el nivel de riesgo, tomando en cuenta las recomendaciones. La respuesta debe estar completa y no quedarte NUNCA a medias.
-"""
-    }
-]
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            max_tokens=400 
-        )
-        # Validar si hay contenido real
-        if response.choices and response.choices[0].message and response.choices[0].message.content.strip():
-            return response.choices[0].message.content.strip()
-        else:
-            return "⚠️ El modelo no devolvió contenido."
-    except Exception as e:
-        return f"❌ Error al generar explicación IA: {e}"
+    return explicaciones.explain(resultado, entrada, api_key)
+
+# Misma explicación, por fragmentos según se generan (para mostrarla progresivamente)
+def generar_explicacion_llm_stream(resultado, entrada, api_key):
+    return explicaciones.explain_stream(resultado, entrada, api_key)
+
+# Explicaciones de varios reclamos a la vez: casos = [(resultado, entrada), ...]
+def generar_explicaciones_llm(casos, api_key, concurrency=8):
+    return explicaciones.explain_many(casos, api_key, concurrency=concurrency)
+
+# Reclamo de ejemplo en el formato del formulario
+EJEMPLO_RECLAMO = {
+    'FECHA DEL ACCIDENTE': '10/09/2025',
+    'FECHA DE LA RECLAMACION': '11/09/2025',
+    'MARCA DEL VEHICULO': 'FERRARI',
+    'GENERO DEL ASEGURADO': 'MUJER',
+    'PRECIO DEL VEHICULO': 57000,
+    'ZONA DONDE OCURRIO EL ACCIDENTE': 'ZONA URBANA',
+    'EDAD DEL ASEGURADO': 34,
+    'ESTADO CIVIL DEL ASEGURADO': 'CASADO',
+    'CULPABLE DEL ACCIDENTE': 'EL PROPIO ASEGURADO',
+    'TIPO DE VEHICULO': 'DEPORTIVO',
+    'FRANQUICIA DE LA POLIZA': "300 EUROS",
+    'FECHA EN LA QUE SE EMITIO LA POLIZA': '09/01/2025',
+    'NUMERO DE RECLAMACIONES PASADAS': 2,
+    'ANTIGUEDAD DEL VEHICULO': "3",
+    'INFORME POLICIAL DEL ACCIDENTE': 'NO EXISTE',
+    'TESTIGOS DEL ACCIDENTE': 'NO EXISTEN',
+    'TIPO DE AGENTE QUE GESTIONO LA POLIZA': 'INTERNO',
+    'NUMERO DE DOCUMENTOS RELACIONADOS CON EL ACCIDENTE': 3,
+    'CUANTO TIEMPO DESPUES SE MUDO EL ASEGURADOR TRAS EL ACCIDENTE': 'NO SE HA MUDADO',
+    'NUMERO DE COCHES INVOLUCRADOS EN EL ACCIDENTE': 3,
+    'TIPO DE POLIZA': 'RESPONSABILIDAD CIVIL'
+}
 
 # Prueba
 if __name__ == "__main__":
-    import getpass
-    example_data = pd.DataFrame({
-        'FECHA DEL ACCIDENTE': ['10/09/2025'],
-        'FECHA DE LA RECLAMACION': ['11/09/2025'],
-        'MARCA DEL VEHICULO': ['FERRARI'],
-        'GENERO DEL ASEGURADO': ['MUJER'],
-        'PRECIO DEL VEHICULO': [57000],
-        'ZONA DONDE OCURRIO EL ACCIDENTE': ['ZONA URBANA'],
-        'EDAD DEL ASEGURADO': [34],
-        'ESTADO CIVIL DEL ASEGURADO': ['CASADO'],
-        'CULPABLE DEL ACCIDENTE': ['EL PROPIO ASEGURADO'],
-        'TIPO DE VEHICULO': ['DEPORTIVO'],
-        'FRANQUICIA DE LA POLIZA': ["300 EUROS"],
-        'FECHA EN LA QUE SE EMITIO LA POLIZA': ['09/01/2025'],
-        'NUMERO DE RECLAMACIONES PASADAS': [2],
-        'ANTIGUEDAD DEL VEHICULO': ["3"],
-        'INFORME POLICIAL DEL ACCIDENTE': ['NO EXISTE'],
-        'TESTIGOS DEL ACCIDENTE': ['NO EXISTEN'],
-        'TIPO DE AGENTE QUE GESTIONO LA POLIZA': ['INTERNO'],
-        'NUMERO DE DOCUMENTOS RELACIONADOS CON EL ACCIDENTE': [3],
-        'CUANTO TIEMPO DESPUES SE MUDO EL ASEGURADOR TRAS EL ACCIDENTE': ['NO SE HA MUDADO'],
-        'NUMERO DE COCHES INVOLUCRADOS EN EL ACCIDENTE': [3],
-        'TIPO DE POLIZA': ['RESPONSABILIDAD CIVIL']
-    })
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'DEBUG'), format='%(levelname)s %(name)s: %(message)s')
+    example_data = pd.DataFrame([EJEMPLO_RECLAMO])
 
     # Ejecutar predicción
     resultado = model_service(example_data)
+    print(json.dumps(resultado, ensure_ascii=False, indent=2))
 
     # Solicitar clave
     api_key = os.getenv("OPENAI_API_KEY")
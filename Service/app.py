@@ -3,27 +3,29 @@
 import streamlit as st 
 import json
 import pandas as pd 
-from api_backend import model_service
-from datetime import datetime, timedelta
+from api_backend import model_service, warm_up
+from claim_store import ClaimStore
+from datetime import datetime, date, timedelta
 import os
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # Ruta absoluta al directorio /Service
 
 
-# CARGA DEL HISTORIAL DE RECLAMOS DESDE JSON
+# HISTORIAL DE RECLAMOS (SQLite)
 
-historial_file = os.path.join(BASE_DIR, ".", "historial.json")
-historial_file = os.path.abspath(historial_file)
-if os.path.exists(historial_file) and os.path.getsize(historial_file) > 0:
-    try:
-        with open(historial_file, "r", encoding="utf-8") as f:
-            historial_data = json.load(f)
-            st.session_state.historial_ids = list(historial_data.keys())
-            for ident, datos in historial_data.items():
-                st.session_state[f"analisis_{ident}"] = datos
-    except Exception:
-        st.session_state.historial_ids = []
-else:
-    st.session_state.historial_ids = []
+historial_file = os.path.abspath(os.path.join(BASE_DIR, ".", "historial.json"))
+historial_db = os.getenv("HISTORIAL_DB", os.path.abspath(os.path.join(BASE_DIR, ".", "historial.db")))
+
+# Un único almacén por proceso; la primera vez se importa el historial.json anterior
+@st.cache_resource
+def abrir_historial():
+    store = ClaimStore(historial_db)
+    store.migrate_json(historial_file)
+    return store
+
+historial = abrir_historial()
+
+# Reclamos por página en el historial del sidebar
+TAMANO_PAGINA = 20
 
 
 # CONFIGURACIÓN
@@ -44,11 +46,24 @@ st.set_page_config(
 if "modo_actual" not in st.session_state:
     st.session_state.modo_actual = "formulario"
 
-# Carga del schema
+# Carga del schema: se lee una vez por proceso y se comparte entre sesiones y reejecuciones
 ruta_schema = os.path.join(os.path.dirname(__file__), '..', 'Artifacts', 'io_schema.json')
-ruta_schema = os.path.abspath(ruta_schema)  
-with open(ruta_schema, 'r', encoding='utf-8') as f:
-    schema = json.load(f)
+ruta_schema = os.path.abspath(ruta_schema)
+
+@st.cache_resource
+def cargar_schema():
+    with open(ruta_schema, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+schema = cargar_schema()
+
+# Modelos del backend cargados una vez por proceso, antes del primer análisis
+@st.cache_resource
+def preparar_modelos():
+    warm_up()
+    return True
+
+preparar_modelos()
 
 # Estilos globales
 st.markdown("""
@@ -169,48 +184,75 @@ if api_key:
 
 # Función para borrar historial
 def borrar_historial():
-    st.session_state.historial_ids = []
+    historial.clear()
     st.session_state.modo_actual = "formulario"
+    st.session_state.pagina_historial = 0
     if "ultimo_analisis" in st.session_state:
         del st.session_state["ultimo_analisis"]
-    with open(historial_file, "w", encoding="utf-8") as f:
-        json.dump({}, f)
 
-st.sidebar.title("📄 Historial de reclamaciones")
+# Historial del sidebar como fragmento: los filtros y la paginación solo vuelven a ejecutar esta
+# parte; abrir un análisis o borrar el historial sí vuelve a ejecutar toda la app
+def cambiar_pagina(paso):
+    st.session_state.pagina_historial += paso
 
-if "historial_ids" in st.session_state and st.session_state.historial_ids:
+@st.fragment
+def historial_sidebar():
+    st.title("📄 Historial de reclamaciones")
 
-    # Obtener fechas mínimas y máximas del historial
-    fechas = [datetime.strptime(ident[-14:], "%Y%m%d%H%M%S") for ident in st.session_state.historial_ids]
-    fecha_min = min(fechas).date()
-    fecha_max = max(fechas).date()
+    rango_historial = historial.date_range()
+    if not rango_historial:
+        st.warning("Aún no hay análisis registrados")
+        return
+
+    # Fechas mínima y máxima del historial
+    fecha_min, fecha_max = rango_historial
 
     # Selector de rango de fechas (ajustado para soportar selección de una sola fecha)
-    rango_fechas = st.sidebar.date_input("📅 Buscar por rango de fechas", [fecha_min, fecha_max])
-    if isinstance(rango_fechas, tuple) and len(rango_fechas) == 2:
+    rango_fechas = st.date_input("📅 Buscar por rango de fechas", [fecha_min, fecha_max])
+    if isinstance(rango_fechas, (tuple, list)) and len(rango_fechas) == 2:
         fecha_inicio, fecha_fin = rango_fechas
+    elif isinstance(rango_fechas, (tuple, list)) and len(rango_fechas) == 1:
+        fecha_inicio = fecha_fin = rango_fechas[0]
     else:
-        fecha_inicio = fecha_fin = rango_fechas if isinstance(rango_fechas, datetime) else datetime.today().date()
+        fecha_inicio = fecha_fin = rango_fechas if isinstance(rango_fechas, date) else datetime.today().date()
+
+    # Campo de búsqueda (comienzo del nombre del reclamador)
+    busqueda = st.text_input("🔍 Buscar por nombre", "")
 
-    # Campo de búsqueda
-    busqueda = st.sidebar.text_input("🔍 Buscar por nombre", "")
+    # Página actual del historial filtrado
+    total = historial.count(fecha_inicio, fecha_fin, busqueda)
+    paginas = max(1, -(-total // TAMANO_PAGINA))
+    # Al cambiar los filtros se vuelve a la primera página
+    filtros = (fecha_inicio, fecha_fin, busqueda)
+    if st.session_state.get("filtros_historial") != filtros:
+        st.session_state.filtros_historial = filtros
+        st.session_state.pagina_historial = 0
+    st.session_state.pagina_historial = min(st.session_state.pagina_historial, paginas - 1)
 
     # Botones de análisis filtrados
-    hay_identificadores = False
-    for ident in reversed(st.session_state.historial_ids):
-        fecha_ident = datetime.strptime(ident[-14:], "%Y%m%d%H%M%S").date()
-        if fecha_inicio <= fecha_ident <= fecha_fin and (busqueda.lower() in ident.lower()):
-            hay_identificadores = True
-            if st.sidebar.button(ident, key=f"btn_{ident}"):
-                st.session_state.ultimo_analisis = ident
-                st.session_state.modo_actual = "analisis"
-                st.rerun()
+    hay_identificadores = total > 0
+    for ident in historial.page(fecha_inicio, fecha_fin, busqueda, st.session_state.pagina_historial, TAMANO_PAGINA):
+        if st.button(ident, key=f"btn_{ident}"):
+            st.session_state.ultimo_analisis = ident
+            st.session_state.modo_actual = "analisis"
+            st.rerun()
+
+    # Navegación entre páginas
+    if paginas > 1:
+        col_anterior, col_pagina, col_siguiente = st.columns([1, 2, 1])
+        col_anterior.button("◀", disabled=st.session_state.pagina_historial == 0, key="pagina_anterior",
+                            on_click=cambiar_pagina, args=(-1,))
+        col_pagina.caption(f"Página {st.session_state.pagina_historial + 1} de {paginas} ({total} reclamos)")
+        col_siguiente.button("▶", disabled=st.session_state.pagina_historial >= paginas - 1, key="pagina_siguiente",
+                             on_click=cambiar_pagina, args=(1,))
 
     # Botón de borrar historial
-    st.sidebar.button("🗑️ Borrar historial", disabled=not hay_identificadores, on_click=borrar_historial)
+    if st.button("🗑️ Borrar historial", disabled=not hay_identificadores):
+        borrar_historial()
+        st.rerun()
 
-else:
-    st.sidebar.warning("Aún no hay análisis registrados")
+with st.sidebar:
+    historial_sidebar()
 
 
 # MODO FORMULARIO
@@ -321,7 +363,7 @@ if st.session_state.modo_actual == "formulario":
         fecha_reclamacion_dt = datetime.today().date()
         submit = st.form_submit_button("🔍︎   Analizar reclamo")
         if submit:
-            if not identificador_unico or f"analisis_{identificador_unico}" in st.session_state:
+            if not identificador_unico or historial.exists(identificador_unico):
                 st.stop()
 
             if fecha_accidente_dt and fecha_accidente_dt > fecha_reclamacion_dt:
@@ -347,27 +389,12 @@ if st.session_state.modo_actual == "formulario":
                 df = pd.DataFrame([entrada])
                 try:
                     resultado = model_service(df)
-                    if "historial_ids" not in st.session_state:
-                        st.session_state.historial_ids = []
-
-                    # Crear análisis sin explicación IA de momento
-                    st.session_state[f"analisis_{identificador_unico}"] = {
-                        "entrada": entrada,
-                        "resultado": resultado,
-                        "explicacion_ia": None  # ← inicializa aquí
-                    }
-                    st.session_state.historial_ids.append(identificador_unico)
+
+                    # Guardar el análisis, aún sin explicación IA
+                    historial.add(identificador_unico, entrada, resultado)
                     st.session_state.ultimo_analisis = identificador_unico
                     st.session_state.modo_actual = "analisis"
 
-                    # Guardar historial actualizado, aunque aún no tenga explicación IA
-                    historial_data = {
-                        ident: st.session_state[f"analisis_{ident}"]
-                        for ident in st.session_state.historial_ids
-                    }
-                    with open(historial_file, "w", encoding="utf-8") as f:
-                        json.dump(historial_data, f, ensure_ascii=False, indent=2)
-
                     st.rerun()
 
                 except Exception as e:
@@ -376,8 +403,12 @@ if st.session_state.modo_actual == "formulario":
 
 # MODO ANÁLISIS
 
-if st.session_state.modo_actual == "analisis" and "ultimo_analisis" in st.session_state:
-    data = st.session_state[f"analisis_{st.session_state.ultimo_analisis}"]
+# Panel de análisis como fragmento, aislado del formulario y del historial del sidebar
+@st.fragment
+def panel_analisis(ident):
+    data = historial.get(ident)
+    if data is None:
+        return
     entrada = data["entrada"]
     resultado = data["resultado"]
     explicacion_guardada = data.get("explicacion_ia", None)
@@ -410,32 +441,40 @@ if st.session_state.modo_actual == "analisis" and "ultimo_analisis" in st.sessio
     # Generar explicación si hay API y aún no hay explicación
     elif api_key:
         try:
-            from api_backend import generar_explicacion_llm
-            explicacion_ia = generar_explicacion_llm(resultado, entrada, api_key)
+            from api_backend import generar_explicacion_llm_stream
+            # El texto se muestra según llega; el primer fragmento indica si hubo un error
+            fragmentos = generar_explicacion_llm_stream(resultado, entrada, api_key)
+            with st.spinner("Generando explicación..."):
+                primero = next(fragmentos, "")
 
-            if explicacion_ia.startswith("❌ Error al generar explicación IA: Error code: 401"):
+            if primero.startswith("❌ Error al generar explicación IA: Error code: 401"):
                 st.error("❌ API no válida. Verifica que la clave sea correcta.")
-            elif "Error" in explicacion_ia or "⚠️" in explicacion_ia:
-                st.warning(explicacion_ia)
+            elif primero.startswith(("❌", "⚠️")):
+                st.warning(primero)
             else:
                 st.markdown("### 💡 Explicación del Modelo (IA)")
-                st.info(explicacion_ia)
-                # Guardar explicación en el análisis y archivo
-                st.session_state[f"analisis_{st.session_state.ultimo_analisis}"]["explicacion_ia"] = explicacion_ia
+                recuadro = st.empty()
+                explicacion_ia = primero
+                recuadro.info(explicacion_ia)
+                for fragmento in fragmentos:
+                    if fragmento.startswith("\n\n❌"):
+                        # El stream se cortó: queda a la vista lo recibido, pero no se guarda incompleto
+                        st.warning(fragmento.strip())
+                        break
+                    explicacion_ia += fragmento
+                    recuadro.info(explicacion_ia)
+                else:
+                    # Guardar la explicación completa en el historial
+                    historial.add_explanation(ident, explicacion_ia.strip())
 
         except Exception as e:
             st.warning(f"❌ No se pudo generar la explicación IA: {e}")
 
-    # Guardar el historial completo actualizado
-    historial_data = {
-        ident: st.session_state[f"analisis_{ident}"]
-        for ident in st.session_state.historial_ids
-    }
-    with open(historial_file, "w", encoding="utf-8") as f:
-        json.dump(historial_data, f, ensure_ascii=False, indent=2)
-
     # Botón para volver
     st.markdown("---")
     if st.button("🡰 Volver al formulario"):
         st.session_state.modo_actual = "formulario"
         st.rerun()
+
+if st.session_state.modo_actual == "analisis" and "ultimo_analisis" in st.session_state:
+    panel_analisis(st.session_state.ultimo_analisis)
@@ -0,0 +1,197 @@
+# Almacén de análisis de reclamos (SQLite)
+# Cada análisis se inserta una sola vez; la explicación IA se añade después en su propia tabla.
+# Índices por nombre del reclamador y fecha para filtrar el historial con consultas paginadas,
+# sin cargar ni reescribir todo el historial en cada interacción.
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+# Formato del sello de tiempo al final del identificador (nombre_AAAAMMDDhhmmss)
+TIMESTAMP_FORMAT = "%Y%m%d%H%M%S"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reclamos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ident TEXT NOT NULL UNIQUE,
+    nombre TEXT NOT NULL,
+    nombre_busqueda TEXT NOT NULL,
+    creado TEXT NOT NULL,
+    entrada TEXT NOT NULL,
+    resultado TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reclamos_creado ON reclamos (creado);
+CREATE INDEX IF NOT EXISTS idx_reclamos_nombre ON reclamos (nombre_busqueda, creado);
+CREATE TABLE IF NOT EXISTS explicaciones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ident TEXT NOT NULL,
+    texto TEXT NOT NULL,
+    creado TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_explicaciones_ident ON explicaciones (ident, id);
+CREATE TABLE IF NOT EXISTS migraciones (
+    nombre TEXT PRIMARY KEY,
+    huella TEXT NOT NULL,
+    reclamos INTEGER NOT NULL,
+    aplicada TEXT NOT NULL
+);
+"""
+
+
+# Clave de búsqueda por nombre: sin distinguir mayúsculas (también en caracteres no ASCII)
+def search_key(nombre):
+    return nombre.strip().casefold()
+
+
+# Nombre y sello de tiempo a partir del identificador que genera el formulario
+def split_ident(ident):
+    nombre, _, creado = ident.rpartition('_')
+    datetime.strptime(creado, TIMESTAMP_FORMAT)
+    return nombre, creado
+
+
+def _now():
+    return datetime.now().strftime(TIMESTAMP_FORMAT)
+
+
+class ClaimStore:
+    def __init__(self, path):
+        self.path = path
+        # Una conexión por proceso compartida entre las sesiones de Streamlit (hilos)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # Filtros del historial: rango de fechas (inclusive) y comienzo del nombre
+    @staticmethod
+    def _filters(fecha_inicio=None, fecha_fin=None, nombre=None):
+        clauses, params = [], []
+        if fecha_inicio is not None:
+            clauses.append("creado >= ?")
+            params.append(fecha_inicio.strftime("%Y%m%d") + "000000")
+        if fecha_fin is not None:
+            clauses.append("creado <= ?")
+            params.append(fecha_fin.strftime("%Y%m%d") + "235959")
+        if nombre:
+            # Rango sobre la clave de búsqueda para que el índice por nombre sirva de prefijo
+            key = search_key(nombre)
+            clauses.append("nombre_busqueda >= ? AND nombre_busqueda < ?")
+            params.extend([key, key + "\U0010ffff"])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def add(self, ident, entrada, resultado):
+        nombre, creado = split_ident(ident)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO reclamos (ident, nombre, nombre_busqueda, creado, entrada, resultado) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (ident, nombre, search_key(nombre), creado,
+                 json.dumps(entrada, ensure_ascii=False), json.dumps(resultado, ensure_ascii=False)),
+            )
+
+    def add_explanation(self, ident, texto):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO explicaciones (ident, texto, creado) VALUES (?, ?, ?)", (ident, texto, _now())
+            )
+
+    def exists(self, ident):
+        return bool(self._query("SELECT 1 FROM reclamos WHERE ident = ?", (ident,)))
+
+    # Análisis completo en el mismo formato que el antiguo historial.json
+    def get(self, ident):
+        rows = self._query(
+            "SELECT entrada, resultado, "
+            "(SELECT texto FROM explicaciones e WHERE e.ident = r.ident ORDER BY e.id DESC LIMIT 1) "
+            "FROM reclamos r WHERE ident = ?",
+            (ident,),
+        )
+        if not rows:
+            return None
+        entrada, resultado, explicacion = rows[0]
+        return {'entrada': json.loads(entrada), 'resultado': json.loads(resultado), 'explicacion_ia': explicacion}
+
+    def count(self, fecha_inicio=None, fecha_fin=None, nombre=None):
+        where, params = self._filters(fecha_inicio, fecha_fin, nombre)
+        return self._query(f"SELECT COUNT(*) FROM reclamos{where}", params)[0][0]
+
+    # Primera y última fecha del historial (None si está vacío)
+    def date_range(self):
+        first, last = self._query("SELECT MIN(creado), MAX(creado) FROM reclamos")[0]
+        if first is None:
+            return None
+        return (datetime.strptime(first, TIMESTAMP_FORMAT).date(), datetime.strptime(last, TIMESTAMP_FORMAT).date())
+
+    # Identificadores filtrados, del más reciente al más antiguo, de page_size en page_size
+    def page(self, fecha_inicio=None, fecha_fin=None, nombre=None, page=0, page_size=20):
+        where, params = self._filters(fecha_inicio, fecha_fin, nombre)
+        rows = self._query(
+            f"SELECT ident FROM reclamos{where} ORDER BY creado DESC, id DESC LIMIT ? OFFSET ?",
+            params + [page_size, page * page_size],
+        )
+        return [ident for (ident,) in rows]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM reclamos")
+            self._conn.execute("DELETE FROM explicaciones")
+            self._conn.execute("COMMIT")
+
+    # Importación única de un historial.json previo (se registra para no repetirla). La comprobación y
+    # la importación van en la misma transacción, que toma el bloqueo de escritura desde el principio
+    # (BEGIN IMMEDIATE): otro hilo u otro proceso con la misma base espera y después ya la ve aplicada.
+    def migrate_json(self, json_path):
+        if not os.path.exists(json_path) or os.path.getsize(json_path) == 0:
+            return 0
+        name = os.path.basename(json_path)
+        with open(json_path, 'rb') as f:
+            raw = f.read()
+        historial = json.loads(raw.decode('utf-8'))
+        imported = 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute("SELECT 1 FROM migraciones WHERE nombre = ?", (name,)).fetchall():
+                    self._conn.execute("ROLLBACK")
+                    return 0
+                for ident, datos in historial.items():
+                    try:
+                        nombre, creado = split_ident(ident)
+                    except ValueError:
+                        continue
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO reclamos (ident, nombre, nombre_busqueda, creado, entrada, resultado) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (ident, nombre, search_key(nombre), creado,
+                         json.dumps(datos.get('entrada', {}), ensure_ascii=False),
+                         json.dumps(datos.get('resultado', {}), ensure_ascii=False)),
+                    )
+                    if cursor.rowcount and datos.get('explicacion_ia'):
+                        self._conn.execute(
+                            "INSERT INTO explicaciones (ident, texto, creado) VALUES (?, ?, ?)",
+                            (ident, datos['explicacion_ia'], creado),
+                        )
+                    imported += cursor.rowcount
+                self._conn.execute(
+                    "INSERT INTO migraciones (nombre, huella, reclamos, aplicada) VALUES (?, ?, ?, ?)",
+                    (name, hashlib.sha256(raw).hexdigest(), imported, _now()),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return imported
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,279 @@
+# Monitor de deriva de las variables y del score frente a los datos del entrenamiento
+#   python drift_monitor.py baseline                  calcula Artifacts/drift_baseline.json
+#   python drift_monitor.py check reclamos.csv        puntúa el fichero por bloques y muestra el informe
+#
+# La línea base guarda, para cada variable de feature_cols.pkl y para el score del ensemble, los
+# cortes de un histograma y la proporción de filas del entrenamiento en cada tramo (más uno para los
+# nulos). Cada lote puntuado suma sus conteos a un histograma de tamaño fijo: la memoria no depende
+# del número de reclamos y no se guarda ninguno. El PSI y el KS se calculan en cualquier momento a
+# partir de esos conteos, sin volver a recorrer los reclamos anteriores.
+import json
+import os
+import threading
+import warnings
+
+import numpy as np
+
+from metrics import DRIFT_FLAGGED, DRIFT_KS, DRIFT_PSI
+
+FORMAT_VERSION = 1
+BASELINE_NAME = 'drift_baseline.json'
+SCORE = 'score'
+# Tramos como máximo por variable: con menos valores distintos, un tramo por valor
+MAX_BINS = 20
+# Proporción mínima de un tramo en el PSI (evita log(0) en tramos vacíos)
+PSI_EPS = 1e-4
+# Niveles de deriva: PSI habituales en riesgo de crédito (0,1 moderada, 0,25 alta) y KS de los tramos
+PSI_MODERATE = 0.1
+PSI_HIGH = 0.25
+KS_HIGH = 0.1
+# Con menos filas observadas el PSI es ruido y la variable no se marca
+MIN_ROWS = 500
+LEVELS = ('estable', 'moderada', 'alta')
+
+
+# Cortes de los tramos: puntos medios entre valores si hay pocos distintos, si no cuantiles
+def bin_edges(values, max_bins=MAX_BINS):
+    values = np.asarray(values, dtype=np.float64)
+    distinct = np.unique(values[~np.isnan(values)])
+    if len(distinct) <= max_bins:
+        return (distinct[:-1] + distinct[1:]) / 2
+    return np.unique(np.quantile(values[~np.isnan(values)], np.linspace(0, 1, max_bins + 1)[1:-1]))
+
+
+# Tramo de cada valor: 0 para los nulos y 1..len(edges)+1 para el resto
+def bin_index(edges, values):
+    values = np.asarray(values, dtype=np.float64)
+    index = np.searchsorted(edges, values, side='right') + 1
+    index[np.isnan(values)] = 0
+    return index
+
+
+class DriftBaseline:
+    def __init__(self, spec):
+        # spec: {'series': {nombre: {'edges': [...], 'expected': [...]}}, 'rows': ...}; el score va el último
+        self.spec = spec
+        self.names = list(spec['series'])
+        self.features = self.names[:-1]
+        self.edges = [np.asarray(spec['series'][name]['edges'], dtype=np.float64) for name in self.names]
+        # Proporciones del entrenamiento en una matriz (series x tramos), con ceros de relleno
+        self.width = max(len(edges) for edges in self.edges) + 2
+        self.expected = np.zeros((len(self.names), self.width))
+        for i, name in enumerate(self.names):
+            expected = spec['series'][name]['expected']
+            self.expected[i, :len(expected)] = expected
+        # Las variables binarias o codificadas como enteros consecutivos tienen cortes equiespaciados:
+        # su tramo se calcula con aritmética, todas a la vez, en lugar de una búsqueda binaria por variable
+        uniform = [j for j, edges in enumerate(self.edges[:-1])
+                   if len(edges) == 1 or (len(edges) > 1 and np.all(np.diff(edges) == edges[1] - edges[0]))]
+        self._uniform = np.array(uniform, dtype=np.intp)
+        self._searched = sorted(set(range(len(self.features))) - set(uniform))
+        self._start = np.array([self.edges[j][0] for j in uniform])
+        self._step = np.array([self.edges[j][1] - self.edges[j][0] if len(self.edges[j]) > 1 else 1.0 for j in uniform])
+        self._last = np.array([len(self.edges[j]) + 1 for j in uniform])
+        # Primer tramo de cada serie en el bincount conjunto (tramo + serie * ancho)
+        self._offset = np.arange(len(self.features)) * self.width
+
+    # Tramo de cada valor de la matriz de variables (filas x features), desplazado por serie: tramo + serie * ancho
+    def bin_matrix(self, X):
+        index = np.empty(X.shape, dtype=np.intp)
+        if len(self._uniform):
+            U = X[:, self._uniform]
+            bins = np.clip(np.floor((U - self._start) / self._step) + 2, 1, self._last)
+            index[:, self._uniform] = np.where(np.isnan(U), 0, bins)
+        for j in self._searched:
+            index[:, j] = bin_index(self.edges[j], X[:, j])
+        return index + self._offset
+
+    # Conteos (series x tramos) de un lote; sin scores la fila del score queda a cero
+    def counts(self, X, scores=None):
+        index = [self.bin_matrix(X).ravel()]
+        if scores is not None:
+            index.append(bin_index(self.edges[-1], scores) + len(self.features) * self.width)
+        counts = np.bincount(np.concatenate(index), minlength=len(self.names) * self.width)
+        return counts.reshape(len(self.names), self.width)
+
+    @classmethod
+    def fit(cls, features, scores, max_bins=MAX_BINS):
+        X = features.to_numpy(dtype=np.float64)
+        scores = np.asarray(scores, dtype=np.float64)
+        columns = [X[:, j] for j in range(X.shape[1])] + [scores]
+        series = {name: {'edges': bin_edges(values, max_bins).tolist(), 'expected': []}
+                  for name, values in zip(list(features.columns) + [SCORE], columns)}
+        baseline = cls({'format': FORMAT_VERSION, 'rows': len(X), 'score_rows': len(scores), 'series': series})
+        # Proporciones con el mismo cálculo de tramos que se usa al observar
+        counts = baseline.counts(X) + baseline.counts(X[:0], scores)
+        for i, name in enumerate(baseline.names):
+            n_bins = len(baseline.edges[i]) + 2
+            series[name]['expected'] = (counts[i, :n_bins] / counts[i].sum()).tolist()
+        return cls(baseline.spec)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            spec = json.load(f)
+        if spec.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Formato de línea base no soportado en {path}: {spec.get('format')}")
+        return cls(spec)
+
+    def save(self, path):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.spec, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+# PSI y KS de cada serie: observed y expected son matrices (series x tramos) de conteos y proporciones.
+# El KS se calcula sobre los tramos sin nulos (el tramo 0); los nulos ya pesan en el PSI.
+def drift_statistics(observed, expected):
+    totals = observed.sum(axis=1, keepdims=True)
+    actual = observed / np.maximum(totals, 1)
+    p, q = np.clip(actual, PSI_EPS, None), np.clip(expected, PSI_EPS, None)
+    psi = np.sum((p - q) * np.log(p / q), axis=1)
+    # Sin filas observadas no hay deriva que medir
+    psi[totals[:, 0] == 0] = 0.0
+    actual_values = actual[:, 1:] / np.maximum(actual[:, 1:].sum(axis=1, keepdims=True), 1e-12)
+    expected_values = expected[:, 1:] / np.maximum(expected[:, 1:].sum(axis=1, keepdims=True), 1e-12)
+    ks = np.max(np.abs(np.cumsum(actual_values, axis=1) - np.cumsum(expected_values, axis=1)), axis=1)
+    ks[actual[:, 1:].sum(axis=1) == 0] = 0.0
+    return psi, ks
+
+
+def drift_level(psi, ks, rows):
+    if rows < MIN_ROWS:
+        return 'insuficiente'
+    if psi >= PSI_HIGH or ks >= KS_HIGH:
+        return 'alta'
+    if psi >= PSI_MODERATE:
+        return 'moderada'
+    return 'estable'
+
+
+class DriftMonitor:
+    def __init__(self, half_life=None):
+        # half_life: filas tras las que el peso de lo ya observado se reduce a la mitad (None: acumulado)
+        self.half_life = half_life
+        self._baseline = None
+        self._counts = None
+        self._lock = threading.Lock()
+
+    # Con otra línea base (artefactos recargados) los conteos empiezan de cero
+    def _check_baseline(self, baseline):
+        if baseline is not self._baseline:
+            self._baseline = baseline
+            self._counts = np.zeros_like(baseline.expected)
+
+    # Suma un lote: features preprocesadas (DataFrame, o matriz float64 con las columnas de
+    # feature_cols en su orden) y, si se tiene, el score
+    def observe(self, baseline, features, scores=None):
+        if baseline is None or not len(features):
+            return
+        if hasattr(features, 'columns'):
+            features = features[baseline.features].to_numpy(dtype=np.float64)
+        counts = baseline.counts(features, None if scores is None else np.asarray(scores, dtype=np.float64))
+        self.add_counts(baseline, counts, len(features))
+
+    # Suma los conteos de un lote de rows filas ya calculados (por ejemplo, en otro proceso)
+    def add_counts(self, baseline, counts, rows):
+        if baseline is None or counts is None:
+            return
+        with self._lock:
+            self._check_baseline(baseline)
+            if self.half_life:
+                self._counts *= 0.5 ** (rows / self.half_life)
+            self._counts += counts
+
+    # Copia de los conteos observados (None si aún no hay ninguno)
+    def snapshot(self):
+        with self._lock:
+            return None if self._counts is None else self._counts.copy()
+
+    def reset(self):
+        with self._lock:
+            if self._counts is not None:
+                self._counts[:] = 0
+
+    # Informe por serie, de mayor a menor PSI; también actualiza las métricas fraude_drift_*
+    def report(self):
+        with self._lock:
+            if self._baseline is None:
+                return []
+            baseline, observed = self._baseline, self._counts.copy()
+        psi, ks = drift_statistics(observed, baseline.expected)
+        rows = observed.sum(axis=1)
+        report = []
+        for i, name in enumerate(baseline.names):
+            level = drift_level(psi[i], ks[i], rows[i])
+            report.append({'variable': name, 'filas': round(float(rows[i]), 1), 'psi': round(float(psi[i]), 4),
+                           'ks': round(float(ks[i]), 4), 'nulos': round(float(observed[i, 0] / max(rows[i], 1)), 4),
+                           'deriva': level})
+            DRIFT_PSI.set(float(psi[i]), feature=name)
+            DRIFT_KS.set(float(ks[i]), feature=name)
+            DRIFT_FLAGGED.set(LEVELS.index(level) if level in LEVELS else 0, feature=name)
+        return sorted(report, key=lambda row: row['psi'], reverse=True)
+
+
+def print_report(report):
+    print(f"{'variable':<22} {'filas':>9} {'PSI':>8} {'KS':>7} {'nulos':>7}  deriva")
+    for row in report:
+        print(f"{row['variable']:<22} {row['filas']:>9,.0f} {row['psi']:>8.4f} {row['ks']:>7.4f} "
+              f"{row['nulos']:>7.2%}  {row['deriva']}")
+
+
+def build_baseline(args):
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    import api_backend
+    from fast_predictor import source_fingerprint
+    from train_pipeline import DATA_PATH, SEED, TARGET
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        config = api_backend.load_ensemble_config()
+        ensemble = api_backend.EnsembleEngine(api_backend.load_models(config), config)
+        feature_cols = list(api_backend.load_feature_cols())
+    data = pd.read_csv(args.data or DATA_PATH)
+    # Scores de la partición de test del entrenamiento (misma semilla): los árboles puntúan las filas
+    # con las que se entrenaron de forma más extrema que los reclamos nuevos
+    _, test = train_test_split(data, test_size=0.2, stratify=data[TARGET], random_state=SEED)
+    _, scores = ensemble.predict(test[feature_cols])
+    baseline = DriftBaseline.fit(data[feature_cols], scores, args.bins)
+    baseline.spec['sources'] = source_fingerprint(api_backend.ARTIFACTS_DIR, config)
+    baseline.save(os.path.join(api_backend.ARTIFACTS_DIR, BASELINE_NAME))
+    print(f"Línea base de {len(baseline.names)} series ({len(data)} filas, {len(test)} scores) "
+          f"guardada en {os.path.join(api_backend.ARTIFACTS_DIR, BASELINE_NAME)}")
+
+
+# Puntúa el fichero por bloques (como score_claims.py) y muestra la deriva acumulada
+def check_file(args):
+    import api_backend
+    from score_claims import iter_chunks, score_chunk
+
+    for chunk in iter_chunks(args.input, args.chunksize):
+        score_chunk(chunk, source=args.input)
+    if api_backend.registry.get('drift_baseline') is None:
+        raise SystemExit(f"No hay línea base al día en Artifacts/{BASELINE_NAME}: ejecuta 'python drift_monitor.py baseline'")
+    print_report(api_backend.drift_monitor.report())
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Línea base y comprobación de la deriva de los datos')
+    commands = parser.add_subparsers(dest='command', required=True)
+    baseline = commands.add_parser('baseline', help='Calcula la línea base desde los datos del entrenamiento')
+    baseline.add_argument('--data', default=None, help='CSV procesado (por defecto, Data/data_processed.csv)')
+    baseline.add_argument('--bins', type=int, default=MAX_BINS)
+    check = commands.add_parser('check', help='Puntúa un fichero y muestra su deriva frente a la línea base')
+    check.add_argument('input')
+    check.add_argument('--chunksize', type=int, default=5000)
+    args = parser.parse_args(argv)
+    if args.command == 'baseline':
+        build_baseline(args)
+    else:
+        check_file(args)
+
+
+if __name__ == '__main__':
+    main()
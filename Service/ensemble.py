@@ -0,0 +1,161 @@
+# Motor de inferencia del ensemble
+# Miembros descubiertos desde ensemble_config.json, pesos renormalizados si falta alguno,
+# evaluación en paralelo (LightGBM y XGBoost liberan el GIL) y presupuesto de hilos por miembro.
+import copy
+import os
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from metrics import MEMBER_SECONDS, timed
+
+# Margen frente a errores de redondeo al decidir la banda con los límites del score de la cascada
+CASCADE_EPS = 1e-9
+# Orden de la cascada del miembro más barato al más caro (coste por fila medido con
+# Benchmarks/bench_cascade.py). 'cascade_order' en ensemble_config.json lo sustituye.
+CASCADE_ORDER = ('logreg', 'lgbm', 'xgb', 'rf')
+
+
+# Pesos de los miembros disponibles, reescalados para que sumen lo mismo que en la configuración
+# (así el umbral de riesgo conserva su significado)
+def renormalize_weights(weights, available):
+    present = {name: w for name, w in weights.items() if name in available}
+    missing = [name for name in weights if name not in available]
+    if not present:
+        raise ValueError("Ningún modelo del ensemble está disponible")
+    if not missing:
+        return dict(present), missing
+    total, total_present = sum(weights.values()), sum(present.values())
+    if total_present <= 0:
+        raise ValueError("Los modelos disponibles tienen peso 0 en el ensemble")
+    factor = total / total_present
+    return {name: w * factor for name, w in present.items()}, missing
+
+
+# Reparto de hilos: lo indicado en la configuración o, por defecto, los núcleos entre los miembros
+def thread_budget(members, threads=None, cpu_count=None):
+    threads = threads or {}
+    cpu_count = cpu_count or os.cpu_count() or 1
+    default = max(1, cpu_count // max(1, len(members)))
+    return {name: int(threads.get(name, default)) for name in members}
+
+
+# Miembro con n_threads hilos, sin modificar el modelo cargado: el registro lo comparte entre todos
+# los motores (un motor nuevo tras cada recarga, los de los benchmarks...). Para los envoltorios de
+# sklearn es una copia superficial; lo que set_params cambia en sitio se copia antes.
+def with_threads(model, n_threads):
+    if hasattr(model, 'with_threads'):
+        return model.with_threads(n_threads)
+    params = model.get_params() if hasattr(model, 'get_params') else {}
+    key = 'n_jobs' if 'n_jobs' in params else 'nthread' if 'nthread' in params else None
+    if key is None:
+        return model
+    member = copy.copy(model)
+    # LightGBM anota los parámetros en un diccionario
+    if hasattr(member, '_other_params'):
+        member._other_params = dict(member._other_params)
+    # XGBoost los pasa además a su booster
+    booster = getattr(member, '_Booster', None)
+    if hasattr(booster, 'set_param'):
+        member._Booster = booster.copy()
+    member.set_params(**{key: n_threads})
+    return member
+
+
+class EnsembleEngine:
+    def __init__(self, models, config, parallel=True, min_parallel_rows=1000):
+        self.weights, self.missing = renormalize_weights(config['weights'], models)
+        if self.missing:
+            warnings.warn(
+                f"Modelos del ensemble no disponibles: {self.missing}. "
+                f"Pesos renormalizados: { {k: round(v, 4) for k, v in self.weights.items()} }"
+            )
+        self._models = {name: models[name] for name in self.weights}
+        self.threshold = config['threshold']
+        self.threads = thread_budget(self._models, config.get('threads'))
+        self.members = {name: with_threads(model, self.threads[name]) for name, model in self._models.items()}
+        # Con pocos datos el coste de repartir entre hilos supera lo que se gana
+        self.parallel = parallel and len(self.members) > 1
+        self.min_parallel_rows = min_parallel_rows
+        self._executor = ThreadPoolExecutor(max_workers=len(self.members)) if self.parallel else None
+        order = list(config.get('cascade_order', CASCADE_ORDER))
+        # Los miembros que el orden no nombra van al final, en el orden de la configuración
+        self._cascade_order = [name for name in order if name in self.members]
+        self._cascade_order += [name for name in self.members if name not in self._cascade_order]
+
+    # Hilos de cada miembro y evaluación en paralelo de los miembros. En los procesos de la
+    # puntuación por lotes se usa un hilo y ningún executor: el paralelismo lo dan los procesos.
+    def configure(self, threads, parallel):
+        self.threads = {name: int(threads) for name in self._models}
+        self.members = {name: with_threads(model, self.threads[name]) for name, model in self._models.items()}
+        self.close()
+        self.parallel = parallel and len(self.members) > 1
+        self._executor = ThreadPoolExecutor(max_workers=len(self.members)) if self.parallel else None
+
+    def _predict_member(self, name, data):
+        with timed('predict_proba', MEMBER_SECONDS, member=name):
+            return self.members[name].predict_proba(data)[:, 1]
+
+    # Probabilidad de cada miembro y score ponderado. Una petición que aún usa un motor ya cerrado
+    # (el registro lo ha sustituido al recargar) evalúa los miembros en secuencia.
+    def predict(self, data):
+        executor = self._executor
+        preds = None
+        if executor is not None and len(data) >= self.min_parallel_rows:
+            try:
+                futures = {name: executor.submit(self._predict_member, name, data) for name in self.members}
+            except RuntimeError:
+                futures = None
+            if futures is not None:
+                preds = {name: future.result() for name, future in futures.items()}
+        if preds is None:
+            preds = {name: self._predict_member(name, data) for name in self.members}
+        with timed('weighting'):
+            scores = sum(preds[name] * self.weights[name] for name in self.members)
+        return preds, scores
+
+    # Miembros del más barato al más caro. El orden es fijo: no depende de la carga del momento,
+    # así que dos procesos (o dos arranques) evalúan la cascada igual.
+    def cascade_order(self):
+        return list(self._cascade_order)
+
+    # Cascada exacta: evalúa los miembros en orden y, tras cada uno, acota el score de cada fila entre
+    # lo ya sumado y lo ya sumado más el peso de los que faltan (las probabilidades están en [0, 1]).
+    # Las filas cuyos dos límites caen en la misma banda (cuts: límites entre bandas) ya no se evalúan.
+    # Devuelve la banda de cada fila (0, 1, ...), los límites del score, el score exacto solo si se
+    # pide (exact=True evalúa todos los miembros) y cuántas filas ha evaluado cada miembro.
+    def predict_band(self, data, cuts, exact=False, order=None):
+        cuts = np.asarray(cuts, dtype=np.float64)
+        if exact:
+            _, scores = self.predict(data)
+            scores = np.asarray(scores, dtype=np.float64)
+            return {'band': np.searchsorted(cuts, scores, side='right'), 'lower': scores, 'upper': scores,
+                    'score': scores, 'evaluated': {name: len(data) for name in self.members}}
+        order = order or self._cascade_order
+        lower = np.zeros(len(data))
+        # Peso de los miembros aún no evaluados en cada fila
+        unseen = np.full(len(data), float(sum(self.weights[name] for name in order)))
+        band = np.full(len(data), -1)
+        pending = np.arange(len(data))
+        evaluated = {}
+        for name in order:
+            evaluated[name] = len(pending)
+            if not len(pending):
+                continue
+            lower[pending] += self._predict_member(name, data.iloc[pending]) * self.weights[name]
+            unseen[pending] -= self.weights[name]
+            band_low = np.searchsorted(cuts, lower[pending] - CASCADE_EPS, side='right')
+            band_high = np.searchsorted(cuts, lower[pending] + unseen[pending] + CASCADE_EPS, side='right')
+            decided = band_low == band_high
+            band[pending[decided]] = band_low[decided]
+            pending = pending[~decided]
+        # Filas evaluadas con todos los miembros y justo en el límite de una banda
+        band[pending] = np.searchsorted(cuts, lower[pending], side='right')
+        unseen = np.maximum(unseen, 0.0)
+        return {'band': band, 'lower': lower, 'upper': lower + unseen, 'score': None, 'evaluated': evaluated}
+
+    def close(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -0,0 +1,246 @@
+# Optimización de los pesos y el umbral del ensemble con predicciones out-of-fold en caché
+#   python ensemble_optimizer.py --output ../Artifacts/ensemble_config.json
+#   python ensemble_optimizer.py --step 0.02 --beta 2 --min-precision 0.15 --resample none
+#
+# 1. Probabilidades out-of-fold de cada miembro (validación cruzada estratificada sobre la parte de
+#    entrenamiento, con los mismos hiperparámetros que los modelos de Artifacts/) y probabilidades de
+#    los modelos de Artifacts/ sobre la parte de test. Se calculan una vez y se guardan en oof_cache/,
+#    indexadas por el hash de los datos, de los modelos y de las opciones.
+# 2. Búsqueda vectorizada en NumPy sobre la rejilla del símplex de pesos (paso --step) y la rejilla de
+#    umbrales: para cada combinación de pesos se cuentan aciertos y falsos positivos de todos los
+#    umbrales a la vez con un histograma acumulado.
+# 3. La mejor configuración según F-beta en out-of-fold se evalúa en test y se escribe como
+#    ensemble_config.json con precisión, recall y F1 del punto elegido.
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from api_backend import ARTIFACTS_DIR, load_ensemble_config, load_models
+from train_pipeline import DATA_PATH, SEED, TARGET, file_sha256, resample
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, 'oof_cache')
+CACHE_FORMAT = 1
+# Bloque de combinaciones de pesos evaluadas a la vez (filas × bloque en float32)
+WEIGHT_CHUNK = 256
+
+
+# Combinaciones de pesos no negativos que suman 1 con paso `step` (estrellas y barras)
+def simplex_grid(n_members, step):
+    units = int(round(1 / step))
+    if not np.isclose(units * step, 1.0):
+        raise ValueError(f"El paso {step} debe dividir 1 en partes iguales")
+    bars = np.array(list(combinations(range(units + n_members - 1), n_members - 1)), dtype=np.int64)
+    bars = bars.reshape(-1, n_members - 1)
+    edges = np.hstack([np.full((len(bars), 1), -1), bars, np.full((len(bars), 1), units + n_members - 1)])
+    return (np.diff(edges, axis=1) - 1) / units
+
+
+# Verdaderos y falsos positivos de cada combinación de pesos (filas de W) en cada umbral.
+# Un reclamo es positivo en el umbral t si score >= t.
+def confusion_grid(probs, y, weights, thresholds, chunk=WEIGHT_CHUNK):
+    probs = np.asarray(probs, dtype=np.float32)
+    positive = np.asarray(y).astype(bool)
+    n_thresholds = len(thresholds)
+    thresholds32 = np.asarray(thresholds, dtype=np.float32)
+    tp = np.empty((len(weights), n_thresholds), dtype=np.int64)
+    fp = np.empty_like(tp)
+    for start in range(0, len(weights), chunk):
+        block = np.asarray(weights[start:start + chunk], dtype=np.float32)
+        scores = probs @ block.T
+        # Número de umbrales <= score: el reclamo es positivo en los umbrales de índice menor
+        bins = np.searchsorted(thresholds32, scores.ravel(), side='right').reshape(scores.shape)
+        offsets = np.arange(len(block)) * (n_thresholds + 1)
+        for target, flag in ((tp, True), (fp, False)):
+            idx = (bins[positive == flag] + offsets).ravel()
+            counts = np.bincount(idx, minlength=len(block) * (n_thresholds + 1)).reshape(len(block), -1)
+            # positivos en el umbral j = reclamos con bins > j
+            target[start:start + len(block)] = np.cumsum(counts[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    return tp, fp
+
+
+def scores_from_confusion(tp, fp, n_positive, beta=1.0):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = tp / max(1, n_positive)
+        b2 = beta * beta
+        fbeta = np.where(precision + recall > 0, (1 + b2) * precision * recall / (b2 * precision + recall), 0.0)
+    return precision, recall, fbeta
+
+
+def point_metrics(probs, y, weights, threshold):
+    scores = np.asarray(probs, dtype=np.float64) @ np.asarray(weights, dtype=np.float64)
+    pred = scores >= threshold
+    y = np.asarray(y).astype(bool)
+    tp, fp, fn = int((pred & y).sum()), int((pred & ~y).sum()), int((~pred & y).sum())
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'precision': round(precision, 4), 'recall': round(recall, 4), 'f1': round(f1, 4),
+            'flagged_rate': round(float(pred.mean()), 4)}
+
+
+# Mejor punto (pesos, umbral) según F-beta, opcionalmente con una precisión o un recall mínimos
+def optimize(probs, y, step=0.05, thresholds=None, beta=1.0, min_precision=None, min_recall=None):
+    thresholds = np.round(np.arange(0.01, 1.0, 0.01), 4) if thresholds is None else np.asarray(thresholds)
+    weights = simplex_grid(probs.shape[1], step)
+    inicio = time.perf_counter()
+    tp, fp = confusion_grid(probs, y, weights, thresholds)
+    precision, recall, fbeta = scores_from_confusion(tp, fp, int(np.asarray(y).sum()), beta)
+    elapsed = time.perf_counter() - inicio
+    objective = fbeta.copy()
+    if min_precision is not None:
+        objective[precision < min_precision] = -1
+    if min_recall is not None:
+        objective[recall < min_recall] = -1
+    i, j = np.unravel_index(np.argmax(objective), objective.shape)
+    if objective[i, j] < 0:
+        raise ValueError("Ninguna configuración cumple las restricciones de precisión/recall")
+    return {
+        'weights': weights[i],
+        'threshold': float(thresholds[j]),
+        'fbeta': float(fbeta[i, j]),
+        'configurations': int(weights.shape[0] * len(thresholds)),
+        'seconds': elapsed,
+    }
+
+
+def cache_key(data_path, members, folds, resample_method):
+    digest = hashlib.sha256(json.dumps({
+        'format': CACHE_FORMAT, 'data': file_sha256(data_path), 'folds': folds, 'resample': resample_method,
+        'seed': SEED,
+        'models': {name: file_sha256(os.path.join(ARTIFACTS_DIR, f'model_{name}.pkl')) for name in members},
+    }, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def _fold_predictions(name, model, X, y, train_idx, valid_idx, resample_method):
+    import warnings
+    from sklearn.base import clone
+
+    warnings.simplefilter('ignore')
+    fold_model = clone(model)
+    if type(fold_model).__module__.startswith('lightgbm'):
+        # LightGBM acepta verbose como parámetro adicional aunque no esté en get_params()
+        fold_model.set_params(verbose=-1)
+    X_fit, y_fit = resample(X.iloc[train_idx], y.iloc[train_idx], resample_method)
+    fold_model.fit(X_fit, y_fit)
+    return name, valid_idx, fold_model.predict_proba(X.iloc[valid_idx])[:, 1]
+
+
+# Probabilidades out-of-fold (entrenamiento) y de los modelos publicados (test), desde caché si existen
+def member_probabilities(data_path, models, folds=5, resample_method='smote', jobs=-1, cache_dir=CACHE_DIR):
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import StratifiedKFold, train_test_split
+
+    members = list(models)
+    key = cache_key(data_path, members, folds, resample_method)
+    path = os.path.join(cache_dir, f'{key}.npz')
+    if os.path.exists(path):
+        logger.info("Predicciones out-of-fold desde la caché %s", path)
+        with np.load(path) as cached:
+            return members, cached['oof'], cached['y_train'], cached['test'], cached['y_test']
+
+    data = pd.read_csv(data_path)
+    X, y = data.drop(columns=[TARGET]), data[TARGET]
+    # Misma partición que el notebook y train_pipeline.py: el test no se usa para elegir la configuración
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=SEED)
+    X_train, y_train = X_train.reset_index(drop=True), y_train.reset_index(drop=True)
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=SEED).split(X_train, y_train))
+    inicio = time.perf_counter()
+    results = Parallel(n_jobs=jobs)(
+        delayed(_fold_predictions)(name, model, X_train, y_train, train_idx, valid_idx, resample_method)
+        for name, model in models.items() for train_idx, valid_idx in splits
+    )
+    oof = np.empty((len(X_train), len(members)), dtype=np.float64)
+    for name, valid_idx, proba in results:
+        oof[valid_idx, members.index(name)] = proba
+    test = np.column_stack([models[name].predict_proba(X_test)[:, 1] for name in members])
+    logger.info("Predicciones out-of-fold de %d miembros x %d particiones en %.1f s",
+                len(members), folds, time.perf_counter() - inicio)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f'{path}.tmp.npz'
+    np.savez(tmp, oof=oof, y_train=y_train.to_numpy(), test=test, y_test=y_test.to_numpy(),
+             members=np.array(members))
+    os.replace(tmp, path)
+    return members, oof, y_train.to_numpy(), test, y_test.to_numpy()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Optimiza pesos y umbral del ensemble con predicciones out-of-fold')
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--resample', choices=['smote', 'none'], default='smote',
+                        help='Remuestreo al reajustar cada partición (el de los modelos publicados es SMOTE)')
+    parser.add_argument('--jobs', type=int, default=-1)
+    parser.add_argument('--step', type=float, default=0.05, help='Paso de la rejilla de pesos')
+    parser.add_argument('--beta', type=float, default=1.0, help='F-beta a maximizar (beta > 1 prima el recall)')
+    parser.add_argument('--min-precision', type=float, default=None)
+    parser.add_argument('--min-recall', type=float, default=None)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('-o', '--output', help='Fichero ensemble_config.json a escribir (por defecto solo se muestra)')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'), format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    import warnings
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        config = load_ensemble_config()
+        models = load_models(config, native=False)
+    members, oof, y_train, test, y_test = member_probabilities(
+        args.data, models, args.folds, args.resample, args.jobs, args.cache_dir)
+
+    best = optimize(oof, y_train, args.step, beta=args.beta,
+                    min_precision=args.min_precision, min_recall=args.min_recall)
+    print(f"{best['configurations']:,} configuraciones evaluadas en {best['seconds']:.2f} s "
+          f"({best['configurations'] / best['seconds']:,.0f} por segundo)")
+
+    current = np.array([config['weights'][name] for name in members])
+    current = current / current.sum()
+    # En producción los pesos de los miembros presentes se reescalan a la suma de la configuración
+    # completa (renormalize_weights) y el umbral no cambia: con pesos que suman 1 se divide por esa suma
+    current_threshold = config['threshold'] / sum(config['weights'].values())
+    print(f"{'':<12} {'pesos':<40} {'umbral':>7}  {'OOF':<42} test")
+    for label, weights, threshold in (('actual', current, current_threshold),
+                                      ('optimizada', best['weights'], best['threshold'])):
+        pesos = ', '.join(f"{name}={w:.2f}" for name, w in zip(members, weights))
+        oof_m, test_m = point_metrics(oof, y_train, weights, threshold), point_metrics(test, y_test, weights, threshold)
+        print(f"{label:<12} {pesos:<40} {threshold:7.3f}  "
+              f"P={oof_m['precision']:.3f} R={oof_m['recall']:.3f} F1={oof_m['f1']:.3f}{'':<12} "
+              f"P={test_m['precision']:.3f} R={test_m['recall']:.3f} F1={test_m['f1']:.3f}")
+
+    optimized = {
+        'weights': {name: round(float(w), 4) for name, w in zip(members, best['weights'])},
+        'threshold': best['threshold'],
+    }
+    if 'threads' in config:
+        optimized['threads'] = config['threads']
+    optimized['optimization'] = {
+        'objective': f"f{args.beta:g}", 'step': args.step, 'folds': args.folds, 'resample': args.resample,
+        'min_precision': args.min_precision, 'min_recall': args.min_recall,
+        'oof': point_metrics(oof, y_train, best['weights'], best['threshold']),
+        'test': point_metrics(test, y_test, best['weights'], best['threshold']),
+    }
+    text = json.dumps(optimized, ensure_ascii=False, indent=2)
+    if args.output:
+        tmp = f'{args.output}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, args.output)
+        print(f"Configuración guardada en {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,411 @@
+# Predictor compilado del ensemble para puntuar reclamos sueltos con baja latencia
+#   python fast_predictor.py            exporta Artifacts/fast_predictor.npz (verificando la paridad)
+#
+# Los árboles de XGBoost, LightGBM y los bosques de sklearn se aplanan en arrays de NumPy
+# (variable, umbral, hijos, dirección de los nulos y valor de hoja) y la regresión logística
+# se reduce a sus coeficientes. El score ponderado se calcula directamente sobre la matriz
+# de variables en float32, sin la validación de DataFrames ni la preparación de cada booster.
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from ensemble import renormalize_weights
+
+FORMAT_VERSION = 1
+# Diferencia máxima admitida frente a las predicciones de los modelos originales
+TOLERANCE = 1e-6
+# Filas por bloque al recorrer los árboles (limita la memoria de los índices de nodo)
+CHUNK_ROWS = 4096
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+# Árboles aplanados de un miembro: cada nodo con la condición "x < umbral → izquierda".
+# Las hojas apuntan a sí mismas, así que recorrer más niveles de la cuenta no cambia el resultado.
+class _TreeBuilder:
+    def __init__(self):
+        self.feature, self.threshold, self.nan_left, self.left, self.right, self.value = [], [], [], [], [], []
+        self.roots = []
+        self.depth = 0
+
+    def add_node(self, feature=0, threshold=np.inf, nan_left=False, value=0.0):
+        self.feature.append(feature)
+        self.threshold.append(threshold)
+        self.nan_left.append(nan_left)
+        self.left.append(len(self.left))
+        self.right.append(len(self.right))
+        self.value.append(value)
+        return len(self.feature) - 1
+
+    def link(self, node, left, right):
+        self.left[node] = left
+        self.right[node] = right
+
+    def arrays(self):
+        return {
+            'feature': np.asarray(self.feature, dtype=np.int32),
+            'threshold': np.asarray(self.threshold, dtype=np.float64),
+            'nan_left': np.asarray(self.nan_left, dtype=bool),
+            'left': np.asarray(self.left, dtype=np.int32),
+            'right': np.asarray(self.right, dtype=np.int32),
+            'value': np.asarray(self.value, dtype=np.float64),
+            'roots': np.asarray(self.roots, dtype=np.int32),
+        }
+
+
+# XGBoost: x < umbral (ambos en float32); los nulos siguen default_left
+def _xgb_trees(model, builder):
+    booster = model.get_booster()
+    raw = json.loads(booster.save_raw('json'))['learner']
+    if raw['gradient_booster']['name'] != 'gbtree':
+        raise ValueError(f"Booster de XGBoost no soportado: {raw['gradient_booster']['name']}")
+    if raw['objective']['name'] != 'binary:logistic':
+        raise ValueError(f"Objetivo de XGBoost no soportado: {raw['objective']['name']}")
+    trees = raw['gradient_booster']['model']['trees']
+    best_iteration = getattr(model, 'best_iteration', None)
+    if best_iteration is not None:
+        per_iteration = int(raw['gradient_booster']['model']['gbtree_model_param']['num_parallel_tree'])
+        trees = trees[:(best_iteration + 1) * per_iteration]
+    for tree in trees:
+        if any(tree['split_type']):
+            raise ValueError("Los splits categóricos de XGBoost no están soportados")
+        offset = len(builder.feature)
+        for i, left in enumerate(tree['left_children']):
+            condition = tree['split_conditions'][i]
+            if left == -1:
+                builder.add_node(value=condition)
+            else:
+                builder.add_node(tree['split_indices'][i], np.float32(condition), bool(tree['default_left'][i]))
+        for i, (left, right) in enumerate(zip(tree['left_children'], tree['right_children'])):
+            if left != -1:
+                builder.link(offset + i, offset + left, offset + right)
+        builder.roots.append(offset)
+        builder.depth = max(builder.depth, _depth(tree['left_children'], tree['right_children']))
+    base_score = float(str(raw['learner_model_param']['base_score']).strip('[]'))
+    return {'link': 'logit', 'base': float(np.log(base_score / (1 - base_score))), 'scale': 1.0}
+
+
+def _depth(left, right, node=0):
+    if left[node] == -1:
+        return 0
+    return 1 + max(_depth(left, right, left[node]), _depth(left, right, right[node]))
+
+
+# LightGBM: x <= umbral en double; sin missing_type los nulos se tratan como 0
+def _lgbm_trees(model, builder):
+    best_iteration = getattr(model, 'best_iteration_', None) or None
+    dump = model.booster_.dump_model(num_iteration=best_iteration)
+    objective = dump['objective'].split()
+    if objective[0] != 'binary':
+        raise ValueError(f"Objetivo de LightGBM no soportado: {dump['objective']}")
+    scale = float(dict(p.split(':') for p in objective[1:]).get('sigmoid', 1.0))
+
+    def add(node, depth):
+        if 'leaf_value' in node:
+            builder.depth = max(builder.depth, depth)
+            return builder.add_node(value=node['leaf_value'])
+        if node['decision_type'] != '<=' or node['missing_type'] == 'Zero':
+            raise ValueError(f"Split de LightGBM no soportado: {node['decision_type']} / {node['missing_type']}")
+        threshold = node['threshold']
+        if node['missing_type'] == 'NaN':
+            nan_left = node['default_left']
+        else:
+            nan_left = 0.0 <= threshold
+        index = builder.add_node(node['split_feature'], np.nextafter(threshold, np.inf), nan_left)
+        builder.link(index, add(node['left_child'], depth + 1), add(node['right_child'], depth + 1))
+        return index
+
+    for tree in dump['tree_info']:
+        builder.roots.append(add(tree['tree_structure'], 0))
+    # En modo random forest LightGBM promedia los árboles antes de aplicar la sigmoide
+    return {'link': 'logit', 'average': bool(dump.get('average_output')), 'base': 0.0, 'scale': scale}
+
+
+# Bosques de sklearn (RandomForest/ExtraTrees): x <= umbral sobre float32; media de las probabilidades de hoja
+def _forest_trees(model, builder):
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        offset = len(builder.feature)
+        missing_left = getattr(tree, 'missing_go_to_left', None)
+        value = tree.value[:, 0, :]
+        proba = value[:, 1] / value.sum(axis=1)
+        for i in range(tree.node_count):
+            if tree.children_left[i] == -1:
+                builder.add_node(value=proba[i])
+            else:
+                nan_left = bool(missing_left[i]) if missing_left is not None else False
+                builder.add_node(tree.feature[i], np.nextafter(tree.threshold[i], np.inf), nan_left)
+        for i in range(tree.node_count):
+            if tree.children_left[i] != -1:
+                builder.link(offset + i, offset + tree.children_left[i], offset + tree.children_right[i])
+        builder.roots.append(offset)
+        builder.depth = max(builder.depth, tree.max_depth)
+    return {'link': 'identity', 'average': True, 'base': 0.0, 'scale': 1.0}
+
+
+def _member_kind(model):
+    module = type(model).__module__
+    if module.startswith('xgboost'):
+        return 'xgb'
+    if module.startswith('lightgbm'):
+        return 'lgbm'
+    if hasattr(model, 'estimators_') and hasattr(model.estimators_[0], 'tree_'):
+        return 'forest'
+    if hasattr(model, 'coef_') and hasattr(model, 'intercept_'):
+        return 'linear'
+    raise ValueError(f"Modelo no soportado por el predictor compilado: {type(model).__name__}")
+
+
+class FastPredictor:
+    def __init__(self, arrays, meta):
+        self.arrays = arrays
+        self.meta = meta
+        self.feature_cols = meta['feature_cols']
+        self.weights = meta['weights']
+        self.missing = meta['missing']
+        self.threshold = meta['threshold']
+        self.members = {spec['name']: spec for spec in meta['members']}
+        # Arrays de árboles de todos los miembros concatenados
+        # (índices en intp: NumPy no tiene que convertirlos en cada acceso)
+        self._feature = arrays['feature'].astype(np.intp)
+        self._threshold = arrays['threshold']
+        self._nan_left = arrays['nan_left']
+        self._children = np.stack([arrays['right'], arrays['left']], axis=1).ravel().astype(np.intp)
+        self._value = arrays['value']
+        self._roots = arrays['roots'].astype(np.intp)
+        self._depth = int(meta['depth'])
+        # Reducción de todos los miembros con dos productos matriciales:
+        #   raw = hojas @ trees + X @ linear + base;  p = sigmoid(scale * raw) o raw (bosques: media de probabilidades)
+        specs = meta['members']
+        self._reduce_trees = np.zeros((len(self._roots), len(specs)))
+        self._reduce_linear = np.zeros((len(self.feature_cols), len(specs)))
+        for j, spec in enumerate(specs):
+            if spec['kind'] == 'linear':
+                self._reduce_linear[:, j] = arrays[f"coef_{spec['name']}"]
+            else:
+                n_trees = spec['stop'] - spec['start']
+                self._reduce_trees[spec['start']:spec['stop'], j] = 1.0 / n_trees if spec.get('average') else 1.0
+        self._base = np.array([spec['base'] for spec in specs])
+        self._scale = np.array([spec['scale'] for spec in specs])
+        self._logit = np.array([spec['link'] == 'logit' for spec in specs])
+        self._weights = np.array([self.weights[spec['name']] for spec in specs])
+        self._has_linear = bool(self._reduce_linear.any())
+        # Como en sklearn, los miembros lineales no admiten nulos: esas filas se rechazan
+        self.accepts_nan = not self._has_linear
+
+    # Hoja alcanzada en cada árbol por cada fila: (filas, árboles)
+    def _leaves(self, X):
+        has_nan = np.isnan(X).any()
+        if len(X) == 1:
+            # Un solo reclamo: recorrido con índices 1-D, sin indexar por filas
+            return self._walk(X[0], self._roots, None, has_nan)[None, :]
+        node = np.broadcast_to(self._roots, (len(X), len(self._roots)))
+        return self._walk(X, node, np.arange(len(X))[:, None], has_nan)
+
+    def _walk(self, X, node, rows, has_nan):
+        for _ in range(self._depth):
+            x = X[self._feature[node]] if rows is None else X[rows, self._feature[node]]
+            go_left = x < self._threshold[node]
+            if has_nan:
+                go_left = np.where(np.isnan(x), self._nan_left[node], go_left)
+            node = self._children[2 * node + go_left]
+        return self._value[node]
+
+    # Probabilidad de cada miembro (filas, miembros) y score ponderado
+    def _predict_matrix(self, X):
+        if self._has_linear and np.isnan(X).any():
+            linear = [spec['name'] for spec in self.meta['members'] if spec['kind'] == 'linear']
+            raise ValueError(f"La entrada contiene valores nulos y el miembro lineal {', '.join(linear)} no los admite")
+        raw = np.empty((len(X), len(self._base)))
+        for i in range(0, len(X), CHUNK_ROWS):
+            raw[i:i + CHUNK_ROWS] = self._leaves(X[i:i + CHUNK_ROWS]) @ self._reduce_trees
+        if self._has_linear:
+            raw += X @ self._reduce_linear
+        raw += self._base
+        proba = np.where(self._logit, _sigmoid(self._scale * raw), raw)
+        return proba, proba @ self._weights
+
+    # Misma interfaz que EnsembleEngine.predict: probabilidad de cada miembro y score ponderado
+    def predict(self, data):
+        if hasattr(data, 'columns'):
+            data = data[self.feature_cols].to_numpy(dtype=np.float32)
+        X = np.atleast_2d(np.asarray(data, dtype=np.float32)).astype(np.float64)
+        proba, scores = self._predict_matrix(X)
+        return {name: proba[:, j] for j, name in enumerate(self.members)}, scores
+
+    # Score ponderado de un único vector de variables en float32 (orden de feature_cols)
+    def score_vector(self, vector):
+        return float(self._predict_matrix(np.asarray(vector, dtype=np.float32).astype(np.float64)[None, :])[1][0])
+
+    def save(self, path):
+        payload = dict(self.arrays)
+        payload['meta'] = np.array(json.dumps(self.meta))
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **payload)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files if name != 'meta'}
+            meta = json.loads(str(data['meta']))
+        if meta.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Formato de predictor compilado no soportado: {meta.get('format')}")
+        return cls(arrays, meta)
+
+    def close(self):
+        pass
+
+
+# Compila los modelos del ensemble (ya cargados) en un único FastPredictor
+def compile_ensemble(models, config, feature_cols, sources=None):
+    weights, missing = renormalize_weights(config['weights'], models)
+    builder = _TreeBuilder()
+    specs = []
+    arrays = {}
+    for name in weights:
+        model = models[name]
+        kind = _member_kind(model)
+        spec = {'name': name, 'kind': kind, 'start': len(builder.roots)}
+        if kind == 'xgb':
+            spec.update(_xgb_trees(model, builder))
+        elif kind == 'lgbm':
+            spec.update(_lgbm_trees(model, builder))
+        elif kind == 'forest':
+            spec.update(_forest_trees(model, builder))
+        else:
+            if model.coef_.shape[0] != 1:
+                raise ValueError(f"Se esperaba un modelo lineal binario en '{name}'")
+            arrays[f'coef_{name}'] = model.coef_[0].astype(np.float64)
+            spec.update({'link': 'logit', 'base': float(model.intercept_[0]), 'scale': 1.0})
+        spec['stop'] = len(builder.roots)
+        specs.append(spec)
+    arrays.update(builder.arrays())
+    meta = {
+        'format': FORMAT_VERSION,
+        'feature_cols': list(feature_cols),
+        'weights': weights,
+        'missing': missing,
+        'threshold': config['threshold'],
+        'members': specs,
+        'depth': builder.depth,
+        'sources': sources or {},
+    }
+    return FastPredictor(arrays, meta)
+
+
+# Huella de los artefactos de los que sale el predictor (para descartarlo si quedan obsoletos)
+def source_fingerprint(artifacts_dir, config):
+    names = ['ensemble_config.json', 'feature_cols.pkl']
+    names += [f'model_{name}.pkl' for name in config['weights']]
+    sources = {}
+    for name in names:
+        path = os.path.join(artifacts_dir, name)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                sources[name] = hashlib.sha256(f.read()).hexdigest()
+    return sources
+
+
+# Matriz de prueba que cruza todos los umbrales: para cada variable, valores a ambos lados
+# de cada corte, ceros y algún nulo
+def probe_matrix(predictor, n_rows=20000, seed=0, nan_rate=0.02):
+    rng = np.random.default_rng(seed)
+    n_features = len(predictor.feature_cols)
+    feature = predictor.arrays['feature']
+    threshold = predictor.arrays['threshold']
+    splits = np.isfinite(threshold)
+    X = np.zeros((n_rows, n_features), dtype=np.float32)
+    for j in range(n_features):
+        cuts = np.unique(threshold[splits & (feature == j)]).astype(np.float32)
+        candidates = np.concatenate([
+            [0.0],
+            cuts,
+            np.nextafter(cuts, np.float32(-np.inf)),
+            np.nextafter(cuts, np.float32(np.inf)),
+            cuts - 1,
+            cuts + 1,
+        ]).astype(np.float32)
+        X[:, j] = rng.choice(candidates, size=n_rows)
+    X[rng.random(X.shape) < nan_rate] = np.nan
+    return X
+
+
+# Máxima diferencia entre el predictor compilado y los modelos originales
+def check_parity(predictor, models, X):
+    import pandas as pd
+    from ensemble import EnsembleEngine
+
+    frame = pd.DataFrame(X, columns=predictor.feature_cols)
+    engine = EnsembleEngine(models, {'weights': predictor.meta['weights'], 'threshold': predictor.threshold}, parallel=False)
+    reference_preds, reference = engine.predict(frame)
+    preds, scores = predictor.predict(X)
+    diffs = {name: float(np.max(np.abs(preds[name] - reference_preds[name]))) for name in predictor.members}
+    diffs['score'] = float(np.max(np.abs(scores - reference)))
+    return diffs
+
+
+# Con un miembro lineal, las filas con nulos deben rechazarse igual que en los modelos originales
+def check_nan_rejection(predictor, models, X):
+    import pandas as pd
+    from ensemble import EnsembleEngine
+
+    engine = EnsembleEngine(models, {'weights': predictor.meta['weights'], 'threshold': predictor.threshold}, parallel=False)
+    rejected = []
+    for predict, data in ((predictor.predict, X), (engine.predict, pd.DataFrame(X, columns=predictor.feature_cols))):
+        try:
+            predict(data)
+            rejected.append(False)
+        except ValueError:
+            rejected.append(True)
+    return rejected
+
+
+def main(argv=None):
+    import argparse
+    import warnings
+
+    import api_backend
+
+    parser = argparse.ArgumentParser(description='Exporta el ensemble a un predictor compilado')
+    parser.add_argument('-o', '--output', default=os.path.join(api_backend.ARTIFACTS_DIR, 'fast_predictor.npz'))
+    parser.add_argument('--probe-rows', type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        config = api_backend.load_ensemble_config()
+        models = api_backend.load_models(config, native=False)
+        feature_cols = api_backend.load_feature_cols()
+    sources = source_fingerprint(api_backend.ARTIFACTS_DIR, config)
+    predictor = compile_ensemble(models, config, feature_cols, sources)
+    diffs = check_parity(predictor, models, probe_matrix(predictor, args.probe_rows, nan_rate=0.0))
+    print(f"Diferencia máxima frente a los modelos originales: {diffs}")
+    # Nulos: solo los miembros de árboles (la regresión logística no los admite)
+    tree_members = [spec['name'] for spec in predictor.meta['members'] if spec['kind'] != 'linear']
+    if tree_members:
+        trees_only = compile_ensemble({name: models[name] for name in tree_members},
+                                      {'weights': {name: config['weights'][name] for name in tree_members},
+                                       'threshold': config['threshold']}, feature_cols)
+        nan_diffs = check_parity(trees_only, models, probe_matrix(trees_only, args.probe_rows))
+        print(f"Diferencia máxima con valores nulos: {nan_diffs}")
+        diffs.update({f'{name}_nulos': value for name, value in nan_diffs.items()})
+    if not predictor.accepts_nan:
+        rejected = check_nan_rejection(predictor, models, probe_matrix(predictor, args.probe_rows))
+        print(f"Filas con nulos rechazadas (compilado, modelos originales): {rejected}")
+        if rejected != [True, True]:
+            raise SystemExit("El predictor compilado no trata las filas con nulos como el ensemble")
+    if max(diffs.values()) > TOLERANCE:
+        raise SystemExit(f"El predictor compilado no reproduce el ensemble (tolerancia {TOLERANCE})")
+    predictor.save(args.output)
+    print(f"Predictor compilado guardado en {args.output} "
+          f"({len(predictor.arrays['roots'])} árboles, {len(predictor.arrays['feature'])} nodos)")
+
+
+if __name__ == '__main__':
+    main()
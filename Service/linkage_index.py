@@ -0,0 +1,263 @@
+# Índice de vínculos entre reclamos por número de póliza y de agente (PolicyNumber, RepNumber)
+# Cada póliza y cada agente es un nodo y cada reclamo une su póliza con su agente (union-find con
+# unión por tamaño y compresión de caminos): los componentes conexos agrupan los reclamos relacionados
+# a través de pólizas o agentes compartidos. Por nodo y por componente se guardan los reclamos y, de
+# los etiquetados (histórico), cuántos fueron fraude. Añadir un reclamo o consultar los vínculos de
+# uno cuesta O(1) amortizado, así que el índice se mantiene al día con cada reclamo puntuado. La
+# consulta (link) no modifica el índice: los reclamos se registran (register) después de puntuarlos.
+# Un reclamo con número de reclamo se registra una sola vez y no se encuentra a sí mismo (así las
+# filas del histórico, que se identifican por fichero y fila); sin él, cada envío cuenta como un reclamo.
+import os
+import threading
+
+import numpy as np
+
+# Campos opcionales del formulario con los identificadores (raw_to_form los toma del dataset original)
+POLICY_FIELD = 'NUMERO DE POLIZA'
+REP_FIELD = 'NUMERO DEL AGENTE'
+CLAIM_FIELD = 'NUMERO DE RECLAMO'
+# Reclamos etiquetados mínimos para dar una tasa de fraude (con menos, NaN)
+MIN_LABELLED = 30
+# Vínculos de un reclamo con los anteriores. indice_*: tasa de fraude frente a la tasa global
+LINK_COLUMNS = ['reclamos_poliza', 'reclamos_agente', 'tasa_fraude_agente', 'indice_fraude_agente',
+                'reclamos_vinculados', 'tasa_fraude_vinculados', 'indice_fraude_vinculados']
+
+
+# Identificador normalizado ('12', 12 y 12.0 son el mismo); None si falta
+def _key(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    if isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return None
+        if float(value).is_integer():
+            value = int(value)
+    value = str(value).strip()
+    return value or None
+
+
+# Número de reclamo de una fila de un fichero en el formato original, que no trae ninguno
+def source_claim_id(source, row):
+    return f'{os.path.basename(source)}:{row}'
+
+
+class LinkageIndex:
+    def __init__(self, history=None):
+        # history: CSV en el formato original (PolicyNumber, RepNumber, FraudFound_P) con el que se
+        # construye el índice la primera vez que se usa; cada fila con su número (source_claim_id)
+        self.history = history
+        self._loaded = history is None
+        # Nodo de cada póliza y de cada agente
+        self._policies = {}
+        self._reps = {}
+        self._parent = []
+        self._size = []
+        # Por nodo: reclamos, etiquetados y fraudes; en la raíz de cada componente, los del componente
+        # (listas paralelas indexadas por nodo)
+        self._claims, self._labelled, self._frauds = [], [], []
+        self._c_claims, self._c_labelled, self._c_frauds = [], [], []
+        self.claims = self.labelled = self.frauds = 0
+        # Reclamos registrados con número: (póliza, agente, número) → (etiquetado, fraude)
+        self._keys = {}
+        self._lock = threading.RLock()
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._loaded = True
+            self.load_history(self.history)
+
+    def load_history(self, path):
+        import pandas as pd
+
+        raw = pd.read_csv(path, encoding='utf-8-sig', usecols=['PolicyNumber', 'RepNumber', 'FraudFound_P'])
+        self.register(raw['PolicyNumber'].tolist(), raw['RepNumber'].tolist(),
+                      [source_claim_id(path, row) for row in raw.index], raw['FraudFound_P'].tolist())
+
+    def _node(self, ids, value):
+        node = ids.get(value)
+        if node is None:
+            node = ids[value] = len(self._parent)
+            self._parent.append(node)
+            self._size.append(1)
+            for values in (self._claims, self._labelled, self._frauds,
+                           self._c_claims, self._c_labelled, self._c_frauds):
+                values.append(0)
+        return node
+
+    # Raíz del componente, con compresión de caminos a la mitad
+    def _find(self, node):
+        parent = self._parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def _union(self, a, b):
+        a, b = self._find(a), self._find(b)
+        if a == b:
+            return a
+        if self._size[a] < self._size[b]:
+            a, b = b, a
+        self._parent[b] = a
+        self._size[a] += self._size[b]
+        self._c_claims[a] += self._c_claims[b]
+        self._c_labelled[a] += self._c_labelled[b]
+        self._c_frauds[a] += self._c_frauds[b]
+        return a
+
+    def _add(self, policy, rep, fraud=None):
+        labelled = int(fraud is not None and fraud == fraud)
+        fraud = int(labelled and bool(fraud))
+        root = None
+        for ids, value in ((self._policies, policy), (self._reps, rep)):
+            if value is None:
+                continue
+            node = self._node(ids, value)
+            self._claims[node] += 1
+            self._labelled[node] += labelled
+            self._frauds[node] += fraud
+            root = self._find(node) if root is None else self._union(root, node)
+        if root is None:
+            return
+        self._c_claims[root] += 1
+        self._c_labelled[root] += labelled
+        self._c_frauds[root] += fraud
+        self.claims += 1
+        self.labelled += labelled
+        self.frauds += fraud
+
+    # Tasa de fraude global de los reclamos etiquetados
+    def _base_rate(self):
+        return self.frauds / self.labelled if self.labelled else 0.0
+
+    # Tasa de fraude (con suficientes etiquetados) y su índice frente a la tasa global
+    @staticmethod
+    def _rate(labelled, frauds, base):
+        if labelled < MIN_LABELLED:
+            return np.nan, np.nan
+        rate = frauds / labelled
+        return rate, (rate / base if base else np.nan)
+
+    # Vínculos de cada reclamo de un lote con los ya registrados y con los anteriores del mismo lote,
+    # sin registrar ninguno (eso lo hace register, una vez puntuados). keys: número de cada reclamo
+    # (None si no lo trae); uno ya registrado con la misma póliza, agente y número no se cuenta a sí mismo.
+    # Devuelve {columna: array} con LINK_COLUMNS.
+    def link(self, policies, reps, keys=None):
+        policies, reps, keys = self._claims_of(policies, reps, keys)
+        # Los anteriores del lote se llevan aparte: reclamos por póliza y por agente, y un union-find propio
+        # sobre las raíces del índice y los nodos nuevos (('p', póliza) o ('r', agente)) con los totales
+        # de cada grupo
+        pending_policies = {}
+        pending_reps = {}
+        parent = {}
+        totals = {}
+        seen = set()
+
+        def find(group):
+            while parent[group] != group:
+                parent[group] = parent[parent[group]]
+                group = parent[group]
+            return group
+
+        # Grupo del lote de un nodo del índice (o de uno nuevo si node es None)
+        def group_of(node, new):
+            group = new if node is None else self._find(node)
+            if group not in parent:
+                parent[group] = group
+                totals[group] = [0, 0, 0] if node is None else [
+                    self._c_claims[group], self._c_labelled[group], self._c_frauds[group]]
+            return find(group)
+
+        rows = []
+        nan_rate = (np.nan, np.nan)
+        with self._lock:
+            self._ensure_loaded()
+            # Los reclamos que se registran no tienen etiqueta: la tasa global no cambia en el lote
+            base = self._base_rate()
+            for policy, rep, key in zip(policies, reps, keys):
+                policy_claims = rep_claims = rep_labelled = rep_frauds = 0
+                policy_root = rep_root = None
+                if policy is not None:
+                    node = self._policies.get(policy)
+                    policy_claims = pending_policies.get(policy, 0) + (0 if node is None else self._claims[node])
+                    policy_root = group_of(node, ('p', policy))
+                if rep is not None:
+                    node = self._reps.get(rep)
+                    rep_claims = pending_reps.get(rep, 0)
+                    if node is not None:
+                        rep_claims += self._claims[node]
+                        rep_labelled, rep_frauds = self._labelled[node], self._frauds[node]
+                    rep_root = group_of(node, ('r', rep))
+                root = policy_root if policy_root is not None else rep_root
+                linked, labelled, frauds = totals[root] if root is not None else (0, 0, 0)
+                if rep_root is not None and rep_root != root:
+                    # Póliza y agente en grupos distintos: se suman los dos
+                    linked, labelled, frauds = (a + b for a, b in zip((linked, labelled, frauds), totals[rep_root]))
+                claim = (policy, rep, key)
+                if key is not None and (claim in seen or claim in self._keys):
+                    # Ya registrado (o repetido en el lote): se descuenta a sí mismo
+                    own_labelled, own_fraud = self._keys.get(claim, (0, 0))
+                    policy_claims -= policy is not None
+                    rep_claims -= rep is not None
+                    rep_labelled, rep_frauds = rep_labelled - own_labelled, rep_frauds - own_fraud
+                    linked, labelled, frauds = linked - 1, labelled - own_labelled, frauds - own_fraud
+                elif root is not None:
+                    if key is not None:
+                        seen.add(claim)
+                    if policy is not None:
+                        pending_policies[policy] = pending_policies.get(policy, 0) + 1
+                    if rep is not None:
+                        pending_reps[rep] = pending_reps.get(rep, 0) + 1
+                    if rep_root is not None and rep_root != root:
+                        parent[rep_root] = root
+                        totals[root] = [a + b for a, b in zip(totals[root], totals[rep_root])]
+                    totals[root][0] += 1
+                rep_rate = self._rate(rep_labelled, rep_frauds, base) if rep is not None else nan_rate
+                rows.append((policy_claims, rep_claims, *rep_rate, linked, *self._rate(labelled, frauds, base)))
+        values = np.array(rows, dtype=np.float64).reshape(len(policies), len(LINK_COLUMNS))
+        return {column: values[:, j] for j, column in enumerate(LINK_COLUMNS)}
+
+    # Registro de los reclamos de un lote ya puntuado. Con número, cada reclamo se registra una sola vez
+    # aunque se vuelva a puntuar; frauds: etiqueta de cada uno si se conoce (None para los que se puntúan)
+    def register(self, policies, reps, keys=None, frauds=None):
+        policies, reps, keys = self._claims_of(policies, reps, keys)
+        frauds = [None] * len(policies) if frauds is None else frauds
+        with self._lock:
+            self._ensure_loaded()
+            for policy, rep, key, fraud in zip(policies, reps, keys, frauds):
+                if policy is None and rep is None:
+                    continue
+                if key is not None:
+                    claim = (policy, rep, key)
+                    if claim in self._keys:
+                        continue
+                    labelled = int(fraud is not None and fraud == fraud)
+                    self._keys[claim] = (labelled, int(labelled and bool(fraud)))
+                self._add(policy, rep, fraud)
+
+    # Vínculos de un reclamo (columnas de LINK_COLUMNS)
+    def lookup(self, policy, rep, key=None):
+        return {column: values[0].item() for column, values in self.link([policy], [rep], [key]).items()}
+
+    # Registra un reclamo; fraud: etiqueta si se conoce (None para los reclamos que se puntúan)
+    def add(self, policy, rep, fraud=None, key=None):
+        self.register([policy], [rep], [key], [fraud])
+
+    # Identificadores normalizados de un lote (None en la lista que falte)
+    @staticmethod
+    def _claims_of(policies, reps, keys):
+        n = len(policies if policies is not None else reps)
+        policies = [None] * n if policies is None else [_key(value) for value in policies]
+        reps = [None] * n if reps is None else [_key(value) for value in reps]
+        keys = [None] * n if keys is None else [_key(value) for value in keys]
+        return policies, reps, keys
+
+    def stats(self):
+        with self._lock:
+            self._ensure_loaded()
+            return {'reclamos': self.claims, 'etiquetados': self.labelled, 'fraudes': self.frauds,
+                    'polizas': len(self._policies), 'agentes': len(self._reps),
+                    'componentes': len({self._find(node) for node in range(len(self._parent))})}
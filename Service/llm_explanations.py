@@ -0,0 +1,310 @@
+# Explicaciones en lenguaje natural con el LLM
+# Un cliente de OpenAI reutilizado por clave (pool de conexiones), caché persistente en SQLite
+# por hash canónico del caso y modo por lotes asíncrono con concurrencia limitada y reintentos.
+# La librería openai solo se importa al crear el primer cliente (tarda más que el resto del backend).
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from metrics import CACHE_LOOKUPS, FAILURES, STAGE_SECONDS
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletionMessageParam
+
+MODEL = "gpt-4o-mini"
+MAX_TOKENS = 400
+# Cambiar si se modifica el prompt: las explicaciones en caché dejan de ser válidas
+PROMPT_VERSION = 1
+
+SYSTEM_PROMPT = (
+    "Eres un asistente experto en detección de fraudes en seguros de vehículos. "
+    "Tu tarea es explicar de manera clara y sencilla, pero profesional, por qué un reclamo fue clasificado con un nivel de riesgo determinado, "
+    "basándote únicamente en la información proporcionada del caso y en las recomendaciones automáticas generadas. "
+    "El texto debe estar dirigido a un empleado del área de siniestros, sin conocimientos técnicos. "
+    "No menciones puntuaciones, modelos, scores ni variables técnicas. "
+    "En su lugar, elabora una explicación comprensible que justifique el riesgo percibido y las acciones sugeridas. "
+    "No debes saludar al empleado ni referirte a él directamente. "
+    "Además, nunca dejes la explicación incompleta. Debes garantizar que la explicación esté totalmente terminada, "
+    "sin dejar dudas o puntos sin resolver."
+    "Para la explicación, puedes basarte en patrones comunes de riesgo. Algunos ejemplos incluyen:\n"
+    "- Es sospechoso si no hay testigos del accidente.\n"
+    "- Es sospechoso si no se presentó informe policial.\n"
+    "- Es sospechoso si no hay documentos adjuntos.\n"
+    "- Es sospechoso si hay muchos vehículos involucrados.\n"
+    "- Es sospechoso si el número de coches involucrados es 0 o no se especifica.\n"
+    "- También pueden influir reclamos pasados, valor del vehículo, edad del asegurado, etc.\n"
+)
+
+# Errores transitorios que se reintentan (el resto, p. ej. una clave no válida, se devuelven tal cual)
+def is_retryable(error):
+    import openai
+    return isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError))
+
+
+def build_messages(resultado, entrada):
+    # Serializar entrada como texto legible
+    entrada_legible = json.dumps({k: str(v) for k, v in entrada.items()}, ensure_ascii=False)
+    messages: list['ChatCompletionMessageParam'] = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": f"""
+Nivel de riesgo del reclamo: {resultado['riesgo']}
+Recomendaciones automáticas: {', '.join(resultado['recomendaciones'])}
+Información del reclamo: {entrada_legible}
+Redacta una explicación sencilla, clara y profesional que justifique el nivel de riesgo, tomando en cuenta las recomendaciones. La respuesta debe estar completa y no quedarte NUNCA a medias.
+""",
+        },
+    ]
+    return messages
+
+
+# Clave de caché: nivel de riesgo, recomendaciones y campos del reclamo en forma canónica (orden de
+# claves indiferente, valores como texto igual que en el prompt). Las recomendaciones se listan en el
+# prompt en su orden, así que se incluyen en ese mismo orden: otro orden es otro prompt
+def explanation_key(resultado, entrada, model=MODEL):
+    canonical = json.dumps({
+        'riesgo': resultado['riesgo'],
+        'recomendaciones': list(resultado['recomendaciones']),
+        'entrada': {k: str(v) for k, v in entrada.items()},
+        'modelo': model,
+        'prompt': PROMPT_VERSION,
+    }, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+# Texto de la respuesta o el aviso de siempre si viene vacía
+def _response_text(response):
+    if response.choices and response.choices[0].message and (response.choices[0].message.content or '').strip():
+        return response.choices[0].message.content.strip()
+    return None
+
+
+def _error_text(error):
+    return f"❌ Error al generar explicación IA: {error}"
+
+
+EMPTY_TEXT = "⚠️ El modelo no devolvió contenido."
+
+
+# Espera antes del reintento `attempt`: la que indique Retry-After o backoff exponencial con jitter
+def backoff_delay(attempt, error=None, base=0.5, cap=8.0):
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    if retry_after:
+        try:
+            return min(cap, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class ExplanationCache:
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # La base de datos se abre (y se crea) con el primer uso, no al importar el backend
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS explicaciones_llm ("
+                "clave TEXT PRIMARY KEY, texto TEXT NOT NULL, modelo TEXT NOT NULL, creado REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection().execute("SELECT texto FROM explicaciones_llm WHERE clave = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            CACHE_LOOKUPS.inc(cache='llm', result='miss')
+            return None
+        self.hits += 1
+        CACHE_LOOKUPS.inc(cache='llm', result='hit')
+        return row[0]
+
+    def put(self, key, texto, model=MODEL):
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO explicaciones_llm (clave, texto, modelo, creado) VALUES (?, ?, ?, ?)",
+                (key, texto, model, time.time()),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._connection().execute("DELETE FROM explicaciones_llm")
+
+
+class ExplanationService:
+    def __init__(self, cache=None, model=MODEL, max_tokens=MAX_TOKENS, base_url=None,
+                 max_retries=3, timeout=60.0):
+        self.cache = cache
+        self.model = model
+        self.max_tokens = max_tokens
+        # Endpoint compatible con OpenAI (None: el de OpenAI u OPENAI_BASE_URL)
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    # Un cliente por clave API, reutilizado entre llamadas (los reintentos los gestiona este módulo)
+    def client(self, api_key):
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is None:
+                from openai import OpenAI
+                client = OpenAI(api_key=api_key, base_url=self.base_url, max_retries=0, timeout=self.timeout)
+                self._clients[api_key] = client
+            return client
+
+    def _request(self, resultado, entrada):
+        return {'model': self.model, 'messages': build_messages(resultado, entrada), 'max_tokens': self.max_tokens}
+
+    def _store(self, key, texto):
+        if self.cache is not None:
+            self.cache.put(key, texto, self.model)
+
+    def cached(self, resultado, entrada):
+        if self.cache is None:
+            return None
+        return self.cache.get(explanation_key(resultado, entrada, self.model))
+
+    # Explicación de un reclamo (desde la caché si ya se generó antes)
+    def explain(self, resultado, entrada, api_key):
+        key = explanation_key(resultado, entrada, self.model)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            return cached
+        request = self._request(resultado, entrada)
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                texto = _response_text(self.client(api_key).chat.completions.create(**request))
+                break
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    FAILURES.inc(stage='llm')
+                    return _error_text(e)
+                time.sleep(backoff_delay(attempt, e))
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage='llm')
+        if texto is None:
+            return EMPTY_TEXT
+        self._store(key, texto)
+        return texto
+
+    # Explicación por fragmentos según llegan del modelo; al terminar se guarda en la caché.
+    # Los errores antes del primer fragmento se devuelven como un único fragmento con el aviso. Si el
+    # stream se corta después, el aviso llega como último fragmento (separado del texto por una línea
+    # en blanco) y el texto incompleto no se guarda en la caché.
+    def explain_stream(self, resultado, entrada, api_key):
+        key = explanation_key(resultado, entrada, self.model)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            yield cached
+            return
+        request = self._request(resultado, entrada)
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                stream = self.client(api_key).chat.completions.create(**request, stream=True)
+                break
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    FAILURES.inc(stage='llm')
+                    yield _error_text(e)
+                    return
+                time.sleep(backoff_delay(attempt, e))
+        partes = []
+        empezado = False
+        try:
+            with stream:
+                for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices and chunk.choices[0].delta else None
+                    if not delta:
+                        continue
+                    partes.append(delta)
+                    if not empezado:
+                        # Los espacios iniciales se omiten para que el primer fragmento tenga texto
+                        delta = ''.join(partes).lstrip()
+                        if not delta:
+                            continue
+                        empezado = True
+                        STAGE_SECONDS.observe(time.perf_counter() - start, stage='llm_first_chunk')
+                    yield delta
+        except Exception as e:
+            FAILURES.inc(stage='llm')
+            yield f"\n\n{_error_text(e)}" if empezado else _error_text(e)
+            return
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage='llm')
+        texto = ''.join(partes).strip()
+        if not texto:
+            yield EMPTY_TEXT
+            return
+        self._store(key, texto)
+
+    async def _explain_async(self, client, semaphore, resultado, entrada):
+        request = self._request(resultado, entrada)
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.chat.completions.create(**request)
+                    STAGE_SECONDS.observe(time.perf_counter() - start, stage='llm')
+                return _response_text(response) or EMPTY_TEXT
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    FAILURES.inc(stage='llm')
+                    return _error_text(e)
+                await asyncio.sleep(backoff_delay(attempt, e))
+
+    async def explain_many_async(self, casos, api_key, concurrency=8):
+        # casos: lista de (resultado, entrada); los repetidos y los que están en caché no se piden
+        keys = [explanation_key(resultado, entrada, self.model) for resultado, entrada in casos]
+        textos = {}
+        pending = {}
+        for key, caso in zip(keys, casos):
+            if key in textos or key in pending:
+                continue
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                textos[key] = cached
+            else:
+                pending[key] = caso
+        if pending:
+            from openai import AsyncOpenAI
+            semaphore = asyncio.Semaphore(concurrency)
+            async with AsyncOpenAI(api_key=api_key, base_url=self.base_url, max_retries=0,
+                                   timeout=self.timeout) as client:
+                generated = await asyncio.gather(*(
+                    self._explain_async(client, semaphore, resultado, entrada)
+                    for resultado, entrada in pending.values()
+                ))
+            for key, texto in zip(pending, generated):
+                textos[key] = texto
+                if not texto.startswith(("❌", "⚠️")):
+                    self._store(key, texto)
+        return [textos[key] for key in keys]
+
+    # Explicaciones de muchos reclamos a la vez, con como mucho `concurrency` peticiones en curso.
+    # Crea su propio bucle de eventos: desde código asíncrono hay que usar explain_many_async
+    def explain_many(self, casos, api_key, concurrency=8):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.explain_many_async(casos, api_key, concurrency))
+        raise RuntimeError("explain_many no se puede llamar con un bucle de eventos en marcha; "
+                           "usa 'await explain_many_async(...)'")
@@ -0,0 +1,187 @@
+# Métricas del servicio en formato de texto de Prometheus (sin dependencias externas)
+# Histogramas de latencia por etapa del pipeline, contadores de filas puntuadas y fallos y
+# medidas de deriva de los datos (drift_monitor.py).
+# El registro es global al proceso y seguro entre hilos; scoring_server.py lo expone en /metrics.
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Límites superiores de los buckets de latencia, en segundos (de 50 µs a 30 s)
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Por combinación de etiquetas: [conteo por bucket (sin acumular), suma, total]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    # Número de observaciones y suma (segundos) de una serie
+    def totals(self, **labels):
+        series = self._series.get(tuple(str(labels[name]) for name in self.labelnames))
+        return (0, 0.0) if series is None else (series[2], series[1])
+
+    # Suma y número de observaciones de todas las series: {valores de etiquetas: (suma, total)}
+    def snapshot(self):
+        with self._lock:
+            return {key: (s[1], s[2]) for key, s in self._series.items()}
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in self._series.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"La métrica '{metric.name}' ya está registrada con otra definición")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def get(self, name):
+        return self._metrics[name]
+
+    # Exposición en formato de texto de Prometheus (versión 0.0.4)
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'fraude_stage_seconds', 'Duración de cada etapa del pipeline de puntuación', ['stage'])
+MEMBER_SECONDS = registry.histogram(
+    'fraude_member_predict_seconds', 'Duración de predict_proba de cada miembro del ensemble', ['member'])
+ROWS_SCORED = registry.counter(
+    'fraude_rows_scored_total', 'Reclamos puntuados, por motor (cache: sin pasar por los modelos; cascade: solo nivel de riesgo)', ['engine'])
+FAILURES = registry.counter(
+    'fraude_failures_total', 'Fallos por etapa del pipeline', ['stage'])
+CACHE_LOOKUPS = registry.counter(
+    'fraude_cache_lookups_total', 'Consultas a las cachés (puntuación, SHAP y LLM), por fila; duplicate: fila repetida en el mismo lote', ['cache', 'result'])
+
+DRIFT_PSI = registry.gauge(
+    'fraude_drift_psi', 'PSI de cada variable y del score frente a los datos del entrenamiento', ['feature'])
+DRIFT_KS = registry.gauge(
+    'fraude_drift_ks', 'Estadístico KS de cada variable y del score frente a los datos del entrenamiento', ['feature'])
+DRIFT_FLAGGED = registry.gauge(
+    'fraude_drift_flagged', 'Variables con deriva según el último informe (1: moderada, 2: alta)', ['feature'])
+
+
+# Mide la duración de una etapa (en fraude_stage_seconds o en el histograma indicado, con sus
+# etiquetas); si lanza una excepción se cuenta como fallo de la etapa y se propaga
+@contextmanager
+def timed(stage, histogram=None, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        FAILURES.inc(stage=stage)
+        raise
+    if histogram is None:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+    else:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+def render():
+    return registry.render()
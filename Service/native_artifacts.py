@@ -0,0 +1,320 @@
+# Artefactos del ensemble en formato nativo, sin pickles
+#   python native_artifacts.py            exporta Artifacts/model_<miembro>.{txt,ubj,*.npy} y native_manifest.json
+#
+# Cada miembro se guarda en el formato de su librería o como arrays de NumPy:
+#   LightGBM       texto del modelo (model_<miembro>.txt)
+#   XGBoost        UBJSON (model_<miembro>.ubj)
+#   lineales       coeficientes en .npy; la ordenada en el origen va en el manifiesto
+#   bosques        árboles aplanados (fast_predictor.py), un .npy por array
+# Los .npy se abren con mmap: los procesos que cargan el ensemble comparten las páginas del fichero.
+# El manifiesto guarda el hash del pickle del que sale cada miembro; si el pickle cambia, el miembro
+# se vuelve a cargar desde el pickle hasta que se exporte de nuevo. La exportación comprueba antes
+# de escribir nada que las probabilidades (y los valores SHAP) coinciden con los de los pickles.
+import copy
+import hashlib
+import json
+import os
+import warnings
+
+import numpy as np
+
+from fast_predictor import FastPredictor, _member_kind, compile_ensemble
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = 'native_manifest.json'
+# Diferencia máxima admitida frente a los modelos de los pickles
+TOLERANCE = 1e-6
+FOREST_ARRAYS = ('feature', 'threshold', 'nan_left', 'left', 'right', 'value', 'roots')
+
+
+def _sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+# Interfaz que usa EnsembleEngine: predict_proba y with_threads, una copia con su propio número de
+# hilos (el miembro cargado lo comparten todos los motores creados sobre él y no se modifica)
+class NativeMember:
+    kind = None
+
+    def __init__(self, feature_cols):
+        self.feature_cols = list(feature_cols)
+        self.n_jobs = None
+
+    def with_threads(self, n_jobs):
+        member = copy.copy(self)
+        member.n_jobs = n_jobs
+        return member
+
+    def _frame(self, data):
+        if hasattr(data, 'columns'):
+            return data[self.feature_cols]
+        import pandas as pd
+        return pd.DataFrame(np.atleast_2d(data), columns=self.feature_cols)
+
+    # Mismo tipo que los envoltorios de sklearn (XGBoost devuelve float32), para que el score ponderado coincida
+    def predict_proba(self, data):
+        positive = np.asarray(self._positive(self._frame(data)))
+        return np.column_stack([1 - positive, positive])
+
+
+class LightGBMMember(NativeMember):
+    kind = 'lgbm'
+
+    def __init__(self, path, feature_cols):
+        import lightgbm as lgb
+        super().__init__(feature_cols)
+        # Desde el texto ya leído: con model_file LightGBM lee el fichero dos veces
+        with open(path, encoding='utf-8') as f:
+            self.booster = lgb.Booster(model_str=f.read())
+
+    def _positive(self, frame):
+        return self.booster.predict(frame, num_threads=self.n_jobs or 0)
+
+
+class XGBoostMember(NativeMember):
+    kind = 'xgb'
+
+    def __init__(self, path, feature_cols):
+        import xgboost as xgb
+        super().__init__(feature_cols)
+        self.booster = xgb.Booster(model_file=path)
+
+    # XGBoost guarda los hilos en el booster: la copia lleva su propio booster
+    def with_threads(self, n_jobs):
+        member = super().with_threads(n_jobs)
+        if n_jobs:
+            member.booster = self.booster.copy()
+            member.booster.set_param('nthread', n_jobs)
+        return member
+
+    def _positive(self, frame):
+        return self.booster.inplace_predict(frame, predict_type='value', missing=np.nan)
+
+
+class LinearMember(NativeMember):
+    kind = 'linear'
+
+    def __init__(self, coef, intercept, feature_cols):
+        super().__init__(feature_cols)
+        self.coef = coef
+        self.intercept = intercept
+
+    def _positive(self, frame):
+        return _sigmoid(frame.to_numpy(dtype=np.float64) @ self.coef + self.intercept)
+
+
+class ForestMember(NativeMember):
+    kind = 'forest'
+
+    def __init__(self, predictor):
+        super().__init__(predictor.feature_cols)
+        self.predictor = predictor
+
+    def _positive(self, frame):
+        return self.predictor.predict(frame)[1]
+
+
+# Escritura atómica de un fichero: se escribe junto al destino, con la misma extensión
+# (XGBoost elige el formato por ella), y se renombra
+def _write(path, write):
+    tmp_path = os.path.join(os.path.dirname(path), f".tmp-{os.path.basename(path)}")
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _save_npy(path, array):
+    def write(tmp_path):
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(array))
+    _write(path, write)
+
+
+# Exporta un miembro y devuelve su entrada del manifiesto
+def _export_member(name, model, feature_cols, artifacts_dir):
+    kind = _member_kind(model)
+    spec = {'kind': kind}
+    if kind == 'lgbm':
+        spec['files'] = [f'model_{name}.txt']
+        # Sin num_iteration LightGBM guarda hasta la mejor iteración, la misma que usa predict_proba
+        _write(os.path.join(artifacts_dir, spec['files'][0]), lambda path: model.booster_.save_model(path))
+    elif kind == 'xgb':
+        spec['files'] = [f'model_{name}.ubj']
+        booster = model.get_booster()
+        best_iteration = getattr(model, 'best_iteration', None)
+        if best_iteration is not None:
+            booster = booster[:best_iteration + 1]
+        _write(os.path.join(artifacts_dir, spec['files'][0]), booster.save_model)
+    elif kind == 'linear':
+        if model.coef_.shape[0] != 1:
+            raise ValueError(f"Se esperaba un modelo lineal binario en '{name}'")
+        spec['files'] = [f'model_{name}.coef.npy']
+        spec['intercept'] = float(model.intercept_[0])
+        _save_npy(os.path.join(artifacts_dir, spec['files'][0]), model.coef_[0].astype(np.float64))
+    else:
+        predictor = compile_ensemble({name: model}, {'weights': {name: 1.0}, 'threshold': 0.5}, feature_cols)
+        spec['files'] = [f'model_{name}.{array}.npy' for array in FOREST_ARRAYS]
+        spec['meta'] = predictor.meta
+        for array, filename in zip(FOREST_ARRAYS, spec['files']):
+            _save_npy(os.path.join(artifacts_dir, filename), predictor.arrays[array])
+    return spec
+
+
+def _load_member(spec, feature_cols, artifacts_dir):
+    paths = [os.path.join(artifacts_dir, filename) for filename in spec['files']]
+    if spec['kind'] == 'lgbm':
+        return LightGBMMember(paths[0], feature_cols)
+    if spec['kind'] == 'xgb':
+        return XGBoostMember(paths[0], feature_cols)
+    if spec['kind'] == 'linear':
+        return LinearMember(np.load(paths[0], mmap_mode='r'), spec['intercept'], feature_cols)
+    if spec['kind'] == 'forest':
+        arrays = {array: np.load(path, mmap_mode='r') for array, path in zip(FOREST_ARRAYS, paths)}
+        return ForestMember(FastPredictor(arrays, spec['meta']))
+    raise ValueError(f"Tipo de miembro nativo desconocido: {spec['kind']}")
+
+
+def load_manifest(artifacts_dir):
+    path = os.path.join(artifacts_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT_VERSION:
+        warnings.warn(f"Formato de artefactos nativos no soportado en {path}: {manifest.get('format')}")
+        return None
+    return manifest
+
+
+# El artefacto nativo vale si su pickle de origen no existe (despliegue sin pickles) o no ha cambiado
+def _is_current(artifacts_dir, source_name, source_hash):
+    path = os.path.join(artifacts_dir, source_name)
+    return not os.path.exists(path) or _sha256(path) == source_hash
+
+
+# Miembros disponibles en formato nativo y al día: {nombre: miembro}. Los demás se cargan del pickle.
+def load_native_models(artifacts_dir, names, manifest=None):
+    manifest = manifest or load_manifest(artifacts_dir)
+    if manifest is None:
+        return {}
+    models = {}
+    for name in names:
+        spec = manifest['members'].get(name)
+        if spec is None:
+            continue
+        if not _is_current(artifacts_dir, f'model_{name}.pkl', spec['source']):
+            warnings.warn(f"El modelo nativo de '{name}' no corresponde a model_{name}.pkl; se usa el pickle")
+            continue
+        models[name] = _load_member(spec, manifest['feature_cols'], artifacts_dir)
+    return models
+
+
+# TreeExplainer sobre el booster nativo del miembro explicado, o None si no se exportó o está obsoleto
+def load_native_explainer(artifacts_dir, manifest=None):
+    manifest = manifest or load_manifest(artifacts_dir)
+    spec = manifest and manifest.get('explainer')
+    if not spec:
+        return None
+    if not _is_current(artifacts_dir, 'explainer.pkl', spec['source']):
+        warnings.warn("El explainer nativo no corresponde a explainer.pkl; se usa el pickle")
+        return None
+    import shap
+    member = _load_member(manifest['members'][spec['member']], manifest['feature_cols'], artifacts_dir)
+    return shap.TreeExplainer(member.booster, feature_perturbation=spec['feature_perturbation'])
+
+
+# Máxima diferencia de probabilidad entre cada miembro nativo y su modelo original
+def check_parity(native, models, X):
+    import pandas as pd
+
+    frame = pd.DataFrame(X, columns=next(iter(native.values())).feature_cols)
+    return {name: float(np.max(np.abs(native[name].predict_proba(frame)[:, 1] - models[name].predict_proba(frame)[:, 1])))
+            for name in native}
+
+
+# Miembro al que corresponde el explainer de SHAP: el de la misma librería con el mismo modelo
+def _explained_member(explainer, models):
+    original = getattr(explainer.model, 'original_model', None)
+    module = type(original).__module__
+    for name, model in models.items():
+        if module.startswith('lightgbm') and _member_kind(model) == 'lgbm':
+            if model.booster_.model_to_string() == original.model_to_string():
+                return name
+        elif module.startswith('xgboost') and _member_kind(model) == 'xgb':
+            if model.get_booster().save_raw('json') == original.save_raw('json'):
+                return name
+    return None
+
+
+def main(argv=None):
+    import argparse
+
+    import pandas as pd
+
+    import api_backend
+    from fast_predictor import probe_matrix
+    from shap_explanations import _positive_class
+
+    parser = argparse.ArgumentParser(description='Exporta los modelos del ensemble a formatos nativos')
+    parser.add_argument('--artifacts', default=api_backend.ARTIFACTS_DIR)
+    parser.add_argument('--probe-rows', type=int, default=20000)
+    parser.add_argument('--shap-rows', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        config = api_backend.load_ensemble_config()
+        models = api_backend.load_models(config, native=False)
+        feature_cols = list(api_backend.load_feature_cols())
+    data = pd.read_csv(os.path.join(api_backend.BASE_DIR, '../Data/data_processed.csv'))[feature_cols]
+
+    manifest = {'format': FORMAT_VERSION, 'feature_cols': feature_cols, 'members': {}, 'explainer': None}
+    for name, model in models.items():
+        spec = _export_member(name, model, feature_cols, args.artifacts)
+        spec['source'] = _sha256(os.path.join(args.artifacts, f'model_{name}.pkl'))
+        manifest['members'][name] = spec
+
+    # Paridad sobre los datos del entrenamiento y sobre una matriz que cruza todos los umbrales
+    native = {name: _load_member(spec, feature_cols, args.artifacts) for name, spec in manifest['members'].items()}
+    probe = probe_matrix(compile_ensemble(models, config, feature_cols), args.probe_rows, nan_rate=0.0)
+    X = np.vstack([data.to_numpy(dtype=np.float32), probe])
+    diffs = check_parity(native, models, X)
+    print(f"Diferencia máxima de probabilidad frente a los pickles: {diffs}")
+    failed = [name for name, diff in diffs.items() if diff > TOLERANCE]
+    for name in failed:
+        warnings.warn(f"'{name}' no reproduce el pickle (tolerancia {TOLERANCE}); se seguirá cargando desde el pickle")
+        del manifest['members'][name]
+    manifest['parity'] = {name: diff for name, diff in diffs.items() if name not in failed}
+
+    explainer_path = os.path.join(args.artifacts, 'explainer.pkl')
+    if os.path.exists(explainer_path):
+        explainer = api_backend.load_shap_explainer(native=False)
+        member = _explained_member(explainer, models)
+        if member in manifest['members'] and manifest['members'][member]['kind'] in ('lgbm', 'xgb'):
+            import shap
+            rebuilt = shap.TreeExplainer(native[member].booster, feature_perturbation=explainer.feature_perturbation)
+            sample = data.iloc[:args.shap_rows]
+            diff = float(np.max(np.abs(_positive_class(rebuilt.shap_values(sample))
+                                       - _positive_class(explainer.shap_values(sample)))))
+            print(f"Diferencia máxima de los valores SHAP ({member}): {diff:.3e}")
+            if diff <= TOLERANCE:
+                manifest['explainer'] = {'member': member, 'feature_perturbation': explainer.feature_perturbation,
+                                         'source': _sha256(explainer_path)}
+                manifest['parity']['shap'] = diff
+        if manifest['explainer'] is None:
+            print("El explainer de SHAP se seguirá cargando desde explainer.pkl")
+
+    # El manifiesto se escribe el último: hasta entonces los ficheros nuevos no se usan
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+    _write(os.path.join(args.artifacts, MANIFEST_NAME), write)
+    print(f"Artefactos nativos guardados en {args.artifacts}: {sorted(manifest['members'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# Paridad entre el preprocesado del servicio y la matriz de entrenamiento del notebook
+#   python parity_check.py                       (informe por variable)
+#   python parity_check.py --fail-above 0.01     (código 1 si alguna variable difiere en más del 1 %)
+#
+# Convierte Data/data_raw.csv a los campos del formulario (raw_claims.raw_to_form), lo pasa por el
+# plan de preprocesado del servicio y compara cada variable con Data/data_processed.csv, que generó
+# Notebooks/Preprocesado.ipynb. Todo el dataset se procesa en una sola pasada vectorizada.
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from api_backend import preprocess_data, registry
+from raw_claims import raw_to_form
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, '../Data')
+TARGET = 'FraudFound_P'
+RTOL = 1e-9
+ATOL = 1e-6
+
+
+# Filas del dataset original, su versión en formato formulario y la fila del notebook que les corresponde.
+# El notebook descartó las mismas filas que raw_to_form (sin fecha de reclamación), así que las filas
+# conservadas se alinean por posición; la variable objetivo sirve para comprobarlo.
+def load_aligned(raw_path, processed_path):
+    raw = pd.read_csv(raw_path, encoding='utf-8-sig', dtype=str)
+    processed = pd.read_csv(processed_path)
+    form = raw_to_form(raw)
+    kept = raw.loc[form.index]
+    if len(kept) != len(processed):
+        raise ValueError(f"{processed_path} tiene {len(processed)} filas y el dataset convertido {len(kept)}")
+    if TARGET in processed.columns and not np.array_equal(pd.to_numeric(kept[TARGET]).to_numpy(),
+                                                          processed[TARGET].to_numpy()):
+        raise ValueError(f"Las filas de {processed_path} no están alineadas con las del dataset original")
+    processed.index = form.index
+    return kept, form, processed
+
+
+# Comparación de una variable: filas distintas, mayor diferencia y los casos más frecuentes y peores
+def compare_feature(name, service, expected, raw_values, top):
+    a = service.to_numpy(dtype=float)
+    b = expected.to_numpy(dtype=float)
+    mismatch = ~np.isclose(a, b, rtol=RTOL, atol=ATOL, equal_nan=True)
+    report = {'feature': name, 'rows': int(len(a)), 'mismatches': int(mismatch.sum()),
+              'rate': float(mismatch.mean()) if len(a) else 0.0, 'max_abs_diff': 0.0,
+              'patterns': [], 'worst_rows': []}
+    if not mismatch.any():
+        return report
+    idx = np.flatnonzero(mismatch)
+    diff = np.abs(a[idx] - b[idx])
+    diff = np.where(np.isnan(diff), np.inf, diff)
+    report['max_abs_diff'] = float(diff.max())
+    raw = raw_values.to_numpy()[idx] if raw_values is not None else np.full(len(idx), None)
+    # Patrones (valor original, servicio, notebook) ordenados por número de filas afectadas
+    patterns = pd.DataFrame({'raw': raw, 'service': a[idx], 'notebook': b[idx]})
+    counts = patterns.value_counts(dropna=False).head(top)
+    report['patterns'] = [{'raw': r, 'service': s, 'notebook': n, 'rows': int(c)}
+                          for (r, s, n), c in counts.items()]
+    for j in np.argsort(-diff, kind='stable')[:top]:
+        report['worst_rows'].append({'row': int(service.index[idx[j]]), 'raw': raw[j],
+                                     'service': float(a[idx[j]]), 'notebook': float(b[idx[j]])})
+    return report
+
+
+def run_parity(raw_path=None, processed_path=None, top=5):
+    raw_path = raw_path or os.path.join(DATA_DIR, 'data_raw.csv')
+    processed_path = processed_path or os.path.join(DATA_DIR, 'data_processed.csv')
+    inicio = time.perf_counter()
+    kept, form, processed = load_aligned(raw_path, processed_path)
+    features = preprocess_data(form, registry.get('schema'), registry.get('feature_cols'), plan=registry.get('plan'))
+    missing = [col for col in features.columns if col not in processed.columns]
+    if missing:
+        raise ValueError(f"Variables del servicio que no están en {processed_path}: {missing}")
+    reports = [
+        compare_feature(col, features[col], processed[col], kept[col] if col in kept.columns else None, top)
+        for col in features.columns
+    ]
+    return {
+        'raw_rows': int(len(pd.read_csv(raw_path, usecols=[0]))),
+        'compared_rows': int(len(features)),
+        'seconds': time.perf_counter() - inicio,
+        'features': reports,
+    }
+
+
+def _fmt(value):
+    return 'NaN' if isinstance(value, float) and np.isnan(value) else f"{value:g}" if isinstance(value, float) else repr(value)
+
+
+def print_report(result, top):
+    print(f"Filas comparadas: {result['compared_rows']} de {result['raw_rows']} "
+          f"({result['seconds']:.2f} s)")
+    print(f"{'variable':<24} {'distintas':>10} {'tasa':>8} {'máx. dif.':>10}")
+    for r in result['features']:
+        print(f"{r['feature']:<24} {r['mismatches']:>10} {r['rate']:>8.2%} {_fmt(r['max_abs_diff']):>10}")
+    for r in result['features']:
+        if not r['mismatches']:
+            continue
+        print(f"\n{r['feature']}: {r['mismatches']} filas distintas")
+        for p in r['patterns'][:top]:
+            print(f"  original={_fmt(p['raw']):<18} servicio={_fmt(p['service']):<10} "
+                  f"notebook={_fmt(p['notebook']):<10} filas={p['rows']}")
+        peores = ', '.join(f"{w['row']} ({_fmt(w['service'])} vs {_fmt(w['notebook'])})" for w in r['worst_rows'][:top])
+        print(f"  peores filas: {peores}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Paridad del preprocesado del servicio con data_processed.csv')
+    parser.add_argument('--raw', help='Dataset original (por defecto Data/data_raw.csv)')
+    parser.add_argument('--processed', help='Matriz del notebook (por defecto Data/data_processed.csv)')
+    parser.add_argument('--top', type=int, default=5, help='Patrones y filas a mostrar por variable')
+    parser.add_argument('--json', help='Guardar el informe completo en este fichero JSON')
+    parser.add_argument('--fail-above', type=float, default=None,
+                        help='Terminar con código 1 si alguna variable difiere en más de esta fracción de filas')
+    parser.add_argument('--ignore', nargs='*', default=[], help='Variables con diferencias conocidas que no cuentan para --fail-above')
+    args = parser.parse_args(argv)
+
+    result = run_parity(args.raw, args.processed, args.top)
+    print_report(result, args.top)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+    if args.fail_above is not None:
+        failed = [r['feature'] for r in result['features']
+                  if r['rate'] > args.fail_above and r['feature'] not in args.ignore]
+        if failed:
+            print(f"\nVariables por encima del {args.fail_above:.2%} de filas distintas: {failed}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
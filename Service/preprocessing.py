@@ -0,0 +1,293 @@
+# Motor vectorizado de preprocesamiento
+# Tablas de rangos precompiladas, redondeo al valor más próximo con np.searchsorted
+# y un único parseo por columna de fecha reutilizado por todas las variables derivadas.
+import calendar
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+# Datos de entrada no válidos (columnas que faltan, fechas que no se pueden usar). Es un ValueError,
+# como antes; el servidor lo distingue de los fallos internos (422 frente a 500)
+class InputError(ValueError):
+    pass
+
+
+# Mensajes de InputError: los mismos para todas las variables y todos los lotes
+def missing_columns_error(columns):
+    return InputError(f"Faltan columnas requeridas: {list(columns)}")
+
+
+def invalid_dates_error(column, count):
+    return InputError(f"Fechas vacías o no válidas en '{column}': {count} fila(s)")
+
+
+class BucketTable:
+    def __init__(self, values):
+        # Valores en el orden del mapeo original: en caso de empate gana el primero
+        self.values = np.array(values)
+        self.order = np.argsort(self.values, kind='stable')
+        self.sorted = self.values[self.order].astype(float)
+
+    # Equivalente vectorizado a values[np.abs(values - x).argmin()] para cada x
+    def snap(self, x):
+        x = np.asarray(x, dtype=float)
+        n = len(self.sorted)
+        pos = np.searchsorted(self.sorted, x)
+        lo = np.clip(pos - 1, 0, n - 1)
+        hi = np.clip(pos, 0, n - 1)
+        d_lo = np.abs(self.sorted[lo] - x)
+        d_hi = np.abs(self.sorted[hi] - x)
+        take_hi = (d_hi < d_lo) | ((d_hi == d_lo) & (self.order[hi] < self.order[lo]))
+        idx = np.where(take_hi, self.order[hi], self.order[lo])
+        # argmin sobre NaN (o distancias infinitas) devuelve la primera posición
+        idx[~np.isfinite(x)] = 0
+        return self.values[idx]
+
+
+# Tablas de rangos a partir de col_map ([{columna: {rango: valor medio}}, ...])
+def build_bucket_tables(col_map):
+    tables = {}
+    for col_dict in col_map:
+        for feature, mapping in col_dict.items():
+            tables[feature] = BucketTable(list(mapping.values()))
+    return tables
+
+
+# Parseo de fechas con caché: cada columna fuente se convierte una sola vez
+class DateCache:
+    def __init__(self, data, formats):
+        self.data = data
+        self.formats = formats
+        self._parsed = {}
+
+    def get(self, col):
+        if col not in self._parsed:
+            if col not in self.data.columns:
+                raise missing_columns_error([col])
+            self._parsed[col] = parse_dates(self.data[col].to_numpy(), self.formats.get(col, '%d/%m/%Y'))
+        return self._parsed[col]
+
+
+# Las fechas de un lote se repiten mucho: se parsean solo los valores distintos.
+# Devuelve un array datetime64[ns] (NaT si la fecha no es válida).
+def parse_dates(values, fmt):
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]')
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format=fmt, errors='coerce').to_numpy()
+    dates = parsed[codes]
+    dates[codes < 0] = np.datetime64('NaT')
+    return dates
+
+
+MONTH_NAMES = list(calendar.month_abbr)[1:]
+DAY_NAMES = list(calendar.day_name)
+
+
+def _as_int_if_complete(out, integer):
+    if integer and not np.isnan(out).any():
+        return out.astype(np.int64)
+    return out
+
+
+# Traducción de un componente de fecha (mes 0-11, día de la semana 0-6) mediante tabla de búsqueda;
+# equivale a .dt.strftime('%b').map(options) / .dt.day_name().map(options)
+class ComponentLookup:
+    def __init__(self, names, options):
+        self.table = np.array([options.get(name, np.nan) for name in names], dtype=float)
+        self.integer = all(isinstance(options.get(name), int) for name in names)
+
+    def map(self, codes, valid):
+        out = np.full(len(codes), np.nan)
+        out[valid] = self.table[codes[valid]]
+        return _as_int_if_complete(out, self.integer)
+
+
+# Componentes de fecha calculados directamente sobre datetime64
+def _days(dates):
+    return dates.astype('datetime64[D]').astype(np.int64)
+
+
+def month_feature(dates, lookup):
+    months = dates.astype('datetime64[M]').astype(np.int64) % 12
+    return lookup.map(months, ~np.isnat(dates))
+
+
+def dayofweek_feature(dates, lookup):
+    # 1970-01-01 fue jueves (3 con lunes = 0)
+    weekdays = (_days(dates) + 3) % 7
+    return lookup.map(weekdays, ~np.isnat(dates))
+
+
+# La semana del mes se guarda como entero: una fecha vacía o no válida no se puede representar
+def weekofmonth_feature(dates, column='fecha'):
+    invalid = int(np.isnat(dates).sum())
+    if invalid:
+        raise invalid_dates_error(column, invalid)
+    day = _days(dates) - dates.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64) + 1
+    return (day - 1) // 7 + 1
+
+
+def days_between_feature(start, end):
+    missing = np.isnat(start) | np.isnat(end)
+    with np.errstate(invalid='ignore'):
+        days = (end - start) // np.timedelta64(1, 'D')
+    if missing.any():
+        days = days.astype(float)
+        days[missing] = np.nan
+    return days
+
+
+# Tabla de búsqueda de una categórica: equivale a Series.map(options)
+class CategoricalLookup:
+    def __init__(self, options):
+        values = list(options.values())
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            raise ValueError(f"Las opciones deben ser numéricas: {options}")
+        self.keys = pd.Index(list(options.keys()), dtype=object)
+        self.values = np.array(values, dtype=float)
+        self.integer = all(isinstance(v, int) for v in values)
+
+    def map(self, values):
+        codes = self.keys.get_indexer(values.astype(object))
+        out = self.values[codes]
+        out[codes < 0] = np.nan
+        return _as_int_if_complete(out, self.integer)
+
+
+# Operación de columna del plan: produce la variable `target` a partir de las columnas `sources`
+class ColumnOp:
+    def __init__(self, target, kind, sources, lookup=None, buckets=None, scale=None):
+        self.target = target
+        self.kind = kind
+        self.sources = sources
+        self.lookup = lookup
+        self.buckets = buckets
+        self.scale = scale
+
+    def __repr__(self):
+        return f"ColumnOp({self.target!r}, {self.kind!r}, {self.sources!r})"
+
+
+# Plan de transformación compilado desde io_schema.json y feature_cols.pkl
+class TransformPlan:
+    def __init__(self, ops, date_formats, feature_cols, rename_map):
+        self.ops = ops
+        self.date_formats = date_formats
+        self.feature_cols = list(feature_cols)
+        self.rename_map = rename_map
+
+    # Columna de entrada por su nombre en el formulario (o por el original si ya viene renombrada)
+    def _column(self, data, name):
+        if name in data.columns:
+            return data[name].to_numpy()
+        original = self.rename_map.get(name)
+        if original is not None and original in data.columns:
+            return data[original].to_numpy()
+        raise missing_columns_error([name])
+
+    # Columnas de entrada que faltan (por su nombre en el formulario), todas a la vez y en el orden del plan
+    def missing_columns(self, data):
+        missing = []
+        for op in self.ops:
+            for name in op.sources:
+                original = self.rename_map.get(name) if op.kind in ('categorical', 'numeric') else None
+                if name not in data.columns and original not in data.columns and name not in missing:
+                    missing.append(name)
+        return missing
+
+    def execute(self, data):
+        missing = self.missing_columns(data)
+        if missing:
+            raise missing_columns_error(missing)
+        dates = DateCache(data, self.date_formats)
+        out = {}
+        debug = logger.isEnabledFor(logging.DEBUG)
+        for op in self.ops:
+            if debug:
+                logger.debug("Procesando la columna: %s, tipo: %s", op.target, op.kind)
+            if op.kind == 'categorical':
+                out[op.target] = op.lookup.map(self._column(data, op.sources[0]))
+            elif op.kind == 'numeric':
+                values = pd.to_numeric(self._column(data, op.sources[0]), errors='coerce')
+                if op.scale is not None:
+                    values = values * op.scale
+                if op.buckets is not None:
+                    values = op.buckets.snap(values)
+                out[op.target] = values
+            else:
+                parsed = [dates.get(source) for source in op.sources]
+                if op.kind == 'month':
+                    out[op.target] = month_feature(parsed[0], op.lookup)
+                elif op.kind == 'dayofweek':
+                    out[op.target] = dayofweek_feature(parsed[0], op.lookup)
+                elif op.kind == 'weekofmonth':
+                    out[op.target] = weekofmonth_feature(parsed[0], op.sources[0])
+                elif op.kind == 'days_between':
+                    out[op.target] = days_between_feature(parsed[0], parsed[1])
+        return pd.DataFrame({col: out[col] for col in self.feature_cols}, index=data.index, columns=self.feature_cols)
+
+
+# Compilación y validación del esquema: los errores aparecen al cargar, no en cada petición
+def compile_plan(schema, feature_cols, col_map=(), scales=None):
+    buckets = build_bucket_tables(col_map)
+    scales = scales or {}
+    date_formats = {}
+    rename_map = {}
+    for feature, info in schema.items():
+        if 'type' not in info:
+            raise ValueError(f"La variable '{feature}' del esquema no tiene tipo")
+        if info['type'] == 'date':
+            date_formats[feature] = info.get('format', '%d/%m/%Y')
+        if 'original' in info:
+            rename_map[feature] = info['original']
+
+    ops = []
+    for feature, info in schema.items():
+        if 'original' not in info:
+            continue
+        target = info['original']
+        kind = str(info['type']).lower()
+        if kind == 'categorical':
+            if not info.get('options'):
+                raise ValueError(f"La categórica '{feature}' no tiene opciones")
+            ops.append(ColumnOp(target, 'categorical', [feature], lookup=CategoricalLookup(info['options'])))
+        elif kind == 'numeric':
+            ops.append(ColumnOp(target, 'numeric', [feature], buckets=buckets.get(target), scale=scales.get(target)))
+        elif info.get('derived', False) or kind in ['derived', 'derived_numeric']:
+            sources = info.get('from', [])
+            for source in sources:
+                if source not in date_formats:
+                    raise ValueError(f"La derivada '{feature}' usa '{source}', que no es una fecha del esquema")
+            lookup = None
+            if len(sources) == 1:
+                if 'options' in info:
+                    if 'month' in target.lower():
+                        derived = 'month'
+                        lookup = ComponentLookup(MONTH_NAMES, info['options'])
+                    elif 'dayofweek' in target.lower():
+                        derived = 'dayofweek'
+                        lookup = ComponentLookup(DAY_NAMES, info['options'])
+                    else:
+                        raise ValueError(f"No se reconoce la derivada '{feature}' ({target})")
+                else:
+                    derived = 'weekofmonth'
+            elif len(sources) == 2:
+                derived = 'days_between'
+            else:
+                raise ValueError(f"La derivada '{feature}' debe tener una o dos columnas fuente")
+            ops.append(ColumnOp(target, derived, list(sources), lookup=lookup))
+        elif kind != 'date':
+            raise ValueError(f"Tipo '{info['type']}' no soportado en la variable '{feature}'")
+
+    produced = {op.target for op in ops}
+    missing = [col for col in feature_cols if col not in produced]
+    if missing:
+        raise ValueError(f"El esquema no genera las columnas requeridas: {missing}")
+    # Solo se ejecutan las operaciones cuyo resultado usa el modelo
+    ops = [op for op in ops if op.target in set(feature_cols)]
+    return TransformPlan(ops, date_formats, feature_cols, rename_map)
@@ -0,0 +1,113 @@
+# Adaptador de reclamos en el formato original del dataset (Data/data_raw.csv)
+# a los campos en castellano del formulario (io_schema.json).
+import numpy as np
+import pandas as pd
+
+from api_backend import COL_MAP, EUR_TO_USD
+from linkage_index import CLAIM_FIELD, POLICY_FIELD, REP_FIELD, source_claim_id
+
+# Columnas mínimas que identifican el formato original
+RAW_COLUMNS = [
+    'Month', 'WeekOfMonth', 'DayOfWeek', 'Make', 'AccidentArea', 'DayOfWeekClaimed',
+    'MonthClaimed', 'WeekOfMonthClaimed', 'Sex', 'MaritalStatus', 'Fault', 'VehicleCategory',
+    'VehiclePrice', 'Deductible', 'Days_Policy_Accident', 'Days_Policy_Claim',
+    'PastNumberOfClaims', 'AgeOfVehicle', 'AgeOfPolicyHolder', 'PoliceReportFiled',
+    'WitnessPresent', 'AgentType', 'NumberOfSuppliments', 'AddressChange_Claim',
+    'NumberOfCars', 'Year', 'BasePolicy'
+]
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Valores del dataset original → opciones del formulario
+CATEGORICAL_MAP = {
+    'MARCA DEL VEHICULO': ('Make', {
+        'Accura': 'ACURA', 'BMW': 'BMW', 'Chevrolet': 'CHEVROLET', 'Dodge': 'DODGE',
+        'Ferrari': 'FERRARI', 'Ford': 'FORD', 'Honda': 'HONDA', 'Jaguar': 'JAGUAR',
+        'Lexus': 'LEXUS', 'Mazda': 'MAZDA', 'Mecedes': 'MERCEDES', 'Mercury': 'MERCURY',
+        'Nisson': 'NISSAN', 'Pontiac': 'PONTIAC', 'Porche': 'PORSCHE', 'Saab': 'SAAB',
+        'Saturn': 'SATURN', 'Toyota': 'TOYOTA', 'VW': 'VOLKSWAGEN'}),
+    'ZONA DONDE OCURRIO EL ACCIDENTE': ('AccidentArea', {'Urban': 'ZONA URBANA', 'Rural': 'ZONA RURAL'}),
+    'GENERO DEL ASEGURADO': ('Sex', {'Female': 'MUJER', 'Male': 'HOMBRE'}),
+    'ESTADO CIVIL DEL ASEGURADO': ('MaritalStatus', {
+        'Divorced': 'DIVORCIADO', 'Married': 'CASADO', 'Single': 'SOLTERO', 'Widow': 'VIUDO'}),
+    'CULPABLE DEL ACCIDENTE': ('Fault', {'Policy Holder': 'EL PROPIO ASEGURADO', 'Third Party': 'OTRA PERSONA'}),
+    'TIPO DE VEHICULO': ('VehicleCategory', {'Sedan': 'SEDAN', 'Sport': 'DEPORTIVO', 'Utility': 'UTILITARIO'}),
+    'FRANQUICIA DE LA POLIZA': ('Deductible', {300: '300 EUROS', 400: '400 EUROS', 500: '500 EUROS', 700: '700 EUROS'}),
+    'ANTIGUEDAD DEL VEHICULO': ('AgeOfVehicle', {
+        'new': 'MENOS DE 2', '2 years': '2', '3 years': '3', '4 years': '4 ', '5 years': '5',
+        '6 years': '6', '7 years': '7', 'more than 7': 'MAS DE 7'}),
+    'INFORME POLICIAL DEL ACCIDENTE': ('PoliceReportFiled', {'Yes': 'EXISTE', 'No': 'NO EXISTE'}),
+    'TESTIGOS DEL ACCIDENTE': ('WitnessPresent', {'Yes': 'EXISTEN', 'No': 'NO EXISTEN'}),
+    'TIPO DE AGENTE QUE GESTIONO LA POLIZA': ('AgentType', {'External': 'EXTERNO', 'Internal': 'INTERNO'}),
+    'CUANTO TIEMPO DESPUES SE MUDO EL ASEGURADOR TRAS EL ACCIDENTE': ('AddressChange_Claim', {
+        'no change': 'NO SE HA MUDADO', 'under 6 months': 'MENOS DE 6 MESES', '1 year': 'ENTRE 6 MESES Y 1',
+        '2 to 3 years': 'ENTRE 2 Y 3', '4 to 8 years': 'ENTRE 4 Y 8'}),
+    'TIPO DE POLIZA': ('BasePolicy', {'All Perils': 'A TODO RIESGO', 'Collision': 'COLISION', 'Liability': 'RESPONSABILIDAD CIVIL'}),
+}
+
+# Variables en rangos que el formulario recibe como número (valor medio del rango)
+NUMERIC_MAP = {
+    'EDAD DEL ASEGURADO': 'AgeOfPolicyHolder',
+    'PRECIO DEL VEHICULO': 'VehiclePrice',
+    'NUMERO DE RECLAMACIONES PASADAS': 'PastNumberOfClaims',
+    'NUMERO DE DOCUMENTOS RELACIONADOS CON EL ACCIDENTE': 'NumberOfSuppliments',
+    'NUMERO DE COCHES INVOLUCRADOS EN EL ACCIDENTE': 'NumberOfCars',
+}
+RANGE_MIDPOINTS = {col: mapping for col_dict in COL_MAP for col, mapping in col_dict.items()}
+
+
+def is_raw_layout(data):
+    return all(col in data.columns for col in RAW_COLUMNS)
+
+
+# Fecha del año/mes dados cuyo día de la semana y semana del mes ((día - 1) // 7 + 1) coinciden
+# con los del dataset; si la quinta semana no contiene ese día se usa el de la semana anterior
+def _synthesize_dates(year, month, week, dayofweek):
+    month_num = month.map({m: i + 1 for i, m in enumerate(MONTHS)})
+    weekday = dayofweek.map({d: i for i, d in enumerate(DAYS)})
+    first = pd.to_datetime(pd.DataFrame({'year': year, 'month': month_num, 'day': 1}), errors='coerce')
+    block_start = first + pd.to_timedelta((pd.to_numeric(week) - 1) * 7, unit='D')
+    offset = (weekday - block_start.dt.weekday) % 7
+    dates = block_start + pd.to_timedelta(offset, unit='D')
+    overflow = dates.dt.month != month_num
+    dates = dates.where(~overflow, dates - pd.Timedelta(days=7))
+    return dates
+
+
+# Conversión de un DataFrame en formato original a los campos del formulario.
+# Las filas sin fecha de reclamación válida ('0' en el dataset) se descartan;
+# el índice original se conserva para poder cruzar los resultados. source: fichero del que vienen las
+# filas; con él, cada reclamo lleva como número su fichero y su fila (como las del histórico de vínculos)
+def raw_to_form(data, source=None):
+    valid = data['MonthClaimed'].isin(MONTHS) & data['DayOfWeekClaimed'].isin(DAYS)
+    data = data[valid]
+    form = pd.DataFrame(index=data.index)
+
+    # Si el mes de la reclamación es anterior al del accidente, se reclamó al año siguiente
+    year = pd.to_numeric(data['Year'])
+    accident = _synthesize_dates(year, data['Month'], data['WeekOfMonth'], data['DayOfWeek'])
+    month_idx = data['Month'].map(MONTHS.index)
+    claimed_idx = data['MonthClaimed'].map(MONTHS.index)
+    claim_year = year + (claimed_idx < month_idx).astype(int)
+    claim = _synthesize_dates(claim_year, data['MonthClaimed'], data['WeekOfMonthClaimed'], data['DayOfWeekClaimed'])
+    days_policy = data['Days_Policy_Accident'].map(RANGE_MIDPOINTS['Days_Policy_Accident'])
+    issued = accident - pd.to_timedelta(np.floor(days_policy), unit='D')
+
+    form['FECHA DEL ACCIDENTE'] = accident.dt.strftime('%d/%m/%Y')
+    form['FECHA DE LA RECLAMACION'] = claim.dt.strftime('%d/%m/%Y')
+    form['FECHA EN LA QUE SE EMITIO LA POLIZA'] = issued.dt.strftime('%d/%m/%Y')
+    for field, (col, mapping) in CATEGORICAL_MAP.items():
+        values = pd.to_numeric(data[col]) if col == 'Deductible' else data[col]
+        form[field] = values.map(mapping)
+    for field, col in NUMERIC_MAP.items():
+        form[field] = data[col].map(RANGE_MIDPOINTS[col]).astype(float)
+    # El formulario recibe el precio en EUR
+    form['PRECIO DEL VEHICULO'] = form['PRECIO DEL VEHICULO'] / EUR_TO_USD
+    # Identificadores de póliza y agente, si vienen, para el índice de vínculos (no son variables del modelo)
+    for field, col in ((POLICY_FIELD, 'PolicyNumber'), (REP_FIELD, 'RepNumber')):
+        if col in data.columns:
+            form[field] = data[col]
+    if source is not None:
+        form[CLAIM_FIELD] = [source_claim_id(source, row) for row in data.index]
+    return form
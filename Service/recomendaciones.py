@@ -0,0 +1,91 @@
+# Motor de reglas de negocio para las recomendaciones
+# Cada regla se evalúa como una máscara booleana sobre todo el DataFrame y el resultado
+# por fila es una máscara de bits; los textos solo se generan cuando se piden.
+import operator
+
+import numpy as np
+
+OPERATORS = {
+    '>': operator.gt,
+    '<': operator.lt,
+    '==': operator.eq,
+    'in': lambda values, options: np.isin(values, options),
+}
+
+# Reglas en orden de aparición: ([(columna, operador, umbral, valor si falta la columna)], mensaje).
+# Una regla sin condiciones se aplica siempre; con varias, deben cumplirse todas.
+RULES = [
+    ([('NumberOfSuppliments', '>', 0, 0)], "Consultar los documentos suplementarios adjuntos al reclamo."),
+    ([('WitnessPresent', '==', 1, 0)], "Solicitar testimonio o contacto del testigo."),
+    ([('PoliceReportFiled', '==', 1, 0)], "Revisar el informe policial relacionado con el accidente."),
+    ([], "Confirmar la responsabilidad declarada por el asegurado."),
+    ([('PastNumberOfClaims', '>', 6, 0)], "Historial de reclamos elevado: revisar patrones o recurrencia."),
+    ([('Days_Policy_Accident', '<', 30, 999)], "El accidente ocurrió poco después de contratar la póliza: revisar con atención."),
+    ([('AddressChange_Claim', 'in', [0, 2, 3], 1)], "El asegurado cambió de domicilio recientemente: validar veracidad del cambio."),
+    ([('VehiclePrice', '>', 65500, 0)], "Vehículo de alto valor: considerar inspección más exhaustiva."),
+    ([('AgentType', '==', 0, 1)], "Agente externo involucrado: revisar consistencia de la documentación."),
+    ([('AgeOfPolicyHolder', '<', 21, 100)], "Corroborar historial del asegurado por edad especialmente joven."),
+    ([('VehicleCategory', '==', 1, -1)], "Evaluar el contexto del accidente por tratarse de un vehículo deportivo."),
+    ([('BasePolicy', '==', 0, -1)], "Evaluar nivel de cobertura total de la póliza por posible incentivo a fraude."),
+    ([('WitnessPresent', '==', 0, 0), ('PoliceReportFiled', '==', 0, 0), ('NumberOfSuppliments', '==', 0, 0)],
+     "Falta total de respaldo documental: enviar perito o iniciar investigación formal."),
+]
+# Reglas sobre las columnas del índice de vínculos (linkage_index.py), que solo están si el reclamo trae
+# número de póliza o de agente. Se evalúan aparte, una vez vinculado el lote, y sus textos van detrás.
+LINK_RULES = [
+    ([('reclamos_poliza', '>', 0, 0)], "La póliza ya tiene reclamos anteriores: comprobar si se trata de un reclamo repetido."),
+    ([('indice_fraude_agente', '>', 1.5, 0)],
+     "El agente de la póliza acumula una tasa de fraude histórica elevada: revisar sus reclamos."),
+    ([('indice_fraude_vinculados', '>', 1.5, 0)],
+     "Reclamo vinculado por póliza o agente a un grupo con fraude histórico elevado: revisar el grupo completo."),
+]
+SIN_RECOMENDACIONES = "No se identificaron recomendaciones automáticas. Evaluar manualmente."
+MESSAGES = [message for _, message in RULES]
+LINK_MESSAGES = [message for _, message in LINK_RULES]
+
+
+# Máscara de bits por fila (bit i activo si se cumple la regla i)
+def evaluate_rules(data, rules=RULES):
+    n = len(data)
+    mask = np.zeros(n, dtype=np.uint32)
+    # Todas las columnas que usan las reglas se extraen de una vez
+    present = list(dict.fromkeys(c[0] for conditions, _ in rules for c in conditions if c[0] in data.columns))
+    values = data[present].to_numpy(dtype=float, na_value=np.nan) if present else np.empty((n, 0))
+    position = {column: i for i, column in enumerate(present)}
+    for bit, (conditions, _) in enumerate(rules):
+        hit = np.ones(n, dtype=bool)
+        for column, op, threshold, default in conditions:
+            if column in position:
+                with np.errstate(invalid='ignore'):
+                    hit &= OPERATORS[op](values[:, position[column]], threshold)
+            elif not OPERATORS[op](np.asarray([default]), threshold)[0]:
+                hit[:] = False
+        mask[hit] |= np.uint32(1 << bit)
+    return mask
+
+
+# Textos de una máscara concreta
+def expand_mask(mask, messages=MESSAGES):
+    fila = [message for bit, message in enumerate(messages) if mask >> bit & 1]
+    return fila or [SIN_RECOMENDACIONES]
+
+
+# Expansión de las máscaras a listas de textos; las combinaciones repetidas se expanden una vez
+def expand_masks(masks, messages=MESSAGES):
+    cache = {}
+    recomendaciones = []
+    for mask in masks.tolist():
+        if mask not in cache:
+            cache[mask] = expand_mask(mask, messages)
+        recomendaciones.append(list(cache[mask]))
+    return recomendaciones
+
+
+# Añade a las recomendaciones de cada fila los textos de su máscara (reglas evaluadas aparte)
+def append_masks(recomendaciones, masks, messages=LINK_MESSAGES):
+    for fila, mask in zip(recomendaciones, masks.tolist()):
+        if mask:
+            if fila == [SIN_RECOMENDACIONES]:
+                fila.clear()
+            fila.extend(message for bit, message in enumerate(messages) if mask >> bit & 1)
+    return recomendaciones
@@ -0,0 +1,116 @@
+# Registro de artefactos del modelo
+# Mantiene en memoria, una sola vez por proceso, todo lo que se carga desde Artifacts/
+# y lo recarga automáticamente cuando alguno de los ficheros cambia en disco.
+import hashlib
+import os
+import threading
+import time
+
+
+# Huella de un fichero: (mtime_ns, tamaño) y, solo si estos cambian, su hash de contenido
+def _file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    def __init__(self, artifacts_dir, loaders, check_interval=1.0):
+        # loaders: {nombre: función sin argumentos que devuelve el artefacto}
+        self.artifacts_dir = artifacts_dir
+        self.loaders = dict(loaders)
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._cache = {}
+        self._stats = {}
+        self._hashes = {}
+        self._version = None
+        self._last_check = 0.0
+        self.reloads = 0
+
+    # Estado (mtime, tamaño) de los ficheros de primer nivel de Artifacts/
+    def _scan(self):
+        stats = {}
+        for entry in os.scandir(self.artifacts_dir):
+            if entry.is_file():
+                st = entry.stat()
+                stats[entry.name] = (st.st_mtime_ns, st.st_size)
+        return stats
+
+    # Actualiza la huella y devuelve True si el contenido de algún fichero ha cambiado
+    def _refresh_fingerprint(self):
+        stats = self._scan()
+        changed = False
+        hashes = {}
+        for name, stat in stats.items():
+            if self._stats.get(name) == stat and name in self._hashes:
+                hashes[name] = self._hashes[name]
+                continue
+            hashes[name] = _file_hash(os.path.join(self.artifacts_dir, name))
+            if self._hashes.get(name) != hashes[name]:
+                changed = True
+        if set(hashes) != set(self._hashes):
+            changed = True
+        self._stats = stats
+        self._hashes = hashes
+        if changed or self._version is None:
+            digest = hashlib.sha256()
+            for name in sorted(hashes):
+                digest.update(name.encode('utf-8'))
+                digest.update(hashes[name].encode('ascii'))
+            self._version = digest.hexdigest()[:16]
+        return changed
+
+    # Comprueba (como mucho cada check_interval segundos) si hay que invalidar la caché
+    def _check(self, force=False):
+        now = time.monotonic()
+        if not force and self._version is not None and now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            if not force and self._version is not None and now - self._last_check < self.check_interval:
+                return
+            first = self._version is None
+            if self._refresh_fingerprint() and not first:
+                self._cache.clear()
+                self.reloads += 1
+            self._last_check = now
+
+    # Devuelve el artefacto pedido, cargándolo si aún no está en memoria
+    def get(self, name):
+        self._check()
+        try:
+            return self._cache[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._cache:
+                if name not in self.loaders:
+                    raise KeyError(f"Artefacto '{name}' no registrado")
+                self._cache[name] = self.loaders[name]()
+            return self._cache[name]
+
+    # Carga anticipada de los artefactos (todos por defecto) al arrancar el proceso
+    def warm_up(self, names=None):
+        self._check(force=True)
+        for name in (names or self.loaders):
+            self.get(name)
+        return self
+
+    # Descarta todo lo cargado; la siguiente petición vuelve a leer de disco
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+            self._version = None
+            self._stats = {}
+            self._hashes = {}
+
+    def is_loaded(self, name):
+        return name in self._cache
+
+    # Identificador del contenido actual de Artifacts/
+    @property
+    def version(self):
+        self._check()
+        return self._version
@@ -0,0 +1,87 @@
+# Caché de resultados de puntuación por vector preprocesado
+# Los campos del formulario son casi todos categóricos o se redondean a unos pocos valores (COL_MAP),
+# así que muchos reclamos llegan al modelo con el mismo vector de variables. La clave es un hash del
+# vector en float64 canónico (sin -0.0 y con un único NaN); el valor, el score y la probabilidad de
+# cada miembro. Expulsión LRU por tamaño, caducidad por tiempo y vaciado al cambiar la versión.
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Cada fila de la matriz como un único valor binario (dtype void): permite np.unique por filas
+def row_keys(matrix):
+    X = np.array(matrix, dtype=np.float64)
+    X += 0.0
+    X[np.isnan(X)] = np.nan
+    X = np.ascontiguousarray(X)
+    return X.view(np.dtype((np.void, X.dtype.itemsize * X.shape[1]))).ravel()
+
+
+def row_digest(key):
+    return hashlib.blake2b(key.tobytes(), digest_size=16).digest()
+
+
+class ScoreCache:
+    def __init__(self, maxsize=100000, ttl=3600.0, clock=time.monotonic):
+        # maxsize=0 desactiva la caché; ttl en segundos (None: sin caducidad)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    # Con otra versión de los artefactos (o de los miembros) lo guardado deja de valer
+    def _check_version(self, version):
+        if version != self._version:
+            self._cache.clear()
+            self._version = version
+
+    # Valor guardado de cada clave, o None si no está o ha caducado
+    def get_many(self, keys, version):
+        if not self.maxsize:
+            self.misses += len(keys)
+            return [None] * len(keys)
+        now = self.clock()
+        values = []
+        with self._lock:
+            self._check_version(version)
+            for key in keys:
+                entry = self._cache.get(key)
+                if entry is not None and self.ttl is not None and now - entry[0] > self.ttl:
+                    del self._cache[key]
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    values.append(None)
+                else:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    values.append(entry[1])
+        return values
+
+    def put_many(self, keys, values, version):
+        if not self.maxsize:
+            return
+        now = self.clock()
+        with self._lock:
+            self._check_version(version)
+            for key, value in zip(keys, values):
+                self._cache[key] = (now, value)
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._cache)
@@ -0,0 +1,178 @@
+# Puntuación por lotes de ficheros de reclamos (CSV o Parquet)
+#   python score_claims.py ../Data/data_raw.csv -o scores.csv --chunksize 5000
+#   python score_claims.py reclamos.csv --workers 4     (bloques repartidos entre 4 procesos)
+#   python score_claims.py reclamos.csv --cascade       (nivel de riesgo e intervalo del score, en cascada)
+# Admite el formato original del dataset (Data/data_raw.csv) o los campos del formulario (io_schema.json).
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+
+import pandas as pd
+
+from api_backend import drift_monitor, puntuar_lote, registry, sumar_deriva, vincular_lote, warm_up
+from raw_claims import is_raw_layout, raw_to_form
+
+
+# Lectura del fichero de entrada por bloques. Los CSV se leen como texto para que
+# opciones como "3" o "4 " coincidan literalmente con las del esquema.
+def iter_chunks(path, chunksize):
+    if path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+        offset = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            chunk = batch.to_pandas()
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            yield chunk
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, encoding='utf-8-sig', dtype=str)
+
+
+# Escritura incremental del resultado (CSV o Parquet según la extensión)
+class ResultWriter:
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.lower().endswith('.parquet')
+        self._writer = None
+        self._first = True
+
+    def write(self, result):
+        result = result.copy()
+        result['recomendaciones'] = [json.dumps(recs, ensure_ascii=False) for recs in result['recomendaciones']]
+        result.index.name = 'fila'
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(result.reset_index(), preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            result.to_csv(self.path, mode='w' if self._first else 'a', header=self._first, encoding='utf-8')
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+# Puntúa un bloque sin vincularlo; convierte primero si viene en el formato original del dataset.
+# Devuelve el resultado, los identificadores para vincular_lote y las filas descartadas. source: fichero
+# del bloque, que numera los reclamos del formato original (los del histórico no se vinculan a sí mismos)
+def _score_unlinked(chunk, cascade=False, source=None):
+    if is_raw_layout(chunk):
+        form = raw_to_form(chunk, source)
+    else:
+        form = chunk
+    if form.empty:
+        columns = ['riesgo', 'score_min', 'score_max', 'recomendaciones'] if cascade else ['score', 'riesgo', 'recomendaciones']
+        return pd.DataFrame(columns=columns), None, len(chunk)
+    result, ids = puntuar_lote(form, cascade=cascade)
+    return result, ids, len(chunk) - len(form)
+
+
+# Puntúa un bloque, con los vínculos de sus reclamos si los trae identificados
+def score_chunk(chunk, cascade=False, source=None):
+    result, ids, skipped = _score_unlinked(chunk, cascade, source)
+    return vincular_lote(result, ids), skipped
+
+
+# Bloque puntuado en un proceso de trabajo: los vínculos se calculan después en el proceso principal
+# (un solo índice, en el orden de entrada) y los conteos de deriva del bloque se devuelven para
+# sumarlos a su monitor
+def _score_in_worker(chunk, cascade, source):
+    drift_monitor.reset()
+    result, ids, skipped = _score_unlinked(chunk, cascade, source)
+    return result, ids, skipped, drift_monitor.snapshot()
+
+
+# Inicialización de cada proceso: con fork los artefactos ya están en memoria (heredados del
+# proceso principal); con spawn cada proceso tiene que cargar los suyos
+def _init_worker(threads):
+    warm_up()
+    registry.get('ensemble').configure(threads, parallel=False)
+
+
+# Resultados de score_chunk para cada bloque, en el orden de entrada. Con workers > 1 los bloques
+# se reparten entre procesos que comparten los modelos cargados una sola vez en este proceso
+# (fork, copia en escritura); como mucho hay 2 bloques por proceso pendientes a la vez. Los vínculos
+# y la deriva se acumulan en este proceso, bloque a bloque: la salida es la misma que con uno solo.
+def score_chunks(chunks, workers=1, threads=1, cascade=False, source=None):
+    if workers <= 1:
+        for chunk in chunks:
+            yield score_chunk(chunk, cascade, source)
+        return
+    warm_up()
+    method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    # Los objetos ya cargados pasan a la generación permanente: el recolector de los procesos
+    # hijos no los recorre y sus páginas siguen compartidas
+    gc.collect()
+    gc.freeze()
+    try:
+        pool = multiprocessing.get_context(method).Pool(workers, initializer=_init_worker, initargs=(threads,))
+    finally:
+        gc.unfreeze()
+    pending = deque()
+    try:
+        for chunk in chunks:
+            pending.append(pool.apply_async(_score_in_worker, (chunk, cascade, source)))
+            if len(pending) >= 2 * workers:
+                yield _link_worker_result(*pending.popleft().get())
+        while pending:
+            yield _link_worker_result(*pending.popleft().get())
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _link_worker_result(result, ids, skipped, drift_counts):
+    sumar_deriva(drift_counts, len(result))
+    return vincular_lote(result, ids), skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Puntuación por lotes de reclamos')
+    parser.add_argument('input', help='Fichero CSV o Parquet con los reclamos')
+    parser.add_argument('-o', '--output', help='Fichero de salida (.csv o .parquet); por defecto <input>_scores.csv')
+    parser.add_argument('--chunksize', type=int, default=5000, help='Filas por bloque')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Procesos de puntuación (0: uno por núcleo); los modelos se cargan una sola vez')
+    parser.add_argument('--threads', type=int, default=1, help='Hilos por modelo en cada proceso (con --workers > 1)')
+    parser.add_argument('--cascade', action='store_true',
+                        help='Solo el nivel de riesgo y el intervalo del score, sin evaluar los modelos que no lo cambian')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Muestra el rendimiento de cada bloque')
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.splitext(args.input)[0] + '_scores.csv'
+    workers = args.workers or os.cpu_count() or 1
+    warm_up()
+    writer = ResultWriter(output)
+    total = descartadas = 0
+    inicio = t0 = time.perf_counter()
+    try:
+        chunks = iter_chunks(args.input, args.chunksize)
+        for result, skipped in score_chunks(chunks, workers, args.threads, args.cascade, args.input):
+            writer.write(result)
+            total += len(result)
+            descartadas += skipped
+            if args.verbose:
+                dt = time.perf_counter() - t0
+                filas = len(result) + skipped
+                print(f"Bloque de {filas} filas: {filas / dt:,.0f} filas/s", file=sys.stderr)
+                t0 = time.perf_counter()
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - inicio
+    print(f"Filas puntuadas: {total} (descartadas: {descartadas}) en {elapsed:.2f} s con {workers} proceso(s) "
+          f"→ {total / elapsed if elapsed else 0:,.0f} filas/s", file=sys.stderr)
+    print(f"Resultados guardados en {output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+# Servidor HTTP ligero de puntuación (asyncio, sin dependencias externas)
+#   python scoring_server.py --port 8080 --max-batch 64 --max-wait-ms 5
+#
+#   GET  /health        estado del servicio y versión de los artefactos
+#   POST /score         un reclamo (campos del formulario) → score, riesgo y recomendaciones
+#   POST /score/batch   {"claims": [...]} → lista de resultados
+#   GET  /metrics       métricas en formato de texto de Prometheus (latencia por etapa, filas, fallos)
+#   GET  /drift         deriva de cada variable y del score frente al entrenamiento (PSI, KS y nivel)
+#
+# Las peticiones individuales concurrentes se agrupan en micro-lotes (tamaño máximo y espera
+# máxima) para que cada modelo del ensemble haga una sola llamada vectorizada a predict_proba.
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import pandas as pd
+
+import api_backend
+import metrics
+from linkage_index import LINK_COLUMNS
+from preprocessing import InputError
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Tamaño máximo del cuerpo de una petición; por encima se responde 413 sin leerlo
+MAX_BODY_BYTES = 1 << 20
+REQUEST_SECONDS = metrics.registry.histogram(
+    'fraude_http_request_seconds', 'Duración de las peticiones HTTP por ruta', ['route'])
+REQUESTS = metrics.registry.counter(
+    'fraude_http_requests_total', 'Peticiones HTTP por ruta y código de estado', ['route', 'status'])
+BATCH_SIZE = metrics.registry.histogram(
+    'fraude_micro_batch_size', 'Reclamos por micro-lote', buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+
+# Resultado de una fila en el mismo formato que model_service
+def _result_row(row):
+    result = {
+        'score': round(float(row['score']), 2),
+        'riesgo': row['riesgo'],
+        'recomendaciones': list(row['recomendaciones']),
+    }
+    if LINK_COLUMNS[0] in row:
+        result['vinculos'] = api_backend.vinculos_a_dict({column: row[column] for column in LINK_COLUMNS})
+    return result
+
+
+def score_records(claims):
+    result = api_backend.score_batch(pd.DataFrame(claims))
+    return [_result_row(row) for row in result.to_dict('records')]
+
+
+class MicroBatcher:
+    def __init__(self, executor, max_batch=64, max_wait=0.005):
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.claims = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, claim):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((claim, future))
+        return await future
+
+    # Recoge peticiones hasta llenar el lote o agotar la espera máxima desde la primera
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            claims = [claim for claim, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, score_records, claims)
+            except Exception:
+                # Un reclamo erróneo no debe hacer fallar al resto del lote
+                results = []
+                for claim in claims:
+                    try:
+                        results.append((await loop.run_in_executor(self.executor, score_records, [claim]))[0])
+                    except Exception as e:
+                        results.append(e)
+            self.batches += 1
+            self.claims += len(batch)
+            BATCH_SIZE.observe(len(batch))
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+# Estado de los artefactos para /health. Consultar el registro puede leer Artifacts/ (comprobar
+# cambios o recargar los modelos), así que no se hace en el bucle de eventos
+def artifacts_status():
+    registry = api_backend.registry
+    return {
+        'version': registry.version,
+        'models': list(registry.get('models')),
+        'fast_path': registry.get('fast_predictor') is not None,
+    }
+
+
+class ScoringServer:
+    def __init__(self, max_batch=64, max_wait=0.005, workers=1, max_body=MAX_BODY_BYTES):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.batcher = MicroBatcher(self.executor, max_batch=max_batch, max_wait=max_wait)
+        self.max_body = max_body
+        self.started = time.time()
+
+    # /health, /metrics y /drift usan el executor por defecto del bucle: no esperan a los lotes en curso
+    async def handle_health(self, body):
+        status = await asyncio.get_running_loop().run_in_executor(None, artifacts_status)
+        return HTTPStatus.OK, {
+            'status': 'ok',
+            **status,
+            'uptime_s': round(time.time() - self.started, 1),
+            'batches': self.batcher.batches,
+            'claims': self.batcher.claims,
+        }
+
+    async def handle_score(self, body):
+        claim = json.loads(body)
+        if not isinstance(claim, dict):
+            return HTTPStatus.BAD_REQUEST, {'error': 'Se esperaba un objeto JSON con los campos del reclamo'}
+        return HTTPStatus.OK, await self.batcher.submit(claim)
+
+    async def handle_batch(self, body):
+        payload = json.loads(body)
+        claims = payload.get('claims') if isinstance(payload, dict) else payload
+        if not isinstance(claims, list) or not all(isinstance(c, dict) for c in claims):
+            return HTTPStatus.BAD_REQUEST, {'error': 'Se esperaba {"claims": [...]} con una lista de reclamos'}
+        if not claims:
+            return HTTPStatus.OK, {'results': []}
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(self.executor, score_records, claims)
+        return HTTPStatus.OK, {'results': results}
+
+    async def handle_metrics(self, body):
+        # El informe de deriva actualiza las métricas fraude_drift_* antes de exponerlas
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, api_backend.informe_deriva)
+        return HTTPStatus.OK, metrics.render()
+
+    async def handle_drift(self, body):
+        loop = asyncio.get_running_loop()
+        variables, version = await loop.run_in_executor(
+            None, lambda: (api_backend.informe_deriva(), api_backend.registry.version))
+        return HTTPStatus.OK, {'version': version, 'variables': variables}
+
+    def route(self, method, path):
+        routes = {
+            ('GET', '/health'): self.handle_health,
+            ('GET', '/metrics'): self.handle_metrics,
+            ('GET', '/drift'): self.handle_drift,
+            ('POST', '/score'): self.handle_score,
+            ('POST', '/score/batch'): self.handle_batch,
+        }
+        return routes.get((method, path.split('?', 1)[0].rstrip('/') or '/'))
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, self.max_body)
+                except ValueError as e:
+                    # Línea de petición o cabeceras mal formadas: la conexión no se puede seguir leyendo
+                    REQUESTS.inc(route='desconocida', status=HTTPStatus.BAD_REQUEST.value)
+                    await write_response(writer, HTTPStatus.BAD_REQUEST, {'error': f'Petición HTTP mal formada: {e}'},
+                                         keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                handler = self.route(method, path)
+                start = time.perf_counter()
+                if body is None:
+                    # El cuerpo sigue sin leer en la conexión: se responde y se cierra
+                    REQUESTS.inc(route='desconocida', status=HTTPStatus.REQUEST_ENTITY_TOO_LARGE.value)
+                    await write_response(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                         {'error': f'El cuerpo supera el máximo de {self.max_body} bytes'},
+                                         keep_alive=False)
+                    break
+                if handler is None:
+                    route = 'desconocida'
+                    status, payload = HTTPStatus.NOT_FOUND, {'error': f'Ruta no encontrada: {method} {path}'}
+                else:
+                    route = path.split('?', 1)[0].rstrip('/') or '/'
+                    try:
+                        status, payload = await handler(body)
+                    except json.JSONDecodeError as e:
+                        status, payload = HTTPStatus.BAD_REQUEST, {'error': f'JSON no válido: {e}'}
+                    except InputError as e:
+                        logger.warning("Reclamo no válido en %s %s: %s", method, route, e)
+                        status, payload = HTTPStatus.UNPROCESSABLE_ENTITY, {'error': f'Reclamo no válido: {e}'}
+                    except Exception:
+                        # Fallo del servicio, no de la petición: el detalle solo va al log
+                        logger.exception("Error al procesar %s %s", method, route)
+                        status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': 'Error interno del servicio'}
+                REQUEST_SECONDS.observe(time.perf_counter() - start, route=route)
+                REQUESTS.inc(route=route, status=status.value)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        logger.info("Servidor de puntuación escuchando en http://%s:%s", host, port)
+        async with server:
+            await server.serve_forever()
+
+
+# Lectura de una petición HTTP/1.1 (línea de petición, cabeceras y cuerpo con Content-Length).
+# ValueError si la línea de petición, una cabecera o Content-Length no son válidos. Si Content-Length
+# supera max_body el cuerpo no se lee y se devuelve None en su lugar
+async def read_request(reader, max_body=None):
+    line = await reader.readline()
+    if not line:
+        return None
+    parts = line.decode('latin-1').split(' ', 2)
+    if len(parts) != 3 or not parts[0] or not parts[1]:
+        raise ValueError(f"línea de petición no válida: {line[:100]!r}")
+    method, path, _ = parts
+    headers = {}
+    while True:
+        header = await reader.readline()
+        if header in (b'\r\n', b'\n', b''):
+            break
+        name, sep, value = header.decode('latin-1').partition(':')
+        if not sep or not name.strip():
+            raise ValueError(f"cabecera no válida: {header[:100]!r}")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length') or 0)
+    if length < 0:
+        raise ValueError(f"Content-Length no válido: {length}")
+    if max_body is not None and length > max_body:
+        return method.upper(), path, headers, None
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), path, headers, body
+
+
+# payload: objeto JSON o, si es texto, la exposición de métricas de Prometheus
+async def write_response(writer, status, payload, keep_alive=True, extra_headers=None):
+    if isinstance(payload, str):
+        body, content_type = payload.encode('utf-8'), PROMETHEUS_CONTENT_TYPE
+    else:
+        body, content_type = json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json; charset=utf-8'
+    extra = ''.join(f"{name}: {value}\r\n" for name, value in (extra_headers or {}).items())
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"{extra}"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Servidor HTTP de puntuación de reclamos')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch', type=int, default=64, help='Tamaño máximo de cada micro-lote')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0, help='Espera máxima para completar un micro-lote')
+    parser.add_argument('--max-body-bytes', type=int, default=MAX_BODY_BYTES,
+                        help='Tamaño máximo del cuerpo de una petición (413 por encima)')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'), format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    # Modelos en memoria antes de aceptar peticiones
+    api_backend.warm_up()
+    server = ScoringServer(max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000, max_body=args.max_body_bytes)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# Explicaciones SHAP bajo demanda
+# Contribución de cada variable por reclamo, con caché por hash del vector preprocesado.
+# Las filas que no están en caché se calculan juntas en una única llamada al TreeExplainer.
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import CACHE_LOOKUPS
+
+
+# Clave de caché de una fila: hash de su vector de variables (float64)
+def feature_key(row, version=''):
+    digest = hashlib.blake2b(np.ascontiguousarray(row, dtype=np.float64).tobytes(), digest_size=16)
+    digest.update(str(version).encode('utf-8'))
+    return digest.hexdigest()
+
+
+# Valores SHAP de la clase positiva, sea cual sea el formato que devuelva el explainer
+def _positive_class(values):
+    if isinstance(values, list):
+        values = values[-1]
+    values = np.asarray(values)
+    if values.ndim == 3:
+        values = values[:, :, -1]
+    return values
+
+
+class ShapExplanations:
+    def __init__(self, get_explainer, maxsize=10000):
+        # get_explainer: función que devuelve el TreeExplainer (se llama solo si hace falta calcular)
+        self.get_explainer = get_explainer
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Matriz (filas, variables) con la contribución de cada variable al score del modelo explicado
+    def explain(self, features, version=''):
+        matrix = features.to_numpy(dtype=np.float64)
+        keys = [feature_key(row, version) for row in matrix]
+        result = np.empty(matrix.shape, dtype=np.float64)
+        pending = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    result[i] = cached
+                    self.hits += 1
+                else:
+                    pending.setdefault(key, []).append(i)
+        n_pending = sum(len(rows) for rows in pending.values())
+        CACHE_LOOKUPS.inc(len(keys) - n_pending, cache='shap', result='hit')
+        CACHE_LOOKUPS.inc(n_pending, cache='shap', result='miss')
+        if pending:
+            first_rows = [rows[0] for rows in pending.values()]
+            values = _positive_class(self.get_explainer().shap_values(features.iloc[first_rows]))
+            with self._lock:
+                for (key, rows), row_values in zip(pending.items(), values):
+                    result[rows] = row_values
+                    self.misses += len(rows)
+                    self._cache[key] = row_values.copy()
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# Gráfico resumen de SHAP; solo se importa shap/matplotlib cuando se pide expresamente
+def plot_summary(values, features, show=True):
+    import shap
+    shap.summary_plot(values, features, show=show)
@@ -0,0 +1,106 @@
+# Perfil de arranque del servicio: tiempo de importación por paquete y tiempo hasta el primer score
+#   python startup_profile.py --runs 3 --top 15
+#   python startup_profile.py --shap --llm       (incluye también las rutas opcionales)
+#
+# Cada ejecución se hace en un proceso nuevo con `python -X importtime`, como un arranque en frío
+# de Streamlit o de un worker de puntuación.
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MARKER = '__startup_profile__'
+
+# Script del proceso hijo: mide cada fase y la imprime como JSON tras el marcador
+CHILD = r'''
+import contextlib, io, json, sys, time, warnings
+warnings.simplefilter('ignore')
+fases = {}
+inicio = t = time.perf_counter()
+def fase(nombre):
+    global t
+    ahora = time.perf_counter()
+    fases[nombre] = ahora - t
+    t = ahora
+import api_backend
+fase('import api_backend')
+import pandas as pd
+for name in ('config', 'schema', 'feature_cols', 'plan', 'fast_predictor'):
+    api_backend.registry.get(name)
+fase('carga de esquema y plan')
+claim = pd.DataFrame([api_backend.EJEMPLO_RECLAMO])
+with contextlib.redirect_stdout(io.StringIO()):
+    api_backend.model_service(claim)
+fase('primer score')
+fases['tiempo hasta el primer score'] = time.perf_counter() - inicio
+with contextlib.redirect_stdout(io.StringIO()):
+    api_backend.model_service(claim)
+fase('segundo score')
+if {shap}:
+    with contextlib.redirect_stdout(io.StringIO()):
+        api_backend.explicar_reclamos(claim)
+    fase('primera explicación SHAP')
+if {llm}:
+    api_backend.explicaciones.client('sk-profile')
+    fase('cliente OpenAI')
+fases['módulos cargados'] = len(sys.modules)
+print({marker!r} + json.dumps(fases))
+'''
+
+
+# Tiempo de importación propio (self) acumulado por paquete raíz, en segundos
+def parse_importtime(stderr):
+    per_package = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        per_package[name.strip().split('.')[0]] += int(self_us) / 1e6
+    return per_package
+
+
+def profile_once(shap=False, llm=False):
+    code = (CHILD.replace('{shap}', str(shap)).replace('{llm}', str(llm))
+            .replace('{marker!r}', repr(MARKER)))
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=BASE_DIR,
+                          capture_output=True, text=True)
+    phases = None
+    for line in proc.stdout.splitlines():
+        if line.startswith(MARKER):
+            phases = json.loads(line[len(MARKER):])
+    if proc.returncode != 0 or phases is None:
+        raise RuntimeError(f"El proceso de perfilado falló:\n{proc.stderr[-2000:]}")
+    return phases, parse_importtime(proc.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Perfil de arranque en frío del backend')
+    parser.add_argument('--runs', type=int, default=3, help='Procesos nuevos a medir (se muestra la mediana)')
+    parser.add_argument('--top', type=int, default=15, help='Paquetes a mostrar por tiempo de importación')
+    parser.add_argument('--shap', action='store_true', help='Incluir la primera explicación SHAP')
+    parser.add_argument('--llm', action='store_true', help='Incluir la creación del cliente de OpenAI')
+    parser.add_argument('--json', action='store_true', help='Salida en JSON')
+    args = parser.parse_args(argv)
+
+    runs = [profile_once(args.shap, args.llm) for _ in range(args.runs)]
+    median = lambda values: sorted(values)[len(values) // 2]
+    phases = {name: median([r[0][name] for r in runs]) for name in runs[0][0]}
+    packages = {name: median([r[1].get(name, 0.0) for r in runs]) for name in runs[0][1]}
+    top = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    if args.json:
+        print(json.dumps({'fases_s': phases, 'importacion_s': dict(top)}, ensure_ascii=False, indent=2))
+        return
+    print(f"Fases (mediana de {args.runs} arranques en frío):")
+    for name, value in phases.items():
+        print(f"  {name:<32} {value:10.0f}" if name == 'módulos cargados' else f"  {name:<32} {value * 1000:10.1f} ms")
+    print(f"\nImportación por paquete (tiempo propio, top {args.top}):")
+    for name, value in top:
+        print(f"  {name:<32} {value * 1000:10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,375 @@
+# Pipeline de entrenamiento del ensemble (equivalente scriptable de Notebooks/Modelado.ipynb)
+#   python train_pipeline.py                     (búsqueda completa, nueva versión en Artifacts/versions/)
+#   python train_pipeline.py --jobs 8 --promote  (en paralelo y publicando la versión en Artifacts/)
+#   python train_pipeline.py --quick --resample none
+#
+# Etapas: carga de Data/data_processed.csv, partición estratificada entrenamiento/test, SMOTE sobre
+# la parte de ajuste, búsqueda de hiperparámetros de todos los candidatos en paralelo (con parada
+# temprana en XGBoost y LightGBM), reajuste de los ganadores, evaluación en test y escritura atómica
+# de los artefactos con un manifiesto. El tiempo de cada etapa se registra en el log y en el manifiesto.
+import argparse
+import hashlib
+import json
+import logging
+import os
+import platform
+import shutil
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from ensemble import renormalize_weights
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACTS_DIR = os.path.join(BASE_DIR, '../Artifacts')
+DATA_PATH = os.path.join(BASE_DIR, '../Data/data_processed.csv')
+TARGET = 'FraudFound_P'
+SEED = 42
+# Ficheros que el servicio lee de Artifacts/ y que produce este pipeline
+MODEL_NAMES = ('logreg', 'rf', 'xgb', 'lgbm')
+EARLY_STOPPING_ROUNDS = 50
+MAX_BOOSTING_ROUNDS = 2000
+
+# Espacios de búsqueda. La rejilla de la regresión logística es la del notebook sin 'saga', que con
+# las variables sin escalar no converge en max_iter=1000 (y lbfgs solo admite l2).
+SEARCH_SPACES = {
+    'logreg': [
+        dict(C=C, penalty=penalty, solver=solver, class_weight=cw, max_iter=1000)
+        for C in (0.01, 0.1, 1, 10, 100)
+        for penalty, solver in (('l1', 'liblinear'), ('l2', 'liblinear'), ('l2', 'lbfgs'))
+        for cw in ('balanced', None)
+    ],
+    'rf': [
+        dict(n_estimators=100, max_depth=depth, min_samples_leaf=leaf, class_weight='balanced')
+        for depth in (None, 8, 16) for leaf in (1, 5)
+    ],
+    'xgb': [
+        dict(max_depth=depth, learning_rate=lr)
+        for depth in (3, 4, 6) for lr in (0.05, 0.1)
+    ],
+    'lgbm': [
+        dict(max_depth=depth, learning_rate=lr, class_weight='balanced')
+        for depth in (4, 8) for lr in (0.05, 0.1)
+    ],
+}
+# --quick: los parámetros elegidos en el notebook, sin búsqueda
+QUICK_SPACES = {
+    'logreg': [dict(C=100, penalty='l1', solver='liblinear', class_weight='balanced', max_iter=1000)],
+    'rf': [dict(n_estimators=100, max_depth=None, min_samples_leaf=1, class_weight='balanced')],
+    'xgb': [dict(max_depth=4, learning_rate=0.1)],
+    'lgbm': [dict(max_depth=4, learning_rate=0.1, class_weight='balanced')],
+}
+
+
+@contextmanager
+def stage(timings, name):
+    logger.info("Etapa '%s'...", name)
+    inicio = time.perf_counter()
+    yield
+    timings[name] = round(time.perf_counter() - inicio, 3)
+    logger.info("Etapa '%s' terminada en %.2f s", name, timings[name])
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def resample(X, y, method):
+    if method == 'none':
+        return X, y
+    try:
+        from imblearn.over_sampling import SMOTE
+    except ImportError:
+        raise SystemExit("SMOTE necesita el paquete imbalanced-learn (pip install imbalanced-learn) "
+                         "o usar --resample none") from None
+    return SMOTE(random_state=SEED).fit_resample(X, y)
+
+
+# Estimador sin entrenar de una familia; en los boosted, n_estimators fijo o el máximo con parada temprana
+def build_model(family, params, pos_weight=1.0, n_estimators=None, early_stopping=False):
+    if family == 'logreg':
+        from sklearn.linear_model import LogisticRegression
+        return LogisticRegression(random_state=SEED, **params)
+    if family == 'rf':
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(random_state=SEED, n_jobs=1, **params)
+    if family == 'xgb':
+        from xgboost import XGBClassifier
+        return XGBClassifier(
+            n_estimators=n_estimators or MAX_BOOSTING_ROUNDS, objective='binary:logistic', eval_metric='aucpr',
+            scale_pos_weight=pos_weight, random_state=SEED, n_jobs=1, verbosity=0,
+            early_stopping_rounds=EARLY_STOPPING_ROUNDS if early_stopping else None, **params)
+    if family == 'lgbm':
+        from lightgbm import LGBMClassifier
+        return LGBMClassifier(n_estimators=n_estimators or MAX_BOOSTING_ROUNDS, metric='average_precision',
+                              random_state=SEED, n_jobs=1, verbose=-1, **params)
+    raise ValueError(f"Familia de modelo desconocida: '{family}'")
+
+
+def fit_model(model, family, X, y, X_valid=None, y_valid=None):
+    if family == 'xgb' and X_valid is not None:
+        model.fit(X, y, eval_set=[(X_valid, y_valid)], verbose=False)
+    elif family == 'lgbm' and X_valid is not None:
+        import lightgbm
+        model.fit(X, y, eval_set=[(X_valid, y_valid)],
+                  callbacks=[lightgbm.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)])
+    else:
+        model.fit(X, y)
+    return model
+
+
+# Número de árboles elegido por la parada temprana (None en los modelos sin boosting)
+def best_rounds(model, family):
+    if family == 'xgb':
+        return int(model.best_iteration) + 1
+    if family == 'lgbm':
+        return int(model.best_iteration_ or model.n_estimators)
+    return None
+
+
+# Un candidato: ajuste sobre la parte remuestreada y puntuación en la de validación (se ejecuta en los workers)
+def evaluate_candidate(family, params, X_fit, y_fit, X_valid, y_valid, pos_weight):
+    import warnings
+    from sklearn.metrics import average_precision_score
+
+    warnings.simplefilter('ignore')
+    inicio = time.perf_counter()
+    model = build_model(family, params, pos_weight=pos_weight, early_stopping=True)
+    fit_model(model, family, X_fit, y_fit, X_valid, y_valid)
+    proba = model.predict_proba(X_valid)[:, 1]
+    return {
+        'family': family,
+        'params': params,
+        'average_precision': float(average_precision_score(y_valid, proba)),
+        'n_estimators': best_rounds(model, family),
+        'seconds': round(time.perf_counter() - inicio, 3),
+    }
+
+
+def search(spaces, X_fit, y_fit, X_valid, y_valid, jobs):
+    from joblib import Parallel, delayed, effective_n_jobs
+
+    pos_weight = float((y_fit == 0).sum() / max(1, (y_fit == 1).sum()))
+    jobs = effective_n_jobs(jobs)
+    tasks = [(family, params) for family, candidates in spaces.items() for params in candidates]
+    logger.info("Búsqueda: %d candidatos en %d procesos", len(tasks), jobs)
+    # Todos los candidatos de todas las familias en una misma cola para repartir la carga entre núcleos
+    results = Parallel(n_jobs=jobs)(
+        delayed(evaluate_candidate)(family, params, X_fit, y_fit, X_valid, y_valid, pos_weight)
+        for family, params in tasks
+    )
+    best = {}
+    for result in results:
+        current = best.get(result['family'])
+        if current is None or result['average_precision'] > current['average_precision']:
+            best[result['family']] = result
+    for family, result in best.items():
+        logger.info("Mejor %s: AP=%.4f %s%s", family, result['average_precision'], result['params'],
+                    f" ({result['n_estimators']} árboles)" if result['n_estimators'] else '')
+    return best, results
+
+
+def refit_winners(best, X, y, jobs):
+    from joblib import Parallel, delayed
+
+    pos_weight = float((y == 0).sum() / max(1, (y == 1).sum()))
+
+    def refit(family, result):
+        import warnings
+        warnings.simplefilter('ignore')
+        model = build_model(family, result['params'], pos_weight=pos_weight, n_estimators=result['n_estimators'])
+        return family, fit_model(model, family, X, y)
+
+    return dict(Parallel(n_jobs=jobs)(delayed(refit)(family, result) for family, result in best.items()))
+
+
+def evaluate(models, config, X_test, y_test):
+    from sklearn.metrics import average_precision_score, f1_score, precision_score, recall_score, roc_auc_score
+
+    report = {}
+    probs = {name: model.predict_proba(X_test)[:, 1] for name, model in models.items()}
+    for name, proba in probs.items():
+        report[name] = {'average_precision': float(average_precision_score(y_test, proba)),
+                        'roc_auc': float(roc_auc_score(y_test, proba))}
+    weights, _ = renormalize_weights(config['weights'], models)
+    scores = sum(probs[name] * w for name, w in weights.items())
+    pred = (scores >= config['threshold']).astype(int)
+    report['ensemble'] = {
+        'average_precision': float(average_precision_score(y_test, scores)),
+        'roc_auc': float(roc_auc_score(y_test, scores)),
+        'threshold': config['threshold'],
+        'precision': float(precision_score(y_test, pred, zero_division=0)),
+        'recall': float(recall_score(y_test, pred)),
+        'f1': float(f1_score(y_test, pred)),
+    }
+    return report
+
+
+def library_versions():
+    versions = {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__}
+    for module in ('sklearn', 'xgboost', 'lightgbm', 'shap', 'imblearn'):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            pass
+    return versions
+
+
+# Escritura de la versión en un directorio temporal y renombrado final (la versión aparece completa o no aparece).
+# El manifiesto se escribe el último, ya con el tiempo de la etapa de escritura.
+def write_version(versions_dir, version, models, config, feature_cols, explainer, manifest, timings):
+    import joblib
+
+    os.makedirs(versions_dir, exist_ok=True)
+    final_dir = os.path.join(versions_dir, version)
+    tmp_dir = os.path.join(versions_dir, f'.tmp-{version}')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        with stage(timings, 'escritura'):
+            for name, model in models.items():
+                joblib.dump(model, os.path.join(tmp_dir, f'model_{name}.pkl'))
+            with open(os.path.join(tmp_dir, 'ensemble_config.json'), 'w') as f:
+                json.dump(config, f)
+            joblib.dump(list(feature_cols), os.path.join(tmp_dir, 'feature_cols.pkl'))
+            if explainer is not None:
+                joblib.dump(explainer, os.path.join(tmp_dir, 'explainer.pkl'))
+            # El esquema de entrada no lo genera el entrenamiento; se copia para que la versión sea completa
+            shutil.copy2(os.path.join(ARTIFACTS_DIR, 'io_schema.json'), os.path.join(tmp_dir, 'io_schema.json'))
+            files = {name: file_sha256(os.path.join(tmp_dir, name)) for name in sorted(os.listdir(tmp_dir))}
+        manifest['files'] = files
+        manifest['timings_s'] = timings
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.rename(tmp_dir, final_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return final_dir
+
+
+# Publica una versión en Artifacts/, donde la lee el servicio. Cada fichero se copia primero dentro del
+# directorio de la versión y se mueve con os.replace, así que el registro nunca ve un fichero a medias.
+# Los modelos y el explainer que la versión no trae se borran después: son de otro entrenamiento.
+def promote(version_dir, artifacts_dir=ARTIFACTS_DIR):
+    with open(os.path.join(version_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    staging = os.path.join(version_dir, '.promote')
+    os.makedirs(staging, exist_ok=True)
+    names = sorted(manifest['files']) + ['manifest.json']
+    for name in names:
+        shutil.copy2(os.path.join(version_dir, name), os.path.join(staging, name))
+    # La configuración del ensemble se publica la última: con ella cambian los miembros esperados
+    for name in sorted(names, key=lambda n: n == 'ensemble_config.json'):
+        os.replace(os.path.join(staging, name), os.path.join(artifacts_dir, name))
+    os.rmdir(staging)
+    stale = [f'model_{name}.pkl' for name in MODEL_NAMES] + ['explainer.pkl']
+    for name in stale:
+        path = os.path.join(artifacts_dir, name)
+        if name not in manifest['files'] and os.path.exists(path):
+            os.remove(path)
+            logger.info("Eliminado %s: no forma parte de la versión %s", name, manifest['version'])
+    logger.info("Versión %s publicada en %s", manifest['version'], os.path.abspath(artifacts_dir))
+
+
+def run(args):
+    from sklearn.model_selection import train_test_split
+
+    timings = {}
+    inicio = time.perf_counter()
+    families = [name for name in MODEL_NAMES if name in args.models]
+    spaces = {name: (QUICK_SPACES if args.quick else SEARCH_SPACES)[name] for name in families}
+
+    with stage(timings, 'carga'):
+        data = pd.read_csv(args.data)
+        X = data.drop(columns=[TARGET])
+        y = data[TARGET]
+        with open(args.config) as f:
+            config = json.load(f)
+
+    with stage(timings, 'particion'):
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=SEED)
+        X_fit, X_valid, y_fit, y_valid = train_test_split(X_train, y_train, test_size=args.valid_size,
+                                                          stratify=y_train, random_state=SEED)
+
+    with stage(timings, 'remuestreo'):
+        X_fit_res, y_fit_res = resample(X_fit, y_fit, args.resample)
+        X_train_res, y_train_res = resample(X_train, y_train, args.resample)
+
+    with stage(timings, 'busqueda'):
+        best, candidates = search(spaces, X_fit_res, y_fit_res, X_valid, y_valid, args.jobs)
+
+    with stage(timings, 'reajuste'):
+        models = refit_winners(best, X_train_res, y_train_res, args.jobs)
+        models = {name: models[name] for name in families}
+        # La versión solo pondera lo que se ha entrenado (mismo reescalado que el servicio)
+        weights, missing = renormalize_weights(config['weights'], models)
+        if missing:
+            logger.warning("Sin entrenar %s: se quitan de los pesos del ensemble", missing)
+            config = {**config, 'weights': {name: round(w, 4) for name, w in weights.items()}}
+
+    with stage(timings, 'evaluacion'):
+        test_report = evaluate(models, config, X_test, y_test)
+        logger.info("Ensemble en test: %s", {k: round(v, 4) for k, v in test_report['ensemble'].items()})
+
+    explainer = None
+    with stage(timings, 'explainer'):
+        if 'lgbm' in models:
+            import shap
+            explainer = shap.TreeExplainer(models['lgbm'])
+        else:
+            logger.warning("Sin LightGBM no se genera explainer.pkl")
+
+    data_hash = file_sha256(args.data)
+    version = time.strftime('%Y%m%d-%H%M%S') + '-' + hashlib.sha256(
+        (data_hash + json.dumps(best, sort_keys=True, default=str)).encode('utf-8')).hexdigest()[:8]
+    manifest = {
+        'version': version,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'data': {'path': os.path.relpath(args.data, BASE_DIR), 'sha256': data_hash, 'rows': int(len(data)),
+                 'positives': int(y.sum()), 'train_rows': int(len(X_train)), 'test_rows': int(len(X_test))},
+        'resample': args.resample,
+        'seed': SEED,
+        'selection_metric': 'average_precision',
+        'models': {name: {'params': best[name]['params'], 'n_estimators': best[name]['n_estimators'],
+                          'valid_average_precision': best[name]['average_precision']} for name in families},
+        'candidates': len(candidates),
+        'ensemble_config': config,
+        'test': test_report,
+        'libraries': library_versions(),
+    }
+    version_dir = write_version(args.output, version, models, config, X.columns, explainer, manifest, timings)
+    logger.info("Versión %s guardada en %s (%.1f s en total)", version, version_dir, time.perf_counter() - inicio)
+    if args.promote:
+        promote(version_dir)
+    return version_dir, manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Entrenamiento del ensemble de detección de fraude')
+    parser.add_argument('--data', default=DATA_PATH, help='Matriz de entrenamiento (por defecto Data/data_processed.csv)')
+    parser.add_argument('--config', default=os.path.join(ARTIFACTS_DIR, 'ensemble_config.json'),
+                        help='Pesos y umbral del ensemble a publicar con la versión')
+    parser.add_argument('--output', default=os.path.join(ARTIFACTS_DIR, 'versions'), help='Directorio de versiones')
+    parser.add_argument('--models', nargs='+', default=list(MODEL_NAMES), choices=MODEL_NAMES)
+    parser.add_argument('--jobs', type=int, default=-1, help='Procesos para la búsqueda (-1: todos los núcleos)')
+    parser.add_argument('--resample', choices=['smote', 'none'], default='smote')
+    parser.add_argument('--valid-size', type=float, default=0.2,
+                        help='Fracción del entrenamiento reservada para elegir candidatos y la parada temprana')
+    parser.add_argument('--quick', action='store_true', help='Solo los parámetros del notebook, sin búsqueda')
+    parser.add_argument('--promote', action='store_true', help='Publicar la versión en Artifacts/')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'), format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    run(args)
+
+
+if __name__ == '__main__':
+    main()